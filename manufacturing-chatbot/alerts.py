@@ -0,0 +1,143 @@
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from database.backends import backend
+from database.config import Config
+
+
+def fetch_downtime_alerts(conn):
+    """Return today's production rows whose downtime exceeds the alert threshold"""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(backend.queries.DOWNTIME_ALERTS, (Config.ALERT_DOWNTIME_MINUTES,))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def format_alert(row):
+    return f"🚨 ALERT: Line {row['line_id']} has {row['downtime_minutes']} minutes downtime today!"
+
+def alert_payload(row):
+    return {
+        "id": row['production_id'],
+        "line_id": row['line_id'],
+        "shift": row['shift'],
+        "downtime_minutes": row['downtime_minutes'],
+        "message": format_alert(row),
+    }
+
+
+class AlertBroadcaster:
+    """Shared, sequence-numbered event log that every stream client reads from
+
+    Publishing appends once and wakes all waiting clients, so its cost does
+    not depend on how many dashboards are connected. Clients only hold their
+    last seen sequence number. asgi.py relays publishes to its async clients
+    (AlertRelay), so there an idle client costs a suspended coroutine rather
+    than a thread.
+    """
+
+    def __init__(self, history=256):
+        self._events = deque(maxlen=history)  # (seq, event, data)
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, event, data):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            self._cond.notify_all()
+
+    def wait(self, last_seq, timeout):
+        """Return events newer than last_seq, or [] if none arrive within timeout
+
+        Returns None if the client fell behind the retained history and needs
+        a fresh snapshot.
+        """
+        with self._cond:
+            if self._seq == last_seq:
+                self._cond.wait(timeout)
+            if self._events and self._events[0][0] > last_seq + 1:
+                return None
+            return [entry for entry in self._events if entry[0] > last_seq]
+
+
+class AlertMonitor:
+    """Evaluates downtime alerts in the background and keeps the current set in memory"""
+
+    def __init__(self, interval, broadcaster):
+        self.interval = interval
+        self.broadcaster = broadcaster
+        self._alerts = {}  # production_id -> alert row
+        self._updated_at = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-monitor', daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        """Re-evaluate now instead of waiting for the next interval, e.g. after a write"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self.evaluate()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def evaluate(self):
+        conn = None
+        try:
+            conn = backend.connect()
+            if conn is None:
+                return
+            rows = fetch_downtime_alerts(conn)
+        except Exception as e:
+            print(f"Alert check error: {e}")
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+
+        alerts = {row['production_id']: row for row in rows}
+        with self._lock:
+            previous = self._alerts
+            for alert_id, row in alerts.items():
+                old = previous.get(alert_id)
+                if old is None:
+                    self.broadcaster.publish('new', alert_payload(row))
+                elif old['downtime_minutes'] != row['downtime_minutes']:
+                    self.broadcaster.publish('changed', alert_payload(row))
+            for alert_id, row in previous.items():
+                if alert_id not in alerts:
+                    self.broadcaster.publish('cleared', alert_payload(row))
+            self._alerts = alerts
+            self._updated_at = datetime.now(timezone.utc)
+
+    def current(self):
+        """Return (alert messages, time of last evaluation) without touching the database"""
+        with self._lock:
+            rows = list(self._alerts.values())
+            updated_at = self._updated_at
+        return [format_alert(row) for row in rows], updated_at
+
+    def snapshot(self):
+        """Return (alert payloads, broadcaster sequence) as one consistent view"""
+        with self._lock:
+            return [alert_payload(row) for row in self._alerts.values()], self.broadcaster.seq
+
+
+alert_broadcaster = AlertBroadcaster()
+alert_monitor = AlertMonitor(Config.ALERT_REFRESH_SECONDS, alert_broadcaster)
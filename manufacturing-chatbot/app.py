@@ -1,245 +1,570 @@
 import os
 import sys
-from flask import Flask, render_template, request, jsonify
-import mysql.connector
-from datetime import datetime, date
-import matplotlib
-matplotlib.use('Agg')  
-import matplotlib.pyplot as plt
+from flask import Flask, render_template, request, jsonify, g, send_file, stream_with_context, url_for
+from datetime import date, timedelta
 import io
-import base64
 import json
 
 
 sys.path.append(os.path.dirname(os.path.abspath('app.py')))
 
 try:
-    from database.config import get_db_connection
+    from database.config import Config
+    from database.backends import backend
+    from database.query_cache import query_cache
 except ImportError:
     print("Error: Could not import config. Make sure config.py exists in the same directory.")
     sys.exit(1)
 
+from alerts import alert_broadcaster, alert_monitor
+from cache import VersionedCache
+import ingest
+from pagination import DOWNTIME_HISTORY, MACHINE_HISTORY, decode_cursor, encode_cursor, page_size
+from charts import (RenderQueueFull, chart_cache, chart_key, get_production_chart, render_stats,
+                    trend_points, warm_up)
+from intents import MONTHS, IntentRouter
+from metrics import registry
+import oee
+from plant_state import plant_state
+import responses
+from singleflight import SingleFlight
+from timing import db_call, finish_request, server_timing_header, stage, start_request
+
 app = Flask(__name__)
 
-def generate_production_chart():
-    """Generate production trend chart"""
-    conn = None
+# SQL in the configured backend's dialect
+queries = backend.queries
+
+# Serialized /chatbot replies, served while the data they came from is unchanged
+reply_cache = VersionedCache(maxsize=Config.REPLY_CACHE_SIZE, ttl=Config.REPLY_CACHE_TTL)
+
+# Concurrent identical requests wait for one leader instead of repeating its work
+chatbot_flights = SingleFlight(Config.SINGLEFLIGHT_TIMEOUT)
+chart_flights = SingleFlight(Config.SINGLEFLIGHT_TIMEOUT)
+flights = {'chatbot': chatbot_flights, 'production_chart': chart_flights}
+
+def _pool_connections():
+    stats = backend.pool_stats()
+    return {('open',): stats['open'], ('idle',): stats['idle'], ('in_use',): stats['in_use']}
+
+def _pool_events():
+    stats = backend.pool_stats()
+    return {(event,): stats[event] for event in ('checkouts', 'waits', 'exhausted', 'created',
+                                                  'recycled', 'discarded', 'connect_errors',
+                                                  'statements_prepared', 'statements_reused')}
+
+def _route_events():
+    return {(node, event): stats[event] for node, stats in backend.route_stats().items()
+            for event in ('reads', 'writes', 'failovers', 'probe_errors')}
+
+def _replica_lag():
+    return {(node,): stats['lag'] for node, stats in backend.route_stats().items() if stats['lag'] is not None}
+
+if backend.name == 'mysql':
+    registry.callback('db_pool_connections', 'Pooled MySQL connections by state', _pool_connections, ('state',))
+    registry.callback('db_pool_events_total', 'Connection pool events', _pool_events, ('event',), kind='counter')
+    registry.callback('db_pool_wait_seconds_total', 'Time spent waiting for a pooled connection',
+                      lambda: {(): backend.pool_stats()['wait_seconds']}, kind='counter')
+    registry.callback('db_route_events_total', 'Connections handed out per database node',
+                      _route_events, ('node', 'event'), kind='counter')
+    registry.callback('db_replica_lag_seconds', 'Replication lag of each node at its last poll',
+                      _replica_lag, ('node',))
+    registry.callback('db_node_up', 'Whether each database node is taking connections',
+                      lambda: {(node,): int(stats['up']) for node, stats in backend.route_stats().items()},
+                      ('node',))
+registry.callback('chart_cache_events_total', 'Chart cache lookups',
+                  lambda: {(event,): chart_cache.stats()[event] for event in ('hits', 'misses', 'evictions')},
+                  ('event',), kind='counter')
+registry.callback('query_cache_events_total', 'Query cache lookups and table version checks',
+                  lambda: {(event,): query_cache.stats()[event]
+                           for event in ('hits', 'misses', 'stale', 'uncacheable', 'version_checks')},
+                  ('event',), kind='counter')
+registry.callback('reply_cache_events_total', 'Serialized chatbot reply lookups',
+                  lambda: {(event,): reply_cache.stats()[event] for event in ('hits', 'misses', 'stale')},
+                  ('event',), kind='counter')
+registry.callback('singleflight_events_total', 'Requests that led, or waited for, an identical request in flight',
+                  lambda: {(flight, event): group.stats()[event] for flight, group in flights.items()
+                           for event in ('leaders', 'coalesced', 'timeouts', 'errors')},
+                  ('flight', 'event'), kind='counter')
+registry.callback('query_cache_entries', 'Query results held in the cache',
+                  lambda: {(): query_cache.stats()['size']})
+registry.callback('plant_state_events_total', 'In-memory plant state polls and changes applied',
+                  lambda: {(event,): plant_state.stats()[event]
+                           for event in ('polls', 'full_loads', 'table_reloads', 'rows_merged', 'errors')},
+                  ('event',), kind='counter')
+registry.callback('ingest_buffered_events', 'Validated events waiting to be written',
+                  lambda: {(): ingest.ingest_buffer.stats()['buffered']})
+registry.callback('chart_render_inflight', 'Distinct chart renders queued or running',
+                  lambda: {(): render_stats()['inflight']})
+registry.callback('chart_render_events_total', 'Chart render requests by outcome',
+                  lambda: {(event,): render_stats()[event] for event in ('submitted', 'deduplicated', 'rejected', 'failed')},
+                  ('event',), kind='counter')
+
+def get_request_connection():
+    """Return the pooled connection shared by every query in the current request
+
+    Requests only read, so this may be a replica connection.
+    """
+    if 'db_conn' not in g:
+        g.db_conn = backend.connect(readonly=True)
+    return g.db_conn
+
+@app.teardown_appcontext
+def release_request_connection(exc):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.close()
+
+def fetch_chart_data(conn):
+    """Fetch the last 7 days of (date, output, downtime) totals, oldest first"""
+    cursor = conn.cursor(dictionary=True)
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return None
-            
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute('''
-            SELECT date, SUM(output_units) as total_output, SUM(downtime_minutes) as total_downtime
-            FROM Production 
-            GROUP BY date 
-            ORDER BY date DESC 
-            LIMIT 7
-        ''')
-        data = cursor.fetchall()
-        
+        with db_call('production_trend', queries.PRODUCTION_TREND):
+            cursor.execute(queries.PRODUCTION_TREND)
+            data = cursor.fetchall()
+    finally:
+        cursor.close()
+    return trend_points(data)
+
+def cursor_runner(cursor):
+    """run(name, sql, params) for the query cache; only queries that reach MySQL are timed as db calls"""
+    def run(query_name, statement, statement_params):
+        with db_call(query_name, statement):
+            cursor.execute(statement, statement_params)
+            return cursor.fetchall()
+    return run
+
+def cached_query(cursor, name, sql, params=()):
+    """Run a read through the query cache"""
+    return query_cache.fetch(cursor_runner(cursor), name, sql, params)
+
+def prepared_query(conn, name, sql, params=()):
+    """cached_query() through a prepared statement reused for the life of the pooled connection"""
+    def run(query_name, statement, statement_params):
+        cursor = conn.prepared(statement)
+        with db_call(query_name, statement):
+            cursor.execute(statement, statement_params)
+            return cursor.fetchall()
+    return query_cache.fetch(run, name, sql, params)
+
+@app.before_request
+def start_background_tasks():
+    if Config.CHART_WARM_UP:
+        # Also under a WSGI server, where __main__ below never runs
+        warm_up(wait=False)
+    alert_monitor.start()
+    plant_state.start()
+    start_request()
+
+@app.after_request
+def add_server_timing(response):
+    stages = g.get('stages')
+    if stages:
+        response.headers['Server-Timing'] = server_timing_header(stages)
+    finish_request(response)
+    return response
+
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/alerts')
+def current_alerts():
+    """Current downtime alerts, served from memory"""
+    messages, updated_at = alert_monitor.current()
+    return jsonify({"alerts": messages, "updated_at": updated_at.isoformat() if updated_at else None})
+
+def sse_event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+@app.route('/alerts/stream')
+def alert_stream():
+    """Server-Sent Events stream of new, changed and cleared downtime alerts
+
+    Every client reads the same in-memory event log fed by the alert monitor,
+    so connected dashboards never query MySQL. Each client holds a server
+    thread while connected, so this is for development and a few dashboards;
+    serve the stream from asgi.py, where an idle client is a suspended
+    coroutine, for more.
+    """
+    def generate():
+        yield f"retry: {Config.ALERT_STREAM_RETRY_MS}\n\n"
+        alerts, seq = alert_monitor.snapshot()
+        yield sse_event('snapshot', alerts, seq)
+        while True:
+            events = alert_broadcaster.wait(seq, Config.ALERT_STREAM_KEEPALIVE)
+            if events is None:
+                # Fell behind the retained history; resynchronise
+                alerts, seq = alert_monitor.snapshot()
+                yield sse_event('snapshot', alerts, seq)
+            elif not events:
+                yield ": keepalive\n\n"
+            else:
+                for seq, event, data in events:
+                    yield sse_event(event, data, seq)
+    
+    response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/ingest', methods=['POST'])
+def ingest_events():
+    """Accept production and downtime events as JSON or NDJSON (see ingest.py)
+
+    Answers 202 once valid events are buffered, or with ?wait=1, 200 once
+    they are written. Invalid events are listed under "rejected" and the
+    rest are still accepted.
+    """
+    with stage('validate'):
+        events, rejected = ingest.parse_events(request.get_data(), request.mimetype)
+        rows, invalid = ingest.validate(events)
+        rejected += invalid
+    accepted = sum(len(kind_rows) for kind_rows in rows.values())
+    result = {"accepted": accepted, "rejected": rejected}
+    if not accepted:
+        return jsonify(result), 400 if rejected else 200
+    
+    ingest.ingest_buffer.start()
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    try:
+        batch = ingest.ingest_buffer.submit(rows, urgent=wait)
+    except ingest.BufferFull:
+        return jsonify({"error": "Ingest buffer full", **result, "accepted": 0}), 503, {'Retry-After': '1'}
+    
+    if wait:
+        with stage('flush'):
+            result["written"] = ingest.ingest_buffer.wait(batch, Config.INGEST_WAIT_TIMEOUT)
+        return jsonify(result), 200 if result["written"] else 202
+    return jsonify(result), 202
+
+def chart_data():
+    """(connected, trend rows) read for the chart through this request's connection"""
+    conn = get_request_connection()
+    if conn is None:
+        return False, None
+    return True, fetch_chart_data(conn)
+
+@app.route('/charts/production-trend.png')
+def production_chart():
+    """Serve the trend chart with ETag/Last-Modified so unchanged charts revalidate as 304
+
+    Replies link it with ?v=<Production version>; the parameter only makes
+    the URL change with the data and is not read here.
+    """
+    try:
+        (connected, data), _ = chart_flights.do('production_trend', chart_data)
+        if not connected:
+            return "Database connection error", 503
         if not data:
-            return None
-            
-        dates = [row['date'].strftime('%m-%d') for row in data[::-1]]
-        production = [row['total_output'] for row in data[::-1]]
-        downtime = [row['total_downtime'] for row in data[::-1]]
-        
-        plt.figure(figsize=(10, 6))
-        
-        # Production trend
-        plt.subplot(2, 1, 1)
-        plt.plot(dates, production, marker='o', linewidth=2, markersize=6, color='blue')
-        plt.title('Production Trend (Last 7 Days)')
-        plt.ylabel('Output Units')
-        plt.grid(True, alpha=0.3)
+            return "No production data", 404
         
-        # Downtime trend
-        plt.subplot(2, 1, 2)
-        plt.bar(dates, downtime, color='red', alpha=0.7)
-        plt.title('Downtime Trend (Last 7 Days)')
-        plt.ylabel('Downtime Minutes')
-        plt.xlabel('Date')
-        plt.grid(True, alpha=0.3)
+        etag = chart_key(data)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
         
-        plt.tight_layout()
+        with stage('chart'):
+            png, rendered_at = get_production_chart(data, etag)
         
-        # Convert plot to base64 string
-        img = io.BytesIO()
-        plt.savefig(img, format='png', dpi=100, bbox_inches='tight')
-        img.seek(0)
-        plot_url = base64.b64encode(img.getvalue()).decode()
-        plt.close()
-        
-        return f"data:image/png;base64,{plot_url}"
+        return send_file(io.BytesIO(png), mimetype='image/png', etag=etag,
+                         last_modified=rendered_at, conditional=True)
         
+    except RenderQueueFull:
+        return "Chart renderer busy", 503, {'Retry-After': '1'}
     except Exception as e:
         print(f"Chart generation error: {e}")
-        return None
-    finally:
-        if conn and conn.is_connected():
+        return "Chart generation error", 500
+
+def stream_history(query, filters, endpoint, **url_args):
+    """Stream one keyset page of a history list as JSON (see pagination.py)
+
+    Rows come from an unbuffered cursor and are written as they arrive.
+    """
+    limit = page_size(request.args.get('limit', type=int))
+    after = request.args.get('after')
+    try:
+        after = decode_cursor(after, len(query.key_columns)) if after else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    conn = get_request_connection()
+    if conn is None:
+        return jsonify({"error": "Database connection error"}), 503
+    
+    sql, params = query.statement(filters, after, limit)
+    cursor = conn.cursor(dictionary=True)
+    with db_call(endpoint, sql):
+        cursor.execute(sql, params)
+    next_url = url_for(endpoint, limit=limit, **url_args)
+    
+    def generate():
+        try:
+            yield from query.stream(cursor, limit, next_url)
+        finally:
+            # Drop rows left unread if the client went away mid-page
+            conn.consume_results()
             cursor.close()
-            conn.close()
+    
+    return app.response_class(stream_with_context(generate()), mimetype='application/json')
 
-def check_downtime_alerts():
-    """Check for downtime alerts > 30 minutes"""
-    conn = None
+@app.route('/history/downtime')
+def downtime_history():
+    """Daily downtime for ?line=, newest first, in pages of ?limit= days"""
+    line_num = request.args.get('line', type=int)
+    if line_num is None:
+        return jsonify({"error": "line is required"}), 400
+    return stream_history(DOWNTIME_HISTORY, (line_num,), 'downtime_history', line=line_num)
+
+@app.route('/history/machines')
+def machine_history():
+    """Machine status by machine id, in pages of ?limit= machines"""
+    return stream_history(MACHINE_HISTORY, (), 'machine_history')
+
+router = IntentRouter()
+
+# Intents answered from the in-memory plant state once it has loaded (see
+# plant_state.py); a handler returning False falls back to the database
+snapshot_handlers = {}
+
+def from_plant_state(name):
+    def decorator(handler):
+        snapshot_handlers[name] = handler
+        return handler
+    return decorator
+
+def production_today_response(results, response, version):
+    response["response"] = responses.production_today(results)
+    if results:
+        # The Production version in the URL makes browsers fetch a new image
+        # once the data changes, instead of reusing the one on the page
+        response["chart"] = url_for('production_chart', v=version)
+
+@router.intent('production_today', requires=[('today',), ('production',)])
+def handle_production_today(cursor, slots, response):
+    version, = query_cache.data_version(cursor_runner(cursor), ('Production',))
+    with db_call('today_production', queries.TODAY_PRODUCTION):
+        cursor.execute(queries.TODAY_PRODUCTION)
+        results = cursor.fetchall()
+    
+    with stage('format'):
+        production_today_response(results, response, version)
+
+@from_plant_state('production_today')
+def production_today_from_snapshot(snapshot, slots, response):
+    results = snapshot.today_production(date.today())
+    if results is None:
+        return False
+    production_today_response(results, response, snapshot.versions.get('Production'))
+
+# Words that may name a period; each needs a production word as well. Words
+# like "may", "days" or "from" also appear in ordinary sentences, so the
+# report is only chosen when a date range or shift is actually extracted.
+REPORT_PERIODS = ('yesterday', 'week', 'month', 'days', 'shift', 'between', 'from',
+                  'morning', 'evening', 'night') + MONTHS
+
+@router.intent('production_report', requires=[('production', 'output', 'attainment', 'defect', 'kpi'), REPORT_PERIODS],
+               slots=('date_range', 'line', 'shift'), needs=('date_range', 'shift'))
+def handle_production_report(cursor, slots, response):
+    start, end = slots['date_range'] or (date.today(), date.today())
+    sql, params = queries.production_report(start, end, slots['line'], slots['shift'])
+    results = prepared_query(get_request_connection(), 'production_report', sql, params)
+    
+    with stage('format'):
+        response["response"] = responses.production_report(start, end, slots['line'], slots['shift'], results)
+
+@router.intent('oee', requires=[('oee', 'equipment effectiveness')], slots=('date_range', 'line', 'shift'))
+def handle_oee(cursor, slots, response):
+    today = date.today()
+    start, end = slots['date_range'] or (today - timedelta(days=Config.OEE_DEFAULT_DAYS - 1), today)
+    sql, params = queries.oee_shifts(start, end, slots['line'], slots['shift'])
+    # Plain tuples stack into a NumPy array in one call
+    tuple_cursor = get_request_connection().cursor()
     try:
-        conn = get_db_connection()
-        if conn is None:
-            return []
-            
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute('''
-            SELECT line_id, date, downtime_minutes 
-            FROM Production 
-            WHERE downtime_minutes > 30 AND date = CURDATE()
-        ''')
-        alerts = cursor.fetchall()
-        
-        alert_messages = []
-        for alert in alerts:
-            alert_messages.append(f"🚨 ALERT: Line {alert['line_id']} has {alert['downtime_minutes']} minutes downtime today!")
-        
-        return alert_messages
-        
-    except Exception as e:
-        print(f"Alert check error: {e}")
-        return []
+        rows = cached_query(tuple_cursor, 'oee_shifts', sql, params)
     finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        tuple_cursor.close()
+    
+    with stage('oee'):
+        group_by = 'shift' if slots['line'] is not None else 'line'
+        overall, groups = oee.report(rows, (group_by,))
+    with stage('format'):
+        response["response"] = responses.oee(start, end, slots['line'], slots['shift'], overall, groups, group_by)
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+@router.intent('maintenance', requires=[('maintenance', 'under maintenance')])
+def handle_maintenance(cursor, slots, response):
+    results = cached_query(cursor, 'maintenance_machines', queries.MAINTENANCE_MACHINES,
+                           (Config.MAINTENANCE_HISTORY_DAYS,))
+    
+    with stage('format'):
+        response["response"] = responses.maintenance(results)
+
+@from_plant_state('maintenance')
+def maintenance_from_snapshot(snapshot, slots, response):
+    response["response"] = responses.maintenance(snapshot.maintenance_machines(date.today()))
+
+@router.intent('line_downtime', requires=[('downtime',), ('line',)], slots=('line',))
+def handle_line_downtime(cursor, slots, response):
+    line_num = slots['line']
+    if line_num is None:
+        response["response"] = responses.MISSING_LINE
+        return
+    
+    # One row past the preview tells whether to offer the full history
+    results = cached_query(cursor, 'line_downtime', queries.LINE_DOWNTIME,
+                           (line_num, Config.DOWNTIME_PREVIEW_DAYS + 1))
+    preview = results[:Config.DOWNTIME_PREVIEW_DAYS]
+    
+    with stage('format'):
+        response["response"] = responses.line_downtime(line_num, preview)
+        if len(results) > len(preview):
+            response["more"] = url_for('downtime_history', line=line_num,
+                                       after=encode_cursor(DOWNTIME_HISTORY.key(preview[-1])))
+
+def machine_status_response(results, response):
+    preview = results[:Config.MACHINE_PREVIEW_ROWS]
+    response["response"] = responses.machine_status(preview)
+    if len(results) > len(preview):
+        response["more"] = url_for('machine_history', after=encode_cursor(MACHINE_HISTORY.key(preview[-1])))
+
+@router.intent('machine_status', requires=[('status', 'machine')])
+def handle_machine_status(cursor, slots, response):
+    results = cached_query(cursor, 'machine_status', queries.MACHINE_STATUS, (Config.MACHINE_PREVIEW_ROWS + 1,))
+    
+    with stage('format'):
+        machine_status_response(results, response)
+
+@from_plant_state('machine_status')
+def machine_status_from_snapshot(snapshot, slots, response):
+    machine_status_response(snapshot.machine_status(Config.MACHINE_PREVIEW_ROWS + 1), response)
+
+@router.intent('help', requires=[('help',)])
+def handle_help(cursor, slots, response):
+    response["response"] = responses.HELP
+
+router.compile()
+
+# SQL each intent's reply is built from; the versions of the tables they read
+# key its cached reply. Intents missing here are never cached.
+REPLY_SOURCES = {
+    'production_today': [queries.TODAY_PRODUCTION],
+    'production_report': list(queries.PRODUCTION_REPORT.values()),
+    'oee': list(queries.OEE_SHIFTS.values()),
+    'maintenance': [queries.MAINTENANCE_MACHINES],
+    'line_downtime': [queries.LINE_DOWNTIME],
+    'machine_status': [queries.MACHINE_STATUS],
+    'help': [],
+    'unknown': [],
+}
+_reply_tables = {}
+
+def reply_tables(intent_name):
+    """Sorted tables an intent's reply reads, () if none, or None if it must not be cached"""
+    if intent_name not in _reply_tables:
+        tables = set()
+        for sql in REPLY_SOURCES.get(intent_name, [None]):
+            sql_tables = query_cache.tables(sql) if sql is not None else None
+            if sql_tables is None:
+                tables = None
+                break
+            tables.update(sql_tables)
+        _reply_tables[intent_name] = tuple(sorted(tables)) if tables is not None else None
+    return _reply_tables[intent_name]
+
+def json_reply(body):
+    return app.response_class(body, mimetype='application/json')
+
+def render_reply(key, version, response):
+    """jsonify() the reply to bytes, keeping them for the next request with the same key and version"""
+    body = jsonify(response).get_data()
+    if version is not None:
+        reply_cache.set(key, version, body)
+    return body
+
+def answer(intent, slots, key):
+    """Serialized reply to a classified message, and the request outcome if it was not answered"""
+    response = {"response": "", "chart": None, "more": None}
+    today = date.today()
+    
+    # Answer from memory when the plant state can, without a connection
+    snapshot_handler = snapshot_handlers.get(g.intent)
+    snapshot = plant_state.snapshot() if snapshot_handler is not None else None
+    if snapshot is not None:
+        version = ('plant_state', snapshot.serial, today)
+        body = reply_cache.get(key, version)
+        if body is not None:
+            return body, None
+        with stage('plant_state'):
+            answered = snapshot_handler(snapshot, slots, response) is not False
+        if answered:
+            with stage('format'):
+                return render_reply(key, version, response), None
+    
+    tables = reply_tables(g.intent)
+    if tables == ():
+        # Fixed text; no data to read
+        body = reply_cache.get(key, today)
+        if body is not None:
+            return body, None
+        if intent is not None:
+            intent.handler(None, slots, response)
+        else:
+            response["response"] = responses.FALLBACK
+        with stage('format'):
+            return render_reply(key, today, response), None
+    
+    with stage('connect'):
+        conn = get_request_connection()
+    if conn is None:
+        response["response"] = responses.DB_UNAVAILABLE
+        return jsonify(response).get_data(), 'db_unavailable'
+    
+    cursor = conn.cursor(dictionary=True)
+    try:
+        version = None
+        if tables is not None:
+            # Taken before the handler runs: a write racing it only costs a miss next time
+            version = ('db', query_cache.data_version(cursor_runner(cursor), tables), today)
+            body = reply_cache.get(key, version)
+            if body is not None:
+                return body, None
+        
+        intent.handler(cursor, slots, response)
+    finally:
+        cursor.close()
+    
+    with stage('format'):
+        return render_reply(key, version, response), None
 
 @app.route('/chatbot', methods=['POST'])
 def chatbot():
-    conn = None
     try:
         user_message = request.json.get('message', '').lower()
-        response = {"response": "", "chart": None, "alerts": []}
         
-        # Check for alerts first
-        alerts = check_downtime_alerts()
-        if alerts:
-            response["alerts"] = alerts
+        with stage('classify'):
+            intent, slots = router.classify(user_message)
+        g.intent = intent.name if intent is not None else 'unknown'
         
-        conn = get_db_connection()
-        if conn is None:
-            response["response"] = "❌ Database connection error. Please check if MySQL is running and database is setup."
-            return jsonify(response)
-            
-        cursor = conn.cursor(dictionary=True)
+        # Identical questions in flight at once share one answer (see singleflight.py)
+        key = (g.intent, tuple(slots.items()))
+        (body, outcome), _ = chatbot_flights.do(key, lambda: answer(intent, slots, key))
+        if outcome is not None:
+            g.outcome = outcome
+        return json_reply(body)
         
-        # Keyword-based response logic
-        if 'today' in user_message and 'production' in user_message:
-            cursor.execute('''
-                SELECT line_id, output_units, downtime_minutes 
-                FROM Production 
-                WHERE date = CURDATE()
-            ''')
-            results = cursor.fetchall()
-            
-            if results:
-                response_text = "📊 Today's Production:\n"
-                for row in results:
-                    response_text += f"Line {row['line_id']}: {row['output_units']} units, Downtime: {row['downtime_minutes']} min\n"
-                response["response"] = response_text
-                response["chart"] = generate_production_chart()
-            else:
-                response["response"] = "No production data found for today."
-                
-        elif 'maintenance' in user_message or 'under maintenance' in user_message:
-            cursor.execute('''
-                SELECT m.name, m.status, mt.schedule_date, mt.remarks 
-                FROM Machines m 
-                LEFT JOIN Maintenance mt ON m.machine_id = mt.machine_id 
-                WHERE m.status = 'Maintenance' OR mt.schedule_date <= CURDATE()
-            ''')
-            results = cursor.fetchall()
-            
-            if results:
-                response_text = "🔧 Machines Under Maintenance:\n"
-                for row in results:
-                    response_text += f"• {row['name']} - Status: {row['status']}\n"
-                    if row['schedule_date']:
-                        response_text += f"  Scheduled: {row['schedule_date']} - {row['remarks']}\n"
-                response["response"] = response_text
-            else:
-                response["response"] = "No machines currently under maintenance."
-                
-        elif 'downtime' in user_message and 'line' in user_message:
-            # Extract line number
-            line_num = None
-            words = user_message.split()
-            for i, word in enumerate(words):
-                if word == 'line' and i+1 < len(words):
-                    try:
-                        line_num = int(words[i+1])
-                        break
-                    except ValueError:
-                        pass
-            
-            if line_num:
-                cursor.execute('''
-                    SELECT date, downtime_minutes 
-                    FROM Production 
-                    WHERE line_id = %s 
-                    ORDER BY date DESC 
-                    LIMIT 5
-                ''', (line_num,))
-                results = cursor.fetchall()
-                
-                if results:
-                    response_text = f"⏱️ Downtime Report for Line {line_num}:\n"
-                    for row in results:
-                        response_text += f"• {row['date']}: {row['downtime_minutes']} minutes\n"
-                    response["response"] = response_text
-                else:
-                    response["response"] = f"No downtime data found for Line {line_num}."
-            else:
-                response["response"] = "Please specify which line (e.g., 'Line 1')"
-                
-        elif 'status' in user_message or 'machine' in user_message:
-            cursor.execute('SELECT name, status, last_maintenance FROM Machines')
-            results = cursor.fetchall()
-            
-            if results:
-                response_text = "🏭 Machine Status:\n"
-                for row in results:
-                    status_icon = "🟢" if row['status'] == 'Running' else "🔴" if row['status'] == 'Stopped' else "🟡"
-                    response_text += f"{status_icon} {row['name']}: {row['status']} (Last Maintenance: {row['last_maintenance']})\n"
-                response["response"] = response_text
-            else:
-                response["response"] = "No machine data found."
-                
-        elif 'help' in user_message:
-            response["response"] = """🤖 Available Commands:
-• "Show today's production" - Get today's production data
-• "List machines under maintenance" - View maintenance schedule
-• "Show downtime report for Line X" - Get downtime history
-• "Machine status" - Check all machine status
-• "Help" - Show this help message"""
-                
-        else:
-            response["response"] = "I'm not sure I understand. Try asking about:\n• Production data\n• Maintenance schedules\n• Downtime reports\n• Machine status\n\nType 'help' for all available commands."
-        
-        return jsonify(response)
-        
-    except mysql.connector.Error as e:
-        return jsonify({"response": f"❌ Database error: {str(e)}", "chart": None, "alerts": []})
+    except backend.Error as e:
+        g.outcome = 'db_error'
+        return jsonify({"response": f"❌ Database error: {str(e)}", "chart": None})
     except Exception as e:
-        return jsonify({"response": f"❌ Error processing request: {str(e)}", "chart": None, "alerts": []})
-    finally:
-        if conn and conn.is_connected():
-            cursor.close()
-            conn.close()
+        g.outcome = 'error'
+        return jsonify({"response": f"❌ Error processing request: {str(e)}", "chart": None})
 
 if __name__ == '__main__':
     print("🚀 Starting Manufacturing Operations Chatbot...")
@@ -0,0 +1,545 @@
+"""Async serving mode: the chatbot as an ASGI app on Quart and aiomysql
+
+Handlers await MySQL through an aiomysql pool instead of blocking a thread,
+so one worker process holds hundreds of in-flight chats while only
+Config.POOL_SIZE queries run at once. Independent queries within a request
+run concurrently, and chart renders are awaited on the render process pool
+in charts.py without holding the event loop.
+
+    hypercorn asgi:app --bind 0.0.0.0:5000
+
+Intent keywords, reply text, alerts, chart cache, the in-memory plant
+state, the serialized reply cache and metrics are shared with the Flask
+app in app.py.
+"""
+import asyncio
+import functools
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+import aiomysql
+from quart import Quart, Response, g, jsonify, render_template, request, url_for
+
+from database.backends import backend
+from database.config import Config
+from database import queries
+from database.query_cache import query_cache
+from alerts import alert_broadcaster, alert_monitor
+from app import flights, reply_cache, reply_tables, router as flask_router
+import ingest
+from pagination import DOWNTIME_HISTORY, MACHINE_HISTORY, decode_cursor, encode_cursor, page_size
+from charts import RenderQueueFull, chart_cache, chart_key, submit_render, trend_points, warm_up
+from metrics import DB_QUERY_SECONDS, registry
+import oee
+from plant_state import plant_state
+import responses
+from singleflight import AsyncSingleFlight
+import timing
+from timing import add_stage, record_request, server_timing_header
+
+if backend.name != 'mysql':
+    raise RuntimeError("asgi.py serves MySQL only; run app.py for DB_BACKEND=sqlite")
+
+app = Quart(__name__)
+
+# Concurrent identical questions await one leader's answer; counted under
+# the same singleflight_events_total{flight="chatbot"} series as app.py
+chatbot_flights = flights['chatbot'] = AsyncSingleFlight(Config.SINGLEFLIGHT_TIMEOUT)
+
+
+class DatabaseUnavailable(Exception):
+    pass
+
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+async def get_pool():
+    """Create the aiomysql pool on first use; retried on the next request if MySQL is down"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                try:
+                    _pool = await aiomysql.create_pool(
+                        host=Config.MYSQL_HOST,
+                        port=Config.MYSQL_PORT,
+                        user=Config.MYSQL_USER,
+                        password=Config.MYSQL_PASSWORD,
+                        db=Config.MYSQL_DATABASE,
+                        minsize=Config.POOL_PREWARM,
+                        maxsize=Config.POOL_SIZE,
+                        pool_recycle=Config.POOL_MAX_LIFETIME,
+                        autocommit=True,
+                    )
+                except aiomysql.Error as e:
+                    print(f"Error connecting to MySQL: {e}")
+                    raise DatabaseUnavailable() from e
+    return _pool
+
+# timing.stage recording into Quart's request globals
+stage = functools.partial(timing.stage, context=g)
+
+async def fetch_all(name, sql, params=(), cursor_class=aiomysql.DictCursor):
+    """Run one query on a pooled connection; concurrent calls use separate connections"""
+    pool = await get_pool()
+    started = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), Config.POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise DatabaseUnavailable()
+    try:
+        async with conn.cursor(cursor_class) as cursor:
+            await cursor.execute(sql, params or None)
+            results = await cursor.fetchall()
+    finally:
+        pool.release(conn)
+        seconds = time.perf_counter() - started
+        DB_QUERY_SECONDS.observe(seconds, query=name)
+        add_stage(g, 'db', seconds)
+        g.setdefault('queries', []).append((name, sql, seconds))
+    return results
+
+
+async def cached_fetch_all(name, sql, params=(), cursor_class=aiomysql.DictCursor):
+    """fetch_all() through the query cache (see QueryCache.fetch)"""
+    key = query_cache.key(sql, params)
+    if key is None:
+        return await fetch_all(name, sql, params, cursor_class)
+    if query_cache.version_check_due():
+        query_cache.update_versions(await fetch_all('table_versions', queries.TABLE_VERSIONS))
+    results = query_cache.get(key)
+    if results is None:
+        versions = query_cache.versions(key)
+        results = await fetch_all(name, sql, params, cursor_class)
+        query_cache.put(key, versions, results)
+    return results
+
+async def get_production_chart(data, key):
+    """Return (png, rendered_at) without blocking the loop; concurrent requests share one render"""
+    entry = chart_cache.get(key)
+    if entry is None:
+        # shield() so a timed-out waiter doesn't cancel a render other requests share
+        render = asyncio.wrap_future(submit_render(data, key))
+        entry = await asyncio.wait_for(asyncio.shield(render), Config.CHART_RENDER_TIMEOUT + 2)
+    return entry
+
+
+class AlertRelay:
+    """Wakes async stream clients when the thread-based alert broadcaster publishes
+
+    A single thread blocks on the broadcaster and notifies an asyncio.Condition
+    on the event loop, so an idle /alerts/stream client is a suspended
+    coroutine rather than a blocked executor thread.
+    """
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self._loop = None
+        self._cond = None
+
+    def start(self, loop):
+        self._loop = loop
+        self._cond = asyncio.Condition()
+        threading.Thread(target=self._run, name='alert-relay', daemon=True).start()
+
+    def _run(self):
+        seq = self.broadcaster.seq
+        while True:
+            events = self.broadcaster.wait(seq, Config.ALERT_STREAM_KEEPALIVE)
+            if events is None or events:
+                seq = self.broadcaster.seq
+                asyncio.run_coroutine_threadsafe(self._notify(), self._loop)
+
+    async def _notify(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    async def wait(self, last_seq, timeout):
+        """Async counterpart of AlertBroadcaster.wait()"""
+        try:
+            async with self._cond:
+                await asyncio.wait_for(self._cond.wait_for(lambda: self.broadcaster.seq != last_seq), timeout)
+        except asyncio.TimeoutError:
+            return []
+        return self.broadcaster.wait(last_seq, 0)
+
+alert_relay = AlertRelay(alert_broadcaster)
+
+
+@app.before_serving
+async def start_background_tasks():
+    if Config.CHART_WARM_UP:
+        warm_up(wait=False)
+    alert_monitor.start()
+    plant_state.start()
+    alert_relay.start(asyncio.get_running_loop())
+
+@app.after_serving
+async def close_pool():
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+
+@app.before_request
+async def start_request():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+async def finish_request(response):
+    stages = g.get('stages')
+    if stages:
+        response.headers['Server-Timing'] = server_timing_header(stages)
+    started = g.get('request_started')
+    if started is not None:
+        outcome = g.get('outcome', 'ok' if response.status_code < 500 else 'error')
+        record_request(request.endpoint or 'unknown', g.get('intent'), outcome, time.perf_counter() - started,
+                       g.get('stages', {}), g.get('queries', []))
+    return response
+
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@app.route('/metrics')
+async def prometheus_metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/alerts')
+async def current_alerts():
+    """Current downtime alerts, served from memory"""
+    messages, updated_at = alert_monitor.current()
+    return jsonify({"alerts": messages, "updated_at": updated_at.isoformat() if updated_at else None})
+
+def sse_event(event, data, event_id=None):
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return "\n".join(lines) + "\n\n"
+
+@app.route('/alerts/stream')
+async def alert_stream():
+    """Server-Sent Events stream of new, changed and cleared downtime alerts"""
+    async def generate():
+        yield f"retry: {Config.ALERT_STREAM_RETRY_MS}\n\n".encode()
+        alerts, seq = alert_monitor.snapshot()
+        yield sse_event('snapshot', alerts, seq).encode()
+        while True:
+            events = await alert_relay.wait(seq, Config.ALERT_STREAM_KEEPALIVE)
+            if events is None:
+                # Fell behind the retained history; resynchronise
+                alerts, seq = alert_monitor.snapshot()
+                yield sse_event('snapshot', alerts, seq).encode()
+            elif not events:
+                yield b": keepalive\n\n"
+            else:
+                for seq, event, data in events:
+                    yield sse_event(event, data, seq).encode()
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.timeout = None
+    return response
+
+@app.route('/ingest', methods=['POST'])
+async def ingest_events():
+    """Accept production and downtime events as JSON or NDJSON (see app.ingest_events)"""
+    with stage('validate'):
+        events, rejected = ingest.parse_events(await request.get_data(), request.mimetype)
+        rows, invalid = ingest.validate(events)
+        rejected += invalid
+    accepted = sum(len(kind_rows) for kind_rows in rows.values())
+    result = {"accepted": accepted, "rejected": rejected}
+    if not accepted:
+        return jsonify(result), 400 if rejected else 200
+
+    ingest.ingest_buffer.start()
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    try:
+        batch = ingest.ingest_buffer.submit(rows, urgent=wait)
+    except ingest.BufferFull:
+        return jsonify({"error": "Ingest buffer full", **result, "accepted": 0}), 503, {'Retry-After': '1'}
+
+    if wait:
+        with stage('flush'):
+            result["written"] = await asyncio.to_thread(ingest.ingest_buffer.wait, batch, Config.INGEST_WAIT_TIMEOUT)
+        return jsonify(result), 200 if result["written"] else 202
+    return jsonify(result), 202
+
+@app.route('/charts/production-trend.png')
+async def production_chart():
+    """Serve the trend chart with ETag/Last-Modified so unchanged charts revalidate as 304"""
+    try:
+        data = trend_points(await fetch_all('production_trend', queries.PRODUCTION_TREND))
+        if not data:
+            return "No production data", 404
+
+        etag = chart_key(data)
+        if request.if_none_match.contains(etag):
+            response = Response(b'', status=304)
+            response.set_etag(etag)
+            return response
+
+        with stage('chart'):
+            png, rendered_at = await get_production_chart(data, etag)
+
+        response = Response(png, mimetype='image/png')
+        response.set_etag(etag)
+        response.last_modified = rendered_at
+        return response
+
+    except DatabaseUnavailable:
+        return "Database connection error", 503
+    except RenderQueueFull:
+        return "Chart renderer busy", 503, {'Retry-After': '1'}
+    except Exception as e:
+        print(f"Chart generation error: {e}")
+        return "Chart generation error", 500
+
+async def stream_history(query, filters, endpoint, **url_args):
+    """Stream one keyset page of a history list from a server-side cursor (see app.stream_history)"""
+    limit = page_size(request.args.get('limit', type=int))
+    after = request.args.get('after')
+    try:
+        after = decode_cursor(after, len(query.key_columns)) if after else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        pool = await get_pool()
+        conn = await asyncio.wait_for(pool.acquire(), Config.POOL_TIMEOUT)
+    except (DatabaseUnavailable, asyncio.TimeoutError):
+        return jsonify({"error": "Database connection error"}), 503
+
+    sql, params = query.statement(filters, after, limit)
+    cursor = conn.cursor(aiomysql.SSDictCursor)
+    try:
+        started = time.perf_counter()
+        await cursor.execute(sql, params)
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, query=endpoint)
+    except BaseException:
+        await cursor.close()
+        pool.release(conn)
+        raise
+    next_url = url_for(endpoint, limit=limit, **url_args)
+
+    async def generate():
+        try:
+            async for chunk in query.astream(cursor, limit, next_url):
+                yield chunk.encode()
+        finally:
+            # Closing an unbuffered cursor drains rows left unread if the client went away
+            await cursor.close()
+            pool.release(conn)
+
+    return Response(generate(), mimetype='application/json')
+
+@app.route('/history/downtime')
+async def downtime_history():
+    """Daily downtime for ?line=, newest first, in pages of ?limit= days"""
+    line_num = request.args.get('line', type=int)
+    if line_num is None:
+        return jsonify({"error": "line is required"}), 400
+    return await stream_history(DOWNTIME_HISTORY, (line_num,), 'downtime_history', line=line_num)
+
+@app.route('/history/machines')
+async def machine_history():
+    """Machine status by machine id, in pages of ?limit= machines"""
+    return await stream_history(MACHINE_HISTORY, (), 'machine_history')
+
+
+# Intent handlers: the same intents as app.py, awaiting their queries
+
+def production_today_response(results, response, version):
+    response["response"] = responses.production_today(results)
+    if results:
+        # The version in the URL makes browsers fetch a new image once the
+        # data changes, instead of reusing the one on the page
+        response["chart"] = url_for('production_chart', v=version)
+
+async def handle_production_today(slots, response):
+    # The trend query only feeds the chart, so fetch it alongside and start
+    # rendering before the browser asks for the image
+    results, trend = await asyncio.gather(
+        fetch_all('today_production', queries.TODAY_PRODUCTION),
+        fetch_all('production_trend', queries.PRODUCTION_TREND),
+    )
+    data = trend_points(trend)
+    key = chart_key(data)
+    with stage('format'):
+        production_today_response(results, response, key)
+    if results and data:
+        if chart_cache.get(key) is None:
+            try:
+                submit_render(data, key)
+            except RenderQueueFull:
+                pass  # the image request will retry
+
+async def handle_production_report(slots, response):
+    # aiomysql has no server-side prepared statements; the fixed statement
+    # texts still share query cache entries with the Flask app
+    start, end = slots['date_range'] or (date.today(), date.today())
+    sql, params = queries.production_report(start, end, slots['line'], slots['shift'])
+    results = await cached_fetch_all('production_report', sql, params)
+    with stage('format'):
+        response["response"] = responses.production_report(start, end, slots['line'], slots['shift'], results)
+
+async def handle_oee(slots, response):
+    today = date.today()
+    start, end = slots['date_range'] or (today - timedelta(days=Config.OEE_DEFAULT_DAYS - 1), today)
+    sql, params = queries.oee_shifts(start, end, slots['line'], slots['shift'])
+    rows = await cached_fetch_all('oee_shifts', sql, params, aiomysql.Cursor)
+    with stage('oee'):
+        group_by = 'shift' if slots['line'] is not None else 'line'
+        overall, groups = oee.report(rows, (group_by,))
+    with stage('format'):
+        response["response"] = responses.oee(start, end, slots['line'], slots['shift'], overall, groups, group_by)
+
+async def handle_maintenance(slots, response):
+    results = await cached_fetch_all('maintenance_machines', queries.MAINTENANCE_MACHINES,
+                                     (Config.MAINTENANCE_HISTORY_DAYS,))
+    with stage('format'):
+        response["response"] = responses.maintenance(results)
+
+async def handle_line_downtime(slots, response):
+    line_num = slots['line']
+    if line_num is None:
+        response["response"] = responses.MISSING_LINE
+        return
+    results = await cached_fetch_all('line_downtime', queries.LINE_DOWNTIME,
+                                     (line_num, Config.DOWNTIME_PREVIEW_DAYS + 1))
+    preview = results[:Config.DOWNTIME_PREVIEW_DAYS]
+    with stage('format'):
+        response["response"] = responses.line_downtime(line_num, preview)
+        if len(results) > len(preview):
+            response["more"] = url_for('downtime_history', line=line_num,
+                                       after=encode_cursor(DOWNTIME_HISTORY.key(preview[-1])))
+
+def machine_status_response(results, response):
+    preview = results[:Config.MACHINE_PREVIEW_ROWS]
+    response["response"] = responses.machine_status(preview)
+    if len(results) > len(preview):
+        response["more"] = url_for('machine_history', after=encode_cursor(MACHINE_HISTORY.key(preview[-1])))
+
+async def handle_machine_status(slots, response):
+    results = await cached_fetch_all('machine_status', queries.MACHINE_STATUS, (Config.MACHINE_PREVIEW_ROWS + 1,))
+    with stage('format'):
+        machine_status_response(results, response)
+
+async def handle_help(slots, response):
+    response["response"] = responses.HELP
+
+router = flask_router.bind({
+    'production_today': handle_production_today,
+    'production_report': handle_production_report,
+    'oee': handle_oee,
+    'maintenance': handle_maintenance,
+    'line_downtime': handle_line_downtime,
+    'machine_status': handle_machine_status,
+    'help': handle_help,
+})
+router.compile()
+
+
+# Intents answered from the in-memory plant state (see plant_state.py), as in
+# app.py; returning False falls back to the database handler
+
+def production_today_from_snapshot(snapshot, slots, response):
+    results = snapshot.today_production(date.today())
+    if results is None:
+        return False
+    production_today_response(results, response, snapshot.versions.get('Production'))
+
+def maintenance_from_snapshot(snapshot, slots, response):
+    response["response"] = responses.maintenance(snapshot.maintenance_machines(date.today()))
+
+def machine_status_from_snapshot(snapshot, slots, response):
+    machine_status_response(snapshot.machine_status(Config.MACHINE_PREVIEW_ROWS + 1), response)
+
+snapshot_handlers = {
+    'production_today': production_today_from_snapshot,
+    'maintenance': maintenance_from_snapshot,
+    'machine_status': machine_status_from_snapshot,
+}
+
+async def data_version(tables):
+    """Current versions of tables for reply cache keys, re-read like cached_fetch_all() when due"""
+    if query_cache.version_check_due():
+        query_cache.update_versions(await fetch_all('table_versions', queries.TABLE_VERSIONS))
+    return query_cache.known_versions(tables)
+
+async def render_reply(key, version, response):
+    """Serialize the reply, keeping the bytes for the next request with the same key and version"""
+    body = await jsonify(response).get_data()
+    if version is not None:
+        reply_cache.set(key, version, body)
+    return body
+
+async def answer(intent, slots, key):
+    """Serialized reply to a classified message, from the reply cache when its data is unchanged"""
+    response = {"response": "", "chart": None, "more": None}
+    today = date.today()
+
+    # Answer from memory when the plant state can, without a query
+    snapshot_handler = snapshot_handlers.get(g.intent)
+    snapshot = plant_state.snapshot() if snapshot_handler is not None else None
+    if snapshot is not None:
+        version = ('plant_state', snapshot.serial, today)
+        body = reply_cache.get(key, version)
+        if body is not None:
+            return body
+        with stage('plant_state'):
+            answered = snapshot_handler(snapshot, slots, response) is not False
+        if answered:
+            with stage('format'):
+                return await render_reply(key, version, response)
+
+    # Keyed like app.py's replies: fixed text by date, the rest by table versions
+    tables = reply_tables(g.intent)
+    version = None
+    if tables == ():
+        version = today
+    elif tables is not None:
+        version = ('db', await data_version(tables), today)
+    if version is not None:
+        body = reply_cache.get(key, version)
+        if body is not None:
+            return body
+
+    if intent is not None:
+        await intent.handler(slots, response)
+    else:
+        response["response"] = responses.FALLBACK
+    with stage('format'):
+        return await render_reply(key, version, response)
+
+@app.route('/chatbot', methods=['POST'])
+async def chatbot():
+    try:
+        user_message = (await request.get_json()).get('message', '').lower()
+
+        with stage('classify'):
+            intent, slots = router.classify(user_message)
+        g.intent = intent.name if intent is not None else 'unknown'
+
+        # Identical questions in flight at once share one answer (see singleflight.py)
+        key = (g.intent, tuple(slots.items()))
+        body, _ = await chatbot_flights.do(key, lambda: answer(intent, slots, key))
+        return Response(body, mimetype='application/json')
+
+    except DatabaseUnavailable:
+        g.outcome = 'db_unavailable'
+        return jsonify({"response": responses.DB_UNAVAILABLE, "chart": None})
+    except aiomysql.Error as e:
+        g.outcome = 'db_error'
+        return jsonify({"response": f"❌ Database error: {str(e)}", "chart": None})
+    except Exception as e:
+        g.outcome = 'error'
+        return jsonify({"response": f"❌ Error processing request: {str(e)}", "chart": None})
+
+if __name__ == '__main__':
+    print("🚀 Starting Manufacturing Operations Chatbot (async)...")
+    print("📊 Open http://localhost:5000 in your browser")
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,59 @@
+"""Micro-benchmark for intent classification throughput
+
+Runs the chatbot's intent router over a mix of messages, then repeats the
+run with hundreds of extra synthetic intents registered to show that
+classification cost stays flat as intents are added.
+
+    python benchmarks/bench_intents.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from intents import IntentRouter
+
+MESSAGES = [
+    "show today's production",
+    "list machines under maintenance",
+    "show downtime report for line 1",
+    "machine status",
+    "help",
+    "what was the downtime on line 2 yesterday night shift",
+    "is machine c running",
+    "tell me a joke",
+]
+
+def build_router(extra_intents=0):
+    from app import router as app_router
+    router = IntentRouter()
+    for intent in app_router.intents:
+        router.register(intent.name, intent.requires, intent.slots, intent.handler)
+    for i in range(extra_intents):
+        router.register(f'synthetic_{i}', [(f'widget{i}', f'gadget{i}'), (f'report{i}',)])
+    router.compile()
+    return router
+
+def bench(router, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            router.classify(message)
+    elapsed = time.perf_counter() - started
+    return iterations * len(MESSAGES) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    for extra in (0, 100, 1000):
+        router = build_router(extra)
+        rate = bench(router, args.iterations)
+        print(f"{len(router.intents):>5} intents: {rate:,.0f} classifications/sec "
+              f"({1e6 / rate:.2f} µs each)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""End-to-end load test for the /chatbot endpoint
+
+Replays a weighted mix of chatbot questions at a fixed concurrency, either
+in-process through the Flask test client (default) or against a running
+server with --url, and prints a JSON report with throughput, p50/p95/p99
+latency per intent and the per-stage split the app reports in its
+Server-Timing header. Chart URLs in replies are fetched like the browser
+would, so chart rendering shows up as its own stage.
+
+Load realistic data first, e.g. `python database/setup_database.py --bulk`.
+In-process runs can also target the embedded SQLite backend, loaded with
+`setup_database.py --bulk --backend sqlite`, by passing --backend sqlite.
+
+    python benchmarks/bench_load.py --requests 2000 --concurrency 16 --out before.json
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import Config
+from timing import parse_server_timing
+
+# (name, weight, message); a message of None means GET /alerts
+DEFAULT_MIX = [
+    ('production', 30, "Show today's production"),
+    ('maintenance', 15, "List machines under maintenance"),
+    ('line_downtime', 20, "Show downtime report for Line {line}"),
+    ('machine_status', 20, "Machine status"),
+    ('help', 10, "Help"),
+    ('alerts', 5, None),
+]
+
+
+class TestClientTransport:
+    """Calls the app in-process; one Flask test client per worker thread"""
+
+    def __init__(self):
+        from app import app
+        self._app = app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        return client
+
+    def post_json(self, path, payload):
+        response = self._client().post(path, json=payload)
+        return response.status_code, response.get_json(silent=True), response.headers.get('Server-Timing')
+
+    def get(self, path):
+        response = self._client().get(path)
+        return response.status_code, None, response.headers.get('Server-Timing')
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def _send(self, req):
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                body = response.read()
+                return response.status, body, response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as e:
+            return e.code, b'', e.headers.get('Server-Timing')
+
+    def post_json(self, path, payload):
+        req = urllib.request.Request(self.base_url + path, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+        status, body, timing = self._send(req)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+        return status, data, timing
+
+    def get(self, path):
+        status, _, timing = self._send(urllib.request.Request(self.base_url + path))
+        return status, None, timing
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(latencies_ms):
+    values = sorted(latencies_ms)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values), 3),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3),
+    }
+
+
+def run(transport, mix, total_requests, concurrency, lines, fetch_charts, seed):
+    rng = random.Random(seed)
+    names = [name for name, _, _ in mix]
+    weights = [weight for _, weight, _ in mix]
+    messages = {name: message for name, _, message in mix}
+    plan = rng.choices(names, weights=weights, k=total_requests)
+
+    lock = threading.Lock()
+    next_index = [0]
+    latencies = defaultdict(list)
+    stages = defaultdict(list)
+    errors = defaultdict(int)
+
+    def worker():
+        while True:
+            with lock:
+                index = next_index[0]
+                if index >= len(plan):
+                    return
+                next_index[0] += 1
+            name = plan[index]
+            started = time.perf_counter()
+            if messages[name] is None:
+                status, data, timing = transport.get('/alerts')
+            else:
+                message = messages[name].format(line=rng.randint(1, lines))
+                status, data, timing = transport.post_json('/chatbot', {'message': message})
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            request_stages = parse_server_timing(timing)
+
+            chart_ms = None
+            if fetch_charts and status == 200 and data and data.get('chart'):
+                chart_started = time.perf_counter()
+                chart_status, _, chart_timing = transport.get(data['chart'])
+                chart_ms = (time.perf_counter() - chart_started) * 1000
+                if chart_status not in (200, 304):
+                    with lock:
+                        errors['chart'] += 1
+                for stage_name, ms in parse_server_timing(chart_timing).items():
+                    request_stages['chart_' + stage_name] = request_stages.get('chart_' + stage_name, 0) + ms
+
+            with lock:
+                latencies[name].append(elapsed_ms)
+                if chart_ms is not None:
+                    latencies['chart'].append(chart_ms)
+                if status != 200 or (data and str(data.get('response', '')).startswith('❌')):
+                    errors[name] += 1
+                for stage_name, ms in request_stages.items():
+                    stages[stage_name].append(ms)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    all_requests = [ms for name, values in latencies.items() if name != 'chart' for ms in values]
+    return {
+        'config': {
+            'requests': total_requests,
+            'concurrency': concurrency,
+            'fetch_charts': fetch_charts,
+            'mix': {name: weight for name, weight, _ in mix},
+            'seed': seed,
+        },
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_rps': round(len(all_requests) / wall_seconds, 2) if wall_seconds else None,
+        'latency': summarize(all_requests),
+        'by_intent': {name: summarize(values) for name, values in sorted(latencies.items())},
+        'stages': {name: summarize(values) for name, values in sorted(stages.items())},
+        'errors': dict(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process test client)')
+    parser.add_argument('--lines', type=int, default=2, help='Line numbers to ask about (1..N)')
+    parser.add_argument('--no-charts', action='store_true', help="Don't fetch chart images from replies")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='Also write the JSON report to this file')
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default=Config.DB_BACKEND,
+                        help='Storage backend of the in-process app')
+    parser.add_argument('--sqlite-path', default=Config.SQLITE_PATH, help='SQLite database file')
+    args = parser.parse_args()
+    # Before the app is imported, which creates the backend
+    Config.DB_BACKEND = args.backend
+    Config.SQLITE_PATH = args.sqlite_path
+
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport()
+    report = run(transport, DEFAULT_MIX, args.requests, args.concurrency, args.lines,
+                 not args.no_charts, args.seed)
+    report['target'] = args.url or 'in-process'
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
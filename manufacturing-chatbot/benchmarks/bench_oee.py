@@ -0,0 +1,75 @@
+"""Benchmark for OEE aggregation over millions of shift rows
+
+Generates synthetic Production shift rows (lines x days x 3 shifts) and
+times, as medians over several runs:
+
+- copying the rows into columns, from the list of tuples the MySQL
+  connector returns
+- aggregating them by each grouping the chatbot and reports use
+
+    python benchmarks/bench_oee.py [--rows N] [--lines N] [--runs N] [--skip-convert]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import oee
+
+GROUPINGS = [(), ('line',), ('shift',), ('line', 'shift'), ('day',), ('line', 'day'), ('line', 'day', 'shift')]
+
+
+def synthetic_rows(rows, lines, seed=0):
+    """(7, n) column array of plausible shift rows covering as many days as needed"""
+    rng = np.random.default_rng(seed)
+    days = -(-rows // (lines * 3))
+    index = np.arange(rows)
+    columns = np.empty((len(oee.COLUMNS), rows), dtype=np.int64)
+    columns[0] = index % lines + 1
+    columns[1] = 730000 + index // (lines * 3) % days
+    columns[2] = index // lines % 3 + 1
+    target = rng.integers(400, 600, rows)
+    columns[3] = (target * rng.uniform(0.6, 1.05, rows)).astype(np.int64)
+    columns[4] = target
+    columns[5] = rng.integers(0, 90, rows)
+    columns[6] = rng.integers(0, 25, rows)
+    return columns
+
+def timed(function, runs):
+    seconds = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--skip-convert', action='store_true', help='Skip timing the tuple -> column copy')
+    args = parser.parse_args()
+
+    columns = synthetic_rows(args.rows, args.lines)
+    print(f"{args.rows:,} shift rows, {args.lines} lines, {len(np.unique(columns[1])):,} days")
+
+    if not args.skip_convert:
+        tuples = list(map(tuple, columns.T.tolist()))
+        ms, _ = timed(lambda: oee.to_columns(tuples), args.runs)
+        print(f"  {ms:>8.1f} ms  to_columns from {len(tuples):,} tuples")
+        del tuples
+
+    for by in GROUPINGS:
+        ms, result = timed(lambda: oee.aggregate(columns, by), args.runs)
+        label = ' x '.join(by) or 'overall'
+        print(f"  {ms:>8.1f} ms  by {label} ({len(result['shifts']):,} groups)")
+
+if __name__ == '__main__':
+    main()
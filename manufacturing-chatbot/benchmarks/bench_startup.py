@@ -0,0 +1,99 @@
+"""Cold-start benchmark for the app modules
+
+Imports each module in a fresh interpreter under `python -X importtime`
+and reports the median wall time, the median cumulative import time of
+the module, its slowest direct imports and whether matplotlib was loaded.
+The chart stack should only load in the render workers, so it should not
+show up here.
+
+    python benchmarks/bench_startup.py [--runs N] [--top N] [--out startup.json] [module ...]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$')
+
+# Print whether the chart stack was loaded, after the import itself
+_PROBE = "import sys, {module}; print('matplotlib' in sys.modules)"
+
+
+def import_once(module):
+    """Import module in a new interpreter
+
+    Returns (wall seconds, cumulative us, {direct import: cumulative us}, matplotlib loaded).
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+                            cwd=ROOT, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+
+    # Children are listed before their parent, indented two spaces per level
+    total, direct, children = 0, {}, {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 1:
+            children[match.group(4)] = int(match.group(2))
+        elif depth == 0:
+            if match.group(4) == module:
+                total, direct = int(match.group(2)), children
+            children = {}
+    return wall, total, direct, result.stdout.strip().splitlines()[-1] == 'True'
+
+def bench(module, runs, top):
+    walls, totals, slowest = [], [], {}
+    matplotlib_loaded = False
+    for _ in range(runs):
+        wall, total, direct, loaded = import_once(module)
+        walls.append(wall)
+        totals.append(total)
+        matplotlib_loaded |= loaded
+        for name, us in direct.items():
+            slowest.setdefault(name, []).append(us)
+
+    ranked = sorted(((statistics.median(values), name) for name, values in slowest.items()), reverse=True)
+    return {
+        'module': module,
+        'runs': runs,
+        'wall_ms': round(statistics.median(walls) * 1000, 1),
+        'import_ms': round(statistics.median(totals) / 1000, 1),
+        'matplotlib_loaded': matplotlib_loaded,
+        'slowest_imports_ms': {name: round(us / 1000, 1) for us, name in ranked[:top]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=['app', 'asgi'])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest direct imports to list')
+    parser.add_argument('--out', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    reports = []
+    for module in args.modules:
+        report = bench(module, args.runs, args.top)
+        reports.append(report)
+        print(f"{module}: {report['wall_ms']} ms wall, {report['import_ms']} ms importing "
+              f"(median of {args.runs}), matplotlib loaded: {report['matplotlib_loaded']}")
+        for name, ms in report['slowest_imports_ms'].items():
+            print(f"  {ms:>8.1f} ms  {name}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(json.dumps(reports, indent=2) + '\n')
+
+if __name__ == '__main__':
+    main()
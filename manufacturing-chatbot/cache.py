@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize=128, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                self.evictions += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class VersionedCache:
+    """TTLCache of values that are only served while their data version still matches
+
+    One entry per key: storing a newer version replaces the older one, so
+    frequent writes do not push other keys out of the LRU.
+    """
+
+    def __init__(self, maxsize=128, ttl=300):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)  # key -> (version, value)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0}
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        with self._lock:
+            if entry is not None and entry[0] == version:
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            if entry is not None:
+                self._stats['stale'] += 1
+        return None
+
+    def set(self, key, version, value):
+        self._entries.set(key, (version, value))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=self._entries.stats()['size'])
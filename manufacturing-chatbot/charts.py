@@ -0,0 +1,251 @@
+"""Trend chart rendering in a pool of pre-forked worker processes
+
+Rendering is pure CPU under the GIL, so it runs in CHART_RENDER_WORKERS
+separate processes. Only those workers import matplotlib and load the font
+cache; the app process never does, so importing it stays cheap.
+
+The app process runs threads (alerts, plant state, replica checks, ingest
+flushes, requests) long before the first chart, and a fork copies any lock
+one of them holds into the child. So workers are never forked from it:
+they come from a forkserver, a fresh single-threaded process that has only
+imported this module, started on the first chart request or earlier via
+warm_up(). Like spawned processes, workers import the app's main module,
+so it must keep its `if __name__ == '__main__'` guard. Identical renders in
+flight share one job, at most CHART_RENDER_QUEUE distinct renders are queued or running (further
+requests get RenderQueueFull), and a job running past CHART_RENDER_TIMEOUT
+is interrupted inside its worker.
+"""
+import hashlib
+import io
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta, timezone
+
+from cache import TTLCache
+from database.config import Config
+
+TREND_DAYS = 7
+
+chart_cache = TTLCache(maxsize=Config.CHART_CACHE_SIZE, ttl=Config.CHART_CACHE_TTL)
+
+_render_pool = None
+_pool_lock = threading.RLock()
+_warm_pings = None  # Futures of warm_up()'s first call
+_inflight = {}  # chart key -> Future of the render in progress
+_inflight_lock = threading.Lock()
+_queue_slots = threading.BoundedSemaphore(Config.CHART_RENDER_QUEUE)
+_stats = {'submitted': 0, 'deduplicated': 0, 'rejected': 0, 'failed': 0}
+
+
+class RenderQueueFull(Exception):
+    """CHART_RENDER_QUEUE renders are already queued or running"""
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class TrendChartTemplate:
+    """Production/downtime figure built once per worker; renders only swap the data"""
+
+    def __init__(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        self.figure = Figure(figsize=(10, 6), dpi=100)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.output_ax, self.downtime_ax = self.figure.subplots(2, 1)
+        # Fixed margins instead of tight_layout() so a render is a single draw
+        self.figure.subplots_adjust(left=0.09, right=0.98, top=0.95, bottom=0.09, hspace=0.35)
+
+        # Production trend
+        self.line, = self.output_ax.plot([], [], marker='o', linewidth=2, markersize=6, color='blue')
+        self.output_ax.set_title(f'Production Trend (Last {TREND_DAYS} Days)')
+        self.output_ax.set_ylabel('Output Units')
+        self.output_ax.grid(True, alpha=0.3)
+
+        # Downtime trend
+        self.bars = self.downtime_ax.bar(range(TREND_DAYS), [0] * TREND_DAYS, color='red', alpha=0.7)
+        self.downtime_ax.set_title(f'Downtime Trend (Last {TREND_DAYS} Days)')
+        self.downtime_ax.set_ylabel('Downtime Minutes')
+        self.downtime_ax.set_xlabel('Date')
+        self.downtime_ax.grid(True, alpha=0.3)
+
+    def render(self, data):
+        data = data[-TREND_DAYS:]
+        positions = list(range(len(data)))
+        labels = [day.strftime('%m-%d') for day, _, _ in data]
+        production = [output for _, output, _ in data]
+        downtime = [minutes for _, _, minutes in data]
+
+        self.line.set_data(positions, production)
+        for i, bar in enumerate(self.bars):
+            visible = i < len(data)
+            bar.set_visible(visible)
+            bar.set_height(downtime[i] if visible else 0)
+
+        for ax in (self.output_ax, self.downtime_ax):
+            ax.set_xticks(positions)
+            ax.set_xticklabels(labels)
+            ax.set_xlim(-0.5, len(data) - 0.5)
+        self.output_ax.relim()
+        self.output_ax.autoscale_view(scalex=False)
+        self.downtime_ax.set_ylim(0, max(downtime + [1]) * 1.05)
+
+        img = io.BytesIO()
+        self.canvas.print_png(img)
+        return img.getvalue()
+
+
+# Worker process side
+
+_template = None
+
+def _on_render_timeout(signum, frame):
+    raise RenderTimeout(f"Chart render exceeded {Config.CHART_RENDER_TIMEOUT}s")
+
+def _init_worker():
+    """Pool initializer: build the figure and draw it once so fonts and the Agg canvas are loaded"""
+    global _template
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is handled by the parent
+    if hasattr(signal, 'SIGALRM'):
+        signal.signal(signal.SIGALRM, _on_render_timeout)
+    _template = TrendChartTemplate()
+    today = date.today()
+    _template.render([(today - timedelta(days=i), 0, 0) for i in range(TREND_DAYS - 1, -1, -1)])
+
+def _render(data):
+    """Runs in a worker: return (png, rendered_at), interrupted after CHART_RENDER_TIMEOUT"""
+    timer = hasattr(signal, 'setitimer')
+    if timer:
+        signal.setitimer(signal.ITIMER_REAL, Config.CHART_RENDER_TIMEOUT)
+    try:
+        png = _template.render(data)
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return png, datetime.now(timezone.utc).replace(microsecond=0)
+
+def _ping():
+    return True
+
+
+# Parent process side
+
+def _worker_context():
+    """Start method for render workers: forked from a forkserver, or spawned where there is none"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # The server preloads this module only, not the app's __main__
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _get_render_pool():
+    global _render_pool
+    if _render_pool is None:
+        with _pool_lock:
+            if _render_pool is None:
+                _render_pool = ProcessPoolExecutor(max_workers=Config.CHART_RENDER_WORKERS,
+                                                   mp_context=_worker_context(), initializer=_init_worker)
+    return _render_pool
+
+def warm_up(wait=True):
+    """Start the render workers ahead of the first chart request
+
+    Workers never inherit the caller's threads or locks (see above), so this
+    can run at any point; it only moves the start-up cost off the first
+    chart, and calls after the first do nothing. With wait=True it returns
+    once every worker has imported matplotlib and drawn the template.
+    """
+    global _warm_pings
+    pings = _warm_pings
+    if pings is None:
+        with _pool_lock:
+            if _warm_pings is None:
+                pool = _get_render_pool()
+                _warm_pings = [pool.submit(_ping) for _ in range(Config.CHART_RENDER_WORKERS)]
+            pings = _warm_pings
+    if wait:
+        for future in pings:
+            future.result()
+
+def _submit(data):
+    global _render_pool
+    pool = _get_render_pool()
+    try:
+        return pool.submit(_render, data)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool once
+        with _pool_lock:
+            if _render_pool is pool:
+                _render_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        return _get_render_pool().submit(_render, data)
+
+def trend_points(rows):
+    """Turn PRODUCTION_TREND rows (newest first) into [(date, output, downtime), ...] oldest first"""
+    return [(row['date'], int(row['total_output'] or 0), int(row['total_downtime'] or 0)) for row in rows[::-1]]
+
+def chart_key(data):
+    """Cache key for a chart: a digest of the aggregate rows it is drawn from"""
+    digest = hashlib.sha1()
+    for day, output, downtime in data:
+        digest.update(f"{day.isoformat()}|{output}|{downtime};".encode())
+    return digest.hexdigest()
+
+def _render_done(key, future):
+    failed = future.cancelled() or future.exception() is not None
+    if not failed:
+        chart_cache.set(key, future.result())
+    with _inflight_lock:
+        _inflight.pop(key, None)
+        if failed:
+            _stats['failed'] += 1
+    _queue_slots.release()
+
+def submit_render(data, key=None):
+    """Queue a render and return a Future of (png, rendered_at)
+
+    A render already in flight for the same key is shared instead of queued
+    again, and the result is stored in chart_cache when it finishes. Raises
+    RenderQueueFull when CHART_RENDER_QUEUE renders are already pending.
+    """
+    key = key or chart_key(data)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            _stats['deduplicated'] += 1
+            return future
+        if not _queue_slots.acquire(blocking=False):
+            _stats['rejected'] += 1
+            raise RenderQueueFull()
+        try:
+            future = _submit(data)
+        except BaseException:
+            _queue_slots.release()
+            raise
+        _inflight[key] = future
+        _stats['submitted'] += 1
+    future.add_done_callback(lambda done: _render_done(key, done))
+    return future
+
+def render_stats():
+    with _inflight_lock:
+        return dict(_stats, inflight=len(_inflight))
+
+def render_production_chart(data, key=None):
+    """Render [(date, output, downtime), ...] and return (png, rendered_at)"""
+    # A little over the worker's own timer to allow for queueing and transfer
+    return submit_render(data, key).result(timeout=Config.CHART_RENDER_TIMEOUT + 2)
+
+def get_production_chart(data, key=None):
+    """Return (png, rendered_at) for the data, rendering only on a cache miss"""
+    key = key or chart_key(data)
+    entry = chart_cache.get(key)
+    if entry is None:
+        entry = render_production_chart(data, key)
+    return entry
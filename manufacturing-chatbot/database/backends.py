@@ -0,0 +1,222 @@
+"""Storage backends: MySQL through the connection pool, or an embedded SQLite file
+
+Config.DB_BACKEND picks one for the process. Callers use `backend` only:
+
+    conn = backend.connect()          # None if the database is unreachable;
+                                      # readonly=True may be served by a replica
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(backend.queries.LINE_DOWNTIME, (line, limit))
+    ...
+    conn.close()                      # hands the connection back
+
+backend.queries is the module holding the SQL in that backend's dialect
+(database/queries.py or database/sqlite_queries.py, same names), and
+backend.Error / backend.IntegrityError are its driver's exceptions.
+
+The SQLite backend gives an edge kiosk the whole chatbot from one local
+file with no server or network hop. It runs in WAL mode so readers never
+block the ingest writer, keeps one connection per thread, and caches
+compiled statements per connection the way the MySQL pool keeps prepared
+statements. The async app (asgi.py) serves MySQL only.
+"""
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import mysql.connector
+
+from database import queries, sqlite_queries, sqlite_schema
+from database.config import Config
+from database.routing import get_router
+
+
+class MySQLBackend:
+    name = 'mysql'
+    queries = queries
+    Error = mysql.connector.Error
+    IntegrityError = mysql.connector.IntegrityError
+
+    def connect(self, readonly=False):
+        # Reads may go to a replica (see database/routing.py)
+        return get_router().connect(readonly)
+
+    def pool_stats(self):
+        return get_router().pool_stats()
+
+    def route_stats(self):
+        return get_router().stats()
+
+
+# DATE and DATETIME columns round-trip as date and datetime, like mysql.connector
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over sqlite3: %s placeholders, optional dict rows"""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self._dictionary = dictionary
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._conn.translate(sql), params or ())
+
+    def executemany(self, sql, rows):
+        """Run all rows in one transaction, so a failure applies none of them (as a multi-row INSERT on MySQL)"""
+        raw = self._conn.raw
+        started = not raw.in_transaction
+        if started:
+            raw.execute('BEGIN')
+        try:
+            self._cursor.executemany(self._conn.translate(sql), rows)
+        except BaseException:
+            if started:
+                raw.rollback()
+            raise
+        if started:
+            raw.commit()
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip([column[0] for column in self._cursor.description], row))
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if not self._dictionary:
+            return rows
+        names = [column[0] for column in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def __iter__(self):
+        if not self._dictionary:
+            return iter(self._cursor)
+        names = None
+        def rows():
+            nonlocal names
+            for row in self._cursor:
+                names = names or [column[0] for column in self._cursor.description]
+                yield dict(zip(names, row))
+        return rows()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """One thread's connection to the database file; close() keeps it open for that thread's next connect()"""
+
+    def __init__(self, path, statement_cache):
+        self.raw = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+                                   check_same_thread=False, cached_statements=statement_cache)
+        self.raw.execute('PRAGMA journal_mode = WAL')
+        # WAL with NORMAL sync is durable across application crashes, and
+        # commits no longer wait for an fsync
+        self.raw.execute('PRAGMA synchronous = NORMAL')
+        self.raw.execute('PRAGMA foreign_keys = ON')
+        self.raw.execute(f'PRAGMA busy_timeout = {int(Config.POOL_TIMEOUT * 1000)}')
+        self._translated = {}
+
+    def translate(self, sql):
+        """sql with %s placeholders rewritten to ?, memoized per statement text"""
+        translated = self._translated.get(sql)
+        if translated is None:
+            translated = self._translated[sql] = sql.replace('%s', '?')
+        return translated
+
+    def cursor(self, dictionary=False, **options):
+        return SQLiteCursor(self, dictionary)
+
+    def prepared(self, sql):
+        # sqlite3 already reuses the compiled statement for repeated SQL text
+        return SQLiteCursor(self, dictionary=True)
+
+    def consume_results(self):
+        pass
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.commit()
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.rollback()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.rollback()
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+    queries = sqlite_queries
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path, statement_cache=128):
+        self.path = path
+        self.statement_cache = statement_cache
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connect(self, readonly=False):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = SQLiteConnection(self.path, self.statement_cache)
+                self._ensure_schema(conn)
+            except sqlite3.Error as e:
+                print(f"Database connection error: {e}")
+                return None
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self, conn):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                # One writer at a time, so processes starting together don't race
+                conn.raw.execute('BEGIN IMMEDIATE')
+                cursor = conn.cursor()
+                try:
+                    sqlite_schema.create(cursor)
+                    conn.raw.commit()
+                except BaseException:
+                    conn.raw.rollback()
+                    raise
+                finally:
+                    cursor.close()
+                self._schema_ready = True
+
+    def pool_stats(self):
+        return None
+
+
+def create_backend(name=None):
+    name = name or Config.DB_BACKEND
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(Config.SQLITE_PATH, Config.PREPARED_STATEMENTS)
+    raise ValueError(f"Unknown DB_BACKEND '{name}' (expected 'mysql' or 'sqlite')")
+
+backend = create_backend()
@@ -1,26 +1,320 @@
 import mysql.connector
 import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
 
 class Config:
+    # Storage backend: 'mysql', or 'sqlite' for an embedded database file (see database/backends.py)
+    DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'manufacturing.db'))
+
     MYSQL_HOST = 'localhost'
     MYSQL_USER = 'root'
     MYSQL_PASSWORD = 'hello'  # Change to your MySQL password
     MYSQL_DATABASE = 'manufacturing_db'
     MYSQL_PORT = 3306
+    MYSQL_CONNECT_TIMEOUT = 3  # Seconds before an unreachable server counts as down
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DATABASE,
-            port=Config.MYSQL_PORT
-        )
-        return conn
-    except mysql.connector.Error as e:
-        print(f"Database connection error: {e}")
-        return None
-    
+    # Read replicas (see database/routing.py); writes always go to MYSQL_HOST
+    # unless it is down and a replica has been promoted
+    MYSQL_REPLICAS = []          # e.g. [{'host': 'replica-1', 'port': 3306, 'weight': 2}]
+    REPLICA_MAX_LAG = 5          # Seconds behind the primary before a replica stops taking reads
+    REPLICA_CHECK_SECONDS = 2    # How often replica lag and read_only are polled
+    REPLICA_RETRY_SECONDS = 10   # How long a node that failed to connect is skipped
+
+    # Connection pool
+    POOL_SIZE = 10             # Max open connections per worker process
+    POOL_PREWARM = 2           # Connections opened when the pool is created
+    POOL_TIMEOUT = 5           # Seconds to wait for a free connection
+    POOL_MAX_LIFETIME = 1800   # Recycle connections older than this (seconds)
+    POOL_PING_AFTER_IDLE = 10  # Ping connections idle longer than this before reuse
+    PREPARED_STATEMENTS = 32   # Server-side prepared statements kept per pooled connection
+
+    # Alerts
+    ALERT_DOWNTIME_MINUTES = 30  # Downtime per production row that raises an alert
+    ALERT_REFRESH_SECONDS = 30   # How often alerts are re-evaluated
+    ALERT_STREAM_KEEPALIVE = 15  # Seconds between keepalive comments on /alerts/stream
+    ALERT_STREAM_RETRY_MS = 5000 # Browser reconnect delay for the alert stream
+
+    # Instrumentation
+    SLOW_REQUEST_MS = 500        # Log requests slower than this; None disables the slow log
+    SLOW_REQUEST_LOG = None      # File for slow request JSON lines; None prints them
+
+    # Charts
+    CHART_CACHE_SIZE = 32      # Rendered charts kept in memory
+    CHART_CACHE_TTL = 3600     # Seconds before a cached chart is re-rendered
+    CHART_RENDER_WORKERS = 2   # Render processes; only these import matplotlib
+    CHART_RENDER_QUEUE = 8     # Distinct renders queued or running before requests get a 503
+    CHART_RENDER_TIMEOUT = 10  # Seconds a render may run before it is abandoned
+    CHART_WARM_UP = True       # Start render workers on the server's first request, not its first chart
+
+    # Ingestion
+    INGEST_BATCH_SIZE = 1000     # Buffered events that trigger a flush; also rows per INSERT
+    INGEST_FLUSH_SECONDS = 0.5   # Longest an event waits in the buffer
+    INGEST_MAX_BUFFER = 100000   # Buffered events before /ingest answers 503
+    INGEST_WAIT_TIMEOUT = 10     # Seconds /ingest?wait=1 waits for its events to be written
+
+    # History lists
+    DOWNTIME_PREVIEW_DAYS = 5    # Days in a downtime reply before "more"
+    MACHINE_PREVIEW_ROWS = 20    # Machines in a status reply before "more"
+    HISTORY_PAGE_SIZE = 50       # Default rows per /history page
+    HISTORY_MAX_PAGE_SIZE = 500  # Largest ?limit= accepted
+
+    # OEE
+    SHIFT_MINUTES = 480          # Planned production time per shift row
+    OEE_DEFAULT_DAYS = 7         # Days covered when an OEE question names no period
+
+    # Plant state (see plant_state.py)
+    PLANT_STATE_POLL_SECONDS = 2       # How often changes to machines, maintenance and today's totals are polled
+    PLANT_STATE_RELOAD_SECONDS = 300   # Full reload interval; also picks up deletes a poll missed
+    PLANT_STATE_OVERLAP_SECONDS = 5    # Re-read rows this far behind the watermark, for late commits
+    MAINTENANCE_HISTORY_DAYS = 30      # Completed maintenance scheduled longer ago is not reported or held in memory
+
+    # Reply cache
+    REPLY_CACHE_SIZE = 512         # Serialized chatbot replies, one per intent and slot values
+    REPLY_CACHE_TTL = 300          # Longest a reply is served without being rebuilt
+    SINGLEFLIGHT_TIMEOUT = 10      # Longest a request waits on an identical one in flight before running itself
+
+    # Query cache
+    QUERY_CACHE_SIZE = 256         # Cached query results
+    QUERY_CACHE_TTL = 300          # Longest a result is served without re-running the query
+    QUERY_CACHE_VERSION_CHECK = 1  # Seconds between TableVersion reads; bounds staleness after writes
+
+
+def _connect(host=None, port=None):
+    return mysql.connector.connect(
+        host=host or Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD,
+        database=Config.MYSQL_DATABASE,
+        port=port or Config.MYSQL_PORT,
+        connection_timeout=Config.MYSQL_CONNECT_TIMEOUT,
+        autocommit=True
+    )
+
+
+class PooledConnection:
+    """Checked-out pool connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql.connector.InterfaceError("Connection has been returned to the pool")
+        return getattr(self._raw, name)
+
+    def is_connected(self):
+        # The pool checks health on checkout, so avoid a ping round trip here
+        return self._raw is not None
 
+    def prepared(self, sql):
+        """Dictionary cursor holding sql as a server-side prepared statement
 
+        The cursor stays with the underlying connection across checkouts, so
+        a statement is prepared once per connection and later executions only
+        send parameters. Pass the same str object each time (a module-level
+        constant): the connector re-prepares whenever it gets a different one.
+        """
+        if self._raw is None:
+            raise mysql.connector.InterfaceError("Connection has been returned to the pool")
+        return self._pool.prepared_cursor(self._raw, sql)
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw, self._created_at)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe MySQL connection pool"""
+
+    def __init__(self, connect, size, prewarm=0, timeout=5, max_lifetime=1800, ping_after_idle=10,
+                 prepared_statements=32):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after_idle = ping_after_idle
+        self.prepared_statements = prepared_statements
+        self._idle = deque()  # (raw, created_at, released_at)
+        self._statements = weakref.WeakKeyDictionary()  # raw -> OrderedDict(sql -> prepared cursor)
+        self._open = 0
+        self.connect_failed_at = None  # monotonic time of the last failed connect, until one succeeds
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'exhausted': 0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'connect_errors': 0,
+            'statements_prepared': 0,
+            'statements_reused': 0,
+        }
+        for _ in range(min(prewarm, size)):
+            with self._cond:
+                self._open += 1
+            raw = self._open_connection()
+            if raw is None:
+                break
+            now = time.monotonic()
+            with self._cond:
+                self._idle.append((raw, now, now))
+
+    def _open_connection(self):
+        # Caller has already reserved a slot in self._open
+        try:
+            raw = self._connect()
+        except mysql.connector.Error as e:
+            print(f"Database connection error: {e}")
+            with self._cond:
+                self._open -= 1
+                self._stats['connect_errors'] += 1
+                self.connect_failed_at = time.monotonic()
+                self._cond.notify()
+            return None
+        with self._cond:
+            self._stats['created'] += 1
+            self.connect_failed_at = None
+        return raw
+
+    def _discard(self, raw, reason):
+        self._statements.pop(raw, None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._stats[reason] += 1
+            self._cond.notify()
+
+    def _is_healthy(self, raw, created_at, released_at):
+        now = time.monotonic()
+        if now - created_at > self.max_lifetime:
+            self._discard(raw, 'recycled')
+            return False
+        if now - released_at > self.ping_after_idle:
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                self._discard(raw, 'discarded')
+                return False
+        return True
+
+    def acquire(self):
+        """Check out a connection, or return None if the pool stays exhausted"""
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        started = time.monotonic()
+        while True:
+            with self._cond:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['exhausted'] += 1
+                        print("Database connection error: connection pool exhausted")
+                        return None
+                    if not waited:
+                        waited = True
+                        self._stats['waits'] += 1
+                    self._cond.wait(remaining)
+                if waited:
+                    self._stats['wait_seconds'] += time.monotonic() - started
+                    waited = False
+                    started = time.monotonic()
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    entry = None
+                    self._open += 1
+
+            if entry is not None:
+                raw, created_at, released_at = entry
+                if not self._is_healthy(raw, created_at, released_at):
+                    continue
+            else:
+                raw = self._open_connection()
+                if raw is None:
+                    return None
+                created_at = time.monotonic()
+
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return PooledConnection(self, raw, created_at)
+
+    def prepared_cursor(self, raw, sql):
+        """Prepared cursor for sql on a checked-out connection, least recently used evicted past the limit"""
+        # Only the thread holding raw touches its statements
+        statements = self._statements.get(raw)
+        if statements is None:
+            statements = self._statements[raw] = OrderedDict()
+        cursor = statements.get(sql)
+        if cursor is not None:
+            statements.move_to_end(sql)
+            reused = True
+        else:
+            cursor = statements[sql] = raw.cursor(prepared=True, dictionary=True)
+            reused = False
+            if len(statements) > self.prepared_statements:
+                # Closing the cursor deallocates its statement on the server
+                statements.popitem(last=False)[1].close()
+        with self._cond:
+            self._stats['statements_reused' if reused else 'statements_prepared'] += 1
+        return cursor
+
+    def release(self, raw, created_at):
+        """Return a connection to the pool, dropping it if it is broken or too old"""
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            self._discard(raw, 'discarded')
+            return
+        now = time.monotonic()
+        if now - created_at > self.max_lifetime:
+            self._discard(raw, 'recycled')
+            return
+        with self._cond:
+            self._idle.append((raw, created_at, now))
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open'] = self._open
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._open - len(self._idle)
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    size=Config.POOL_SIZE,
+                    prewarm=Config.POOL_PREWARM,
+                    timeout=Config.POOL_TIMEOUT,
+                    max_lifetime=Config.POOL_MAX_LIFETIME,
+                    ping_after_idle=Config.POOL_PING_AFTER_IDLE,
+                    prepared_statements=Config.PREPARED_STATEMENTS
+                )
+    return _pool
+
+def get_db_connection():
+    """Check out a pooled connection; call close() to return it"""
+    return get_pool().acquire()
@@ -0,0 +1,208 @@
+"""Versioned schema migrations for the manufacturing database
+
+    python database/migrations.py               # apply pending migrations
+    python database/migrations.py --check-plans # EXPLAIN every chatbot query
+"""
+import argparse
+import os
+import sys
+
+import mysql.connector
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from database.config import Config
+from database import queries, rollup, table_versions
+
+# Tables (by name or query alias) small enough that a full read is the intended plan
+FULL_SCAN_ALLOWED = {'Machines', 'm', 'TableVersion'}
+
+
+def _index_exists(cursor, table, name):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    ''', (table, name))
+    return cursor.fetchone() is not None
+
+def _column_exists(cursor, table, name):
+    cursor.execute('''
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        LIMIT 1
+    ''', (table, name))
+    return cursor.fetchone() is not None
+
+def add_column(cursor, table, name, definition):
+    """Add a column unless it already exists"""
+    if not _column_exists(cursor, table, name):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+def add_index(cursor, table, name, columns, unique=False):
+    """Create an index unless it already exists (MySQL has no CREATE INDEX IF NOT EXISTS)"""
+    if not _index_exists(cursor, table, name):
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})")
+
+
+def _001_query_indexes(cursor):
+    # Line downtime history: WHERE line_id = ? ORDER BY date DESC
+    add_index(cursor, 'Production', 'idx_production_line_date', ['line_id', 'date'])
+    # Today's production, downtime alerts (date = ? AND downtime > ?) and the
+    # trend chart's GROUP BY date, which this index covers
+    add_index(cursor, 'Production', 'idx_production_date_downtime', ['date', 'downtime_minutes', 'output_units'])
+    add_index(cursor, 'Maintenance', 'idx_maintenance_machine_schedule', ['machine_id', 'schedule_date'])
+    add_index(cursor, 'Maintenance', 'idx_maintenance_schedule', ['schedule_date'])
+    add_index(cursor, 'Machines', 'idx_machines_status', ['status'])
+    add_index(cursor, 'Downtime', 'idx_downtime_line_start', ['line_id', 'start_time'])
+
+
+def _002_production_daily_rollup(cursor):
+    cursor.execute(rollup.CREATE_TABLE)
+    rollup.create_triggers(cursor)
+    rollup.rebuild(cursor)
+
+
+def _003_table_versions(cursor):
+    table_versions.create_table(cursor)
+    table_versions.create_triggers(cursor)
+
+
+def _004_ingest_event_ids(cursor):
+    # Client event IDs make /ingest retries idempotent; rows loaded any other
+    # way keep NULL, which a unique index allows any number of
+    for table in ('Production', 'Downtime'):
+        add_column(cursor, table, 'event_id', 'VARCHAR(64) NULL')
+        add_index(cursor, table, f'uq_{table.lower()}_event_id', ['event_id'], unique=True)
+
+
+def _005_shift_report_index(cursor):
+    # Shift reports across all lines: date range, then shift, grouped by line
+    add_index(cursor, 'Production', 'idx_production_date_shift_line', ['date', 'shift', 'line_id'])
+
+
+def _006_change_timestamps(cursor):
+    # The in-memory plant state polls rows changed since its last watermark
+    for table in ('Machines', 'Maintenance'):
+        add_column(cursor, table, 'updated_at',
+                   'TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)')
+        add_index(cursor, table, f'idx_{table.lower()}_updated', ['updated_at'])
+
+
+def _007_batch_table_versions(cursor):
+    # Production and Downtime writers bump their versions once per statement
+    # (see database/table_versions.py); drop the per-row triggers
+    table_versions.create_triggers(cursor)
+
+
+def _008_maintenance_status_index(cursor):
+    # Open maintenance (status <> 'Completed') or recently scheduled: an index
+    # merge of this and idx_maintenance_schedule
+    add_index(cursor, 'Maintenance', 'idx_maintenance_status', ['status'])
+
+
+def _009_drop_empty_daily_rows(cursor):
+    # The delete and update triggers now remove line-days left without shifts
+    rollup.create_triggers(cursor)
+    rollup.drop_empty_rows(cursor)
+
+
+# (version, description, function(cursor)); append only, never renumber
+MIGRATIONS = [
+    (1, 'Indexes for chatbot queries', _001_query_indexes),
+    (2, 'ProductionDaily rollup maintained by triggers', _002_production_daily_rollup),
+    (3, 'TableVersion write counters for the query cache', _003_table_versions),
+    (4, 'Client event IDs for idempotent ingestion', _004_ingest_event_ids),
+    (5, 'Index for shift production reports', _005_shift_report_index),
+    (6, 'Change timestamps for the plant state watermark', _006_change_timestamps),
+    (7, 'Statement-level versions for Production and Downtime', _007_batch_table_versions),
+    (8, 'Index for open maintenance', _008_maintenance_status_index),
+    (9, 'Remove ProductionDaily rows without shifts', _009_drop_empty_daily_rows),
+]
+
+
+def current_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    version = cursor.fetchone()[0]
+    return version or 0
+
+def migrate(conn):
+    """Apply pending migrations in order and return the resulting schema version"""
+    cursor = conn.cursor()
+    try:
+        version = current_version(cursor)
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            apply(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (%s, %s)',
+                           (number, description))
+            conn.commit()
+            print(f"✅ Applied migration {number}: {description}")
+            version = number
+        return version
+    finally:
+        cursor.close()
+
+def check_query_plans(conn):
+    """EXPLAIN each chatbot query and return a list of problems (empty if all use indexes)
+
+    Run against realistically sized data; on a handful of rows MySQL may
+    legitimately prefer a table scan.
+    """
+    problems = []
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for name, sql, params in queries.CHATBOT_QUERIES:
+            cursor.execute('EXPLAIN ' + sql, params)
+            for row in cursor.fetchall():
+                table = row['table']
+                if table is None or table in FULL_SCAN_ALLOWED:
+                    continue
+                if row['type'] == 'ALL' or row['key'] is None:
+                    problems.append(f"{name}: full scan of {table} (type={row['type']}, possible_keys={row['possible_keys']})")
+    finally:
+        cursor.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply schema migrations')
+    parser.add_argument('--check-plans', action='store_true', help='EXPLAIN every chatbot query after migrating')
+    args = parser.parse_args()
+
+    conn = None
+    try:
+        conn = mysql.connector.connect(
+            host=Config.MYSQL_HOST,
+            user=Config.MYSQL_USER,
+            password=Config.MYSQL_PASSWORD,
+            database=Config.MYSQL_DATABASE,
+            port=Config.MYSQL_PORT
+        )
+        version = migrate(conn)
+        print(f"📦 Schema version: {version}")
+
+        if args.check_plans:
+            problems = check_query_plans(conn)
+            for problem in problems:
+                print(f"❌ {problem}")
+            if problems:
+                sys.exit(1)
+            print("✅ Every chatbot query uses an index")
+    except mysql.connector.Error as e:
+        print(f"❌ MySQL Error: {e}")
+        sys.exit(1)
+    finally:
+        if conn and conn.is_connected():
+            conn.close()
+
+if __name__ == '__main__':
+    main()
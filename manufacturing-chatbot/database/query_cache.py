@@ -0,0 +1,138 @@
+"""Result cache for chatbot queries, invalidated by table write versions
+
+Results are keyed on whitespace-normalized SQL plus parameters, kept in an
+LRU with TTL expiry, and tagged with the TableVersion of every table the
+query reads (see database/table_versions.py). A result is served only
+while those versions are unchanged. Versions are re-read at most every
+QUERY_CACHE_VERSION_CHECK seconds, which bounds how long a write made by
+another process can go unseen; invalidate() forces a re-read after a
+write made by this one.
+"""
+import re
+import threading
+import time
+from datetime import date
+
+from cache import TTLCache
+from database.config import Config
+from database import table_versions
+from database.backends import backend
+
+_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+# Results that depend on the current date are keyed on it as well
+_DATE_RE = re.compile(r"\b(?:CURDATE|CURRENT_DATE|UTC_DATE)\b|'now'", re.IGNORECASE)
+# Results that change with every call are never cached
+_VOLATILE_RE = re.compile(r'\b(?:NOW|CURRENT_TIMESTAMP|CURTIME|SYSDATE|UTC_TIMESTAMP|RAND|UUID)\b', re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    return ' '.join(sql.split()).rstrip(';')
+
+
+class QueryCache:
+    def __init__(self, maxsize, ttl, version_check):
+        self.version_check = version_check
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)  # key -> (table versions, rows)
+        self._shapes = {}  # normalized sql -> (tables read, date dependent, cacheable)
+        self._versions = {}
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'uncacheable': 0, 'version_checks': 0}
+
+    def _shape(self, normalized):
+        shape = self._shapes.get(normalized)
+        if shape is None:
+            tables = {table_versions.DERIVED_TABLES.get(table, table) for table in _TABLE_RE.findall(normalized)}
+            cacheable = (tables <= set(table_versions.TRACKED_TABLES)
+                         and not _VOLATILE_RE.search(normalized))
+            shape = self._shapes[normalized] = (tuple(sorted(tables)), bool(_DATE_RE.search(normalized)), cacheable)
+        return shape
+
+    def key(self, sql, params=()):
+        """Cache key for a statement, or None if its result must not be cached"""
+        normalized = normalize_sql(sql)
+        _, dated, cacheable = self._shape(normalized)
+        if not cacheable:
+            return None
+        return normalized, tuple(params or ()), date.today() if dated else None
+
+    def version_check_due(self):
+        checked_at = self._checked_at
+        return checked_at is None or time.monotonic() - checked_at >= self.version_check
+
+    def update_versions(self, rows):
+        """Store the rows of queries.TABLE_VERSIONS, as dicts or (table_name, version) tuples"""
+        versions = dict(tuple(row.values()) if isinstance(row, dict) else row for row in rows)
+        with self._lock:
+            self._versions = versions
+            self._checked_at = time.monotonic()
+            self._stats['version_checks'] += 1
+
+    def invalidate(self):
+        """Re-read table versions on the next lookup, e.g. right after this process wrote"""
+        self._checked_at = None
+
+    def tables(self, sql):
+        """Tables sql reads, or None if its results must not be cached"""
+        tables, _, cacheable = self._shape(normalize_sql(sql))
+        return tables if cacheable else None
+
+    def data_version(self, run, tables):
+        """Current versions of tables, re-read through run() like fetch() when the check is due"""
+        if self.version_check_due():
+            self.update_versions(run('table_versions', backend.queries.TABLE_VERSIONS, ()))
+        return self.known_versions(tables)
+
+    def known_versions(self, tables):
+        """Versions of tables as last read, without checking whether a re-read is due"""
+        versions = self._versions
+        return tuple(versions.get(table) for table in tables)
+
+    def versions(self, key):
+        """Versions of the tables key reads; take them before running the query and pass them to put()"""
+        versions = self._versions
+        return tuple(versions.get(table) for table in self._shape(key[0])[0])
+
+    def get(self, key):
+        """Return the cached rows for key, or None if missing, expired or written since"""
+        entry = self._results.get(key)
+        with self._lock:
+            if entry is not None and entry[0] == self.versions(key):
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            if entry is not None:
+                self._stats['stale'] += 1
+        return None
+
+    def put(self, key, versions, rows):
+        self._results.set(key, (versions, rows))
+
+    def fetch(self, run, name, sql, params=()):
+        """Return rows for sql and params, calling run(name, sql, params) only on a miss
+
+        Cached rows are shared between callers and must not be modified.
+        """
+        key = self.key(sql, params)
+        if key is None:
+            with self._lock:
+                self._stats['uncacheable'] += 1
+            return run(name, sql, params)
+        if self.version_check_due():
+            self.update_versions(run('table_versions', backend.queries.TABLE_VERSIONS, ()))
+        rows = self.get(key)
+        if rows is None:
+            versions = self.versions(key)
+            rows = run(name, sql, params)
+            self.put(key, versions, rows)
+        return rows
+
+    def clear(self):
+        self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=self._results.stats()['size'])
+
+
+query_cache = QueryCache(Config.QUERY_CACHE_SIZE, Config.QUERY_CACHE_TTL, Config.QUERY_CACHE_VERSION_CHECK)
@@ -0,0 +1,103 @@
+"""ProductionDaily: per (date, line_id) totals of the Production table
+
+Triggers on Production apply each inserted, updated or deleted shift row
+as a delta, so the rollup stays current for every writer and reading a
+day or a multi-month trend costs one row per line-day instead of one per
+shift. A line-day left without shift rows is deleted rather than kept at
+zero, so replies don't list lines that produced nothing that day.
+"""
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS ProductionDaily (
+        date DATE NOT NULL,
+        line_id INT NOT NULL,
+        output_units BIGINT NOT NULL DEFAULT 0,
+        target_units BIGINT NOT NULL DEFAULT 0,
+        downtime_minutes BIGINT NOT NULL DEFAULT 0,
+        quality_defects BIGINT NOT NULL DEFAULT 0,
+        shift_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (date, line_id),
+        INDEX idx_daily_line_date (line_id, date)
+    )
+'''
+
+_ADD_ROW = '''
+    INSERT INTO ProductionDaily
+        (date, line_id, output_units, target_units, downtime_minutes, quality_defects, shift_count)
+    VALUES
+        (NEW.date, NEW.line_id, IFNULL(NEW.output_units, 0), IFNULL(NEW.target_units, 0),
+         IFNULL(NEW.downtime_minutes, 0), IFNULL(NEW.quality_defects, 0), 1)
+    ON DUPLICATE KEY UPDATE
+        output_units = output_units + IFNULL(NEW.output_units, 0),
+        target_units = target_units + IFNULL(NEW.target_units, 0),
+        downtime_minutes = downtime_minutes + IFNULL(NEW.downtime_minutes, 0),
+        quality_defects = quality_defects + IFNULL(NEW.quality_defects, 0),
+        shift_count = shift_count + 1
+'''
+
+_REMOVE_ROW = '''
+    UPDATE ProductionDaily SET
+        output_units = output_units - IFNULL(OLD.output_units, 0),
+        target_units = target_units - IFNULL(OLD.target_units, 0),
+        downtime_minutes = downtime_minutes - IFNULL(OLD.downtime_minutes, 0),
+        quality_defects = quality_defects - IFNULL(OLD.quality_defects, 0),
+        shift_count = shift_count - 1
+    WHERE date = OLD.date AND line_id = OLD.line_id
+'''
+
+_DROP_EMPTY_ROW = '''
+    DELETE FROM ProductionDaily
+    WHERE date = OLD.date AND line_id = OLD.line_id AND shift_count = 0
+'''
+
+TRIGGERS = {
+    'trg_production_daily_insert': f'''
+        CREATE TRIGGER trg_production_daily_insert AFTER INSERT ON Production
+        FOR EACH ROW {_ADD_ROW}
+    ''',
+    'trg_production_daily_update': f'''
+        CREATE TRIGGER trg_production_daily_update AFTER UPDATE ON Production
+        FOR EACH ROW BEGIN
+            {_REMOVE_ROW};
+            {_ADD_ROW};
+            {_DROP_EMPTY_ROW};
+        END
+    ''',
+    'trg_production_daily_delete': f'''
+        CREATE TRIGGER trg_production_daily_delete AFTER DELETE ON Production
+        FOR EACH ROW BEGIN
+            {_REMOVE_ROW};
+            {_DROP_EMPTY_ROW};
+        END
+    ''',
+}
+
+
+def create_triggers(cursor):
+    for name, sql in TRIGGERS.items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(sql)
+
+def drop_triggers(cursor):
+    for name in TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+def drop_empty_rows(cursor):
+    """Delete line-days the triggers left at zero shifts before they removed them"""
+    cursor.execute('DELETE FROM ProductionDaily WHERE shift_count = 0')
+
+def rebuild(cursor, start=None, end=None):
+    """Recompute the rollup from Production, optionally only for dates in [start, end]"""
+    where, params = '', ()
+    if start is not None and end is not None:
+        where, params = 'WHERE date BETWEEN %s AND %s', (start, end)
+    cursor.execute(f'DELETE FROM ProductionDaily {where}', params)
+    cursor.execute(f'''
+        INSERT INTO ProductionDaily
+            (date, line_id, output_units, target_units, downtime_minutes, quality_defects, shift_count)
+        SELECT date, line_id, IFNULL(SUM(output_units), 0), IFNULL(SUM(target_units), 0),
+               IFNULL(SUM(downtime_minutes), 0), IFNULL(SUM(quality_defects), 0), COUNT(*)
+        FROM Production
+        {where}
+        GROUP BY date, line_id
+    ''', params)
@@ -0,0 +1,221 @@
+"""Read/write splitting over the MySQL primary and its read replicas
+
+Every node (Config.MYSQL_HOST plus each entry of Config.MYSQL_REPLICAS)
+has its own ConnectionPool. backend.connect(readonly=True) asks for a
+read connection, anything else for a write connection:
+
+- Writes go to the writer: the primary, or, while the primary is down, a
+  replica that has been promoted (read_only turned off).
+- Reads go to a replica picked at random in proportion to its weight,
+  among those reachable and at most REPLICA_MAX_LAG seconds behind. When
+  none qualifies they fall back to the writer, then to lagging replicas,
+  so a lost primary still leaves the chatbot answering from replicas.
+- A node whose connect fails is skipped for REPLICA_RETRY_SECONDS and the
+  next candidate is tried within the same connect() call.
+
+A monitor thread polls each node every REPLICA_CHECK_SECONDS for its
+replication lag (SHOW REPLICA STATUS) and read_only flag. Until a replica
+has been polled it takes no reads. Reads from a replica may trail writes
+by up to REPLICA_MAX_LAG seconds; callers that must see their own write
+(the alert monitor after an ingest flush) keep using write connections.
+
+Nodes only need a pool and probe(), so tests/test_routing.py exercises
+routing and failover against in-process stand-in instances.
+"""
+import functools
+import random
+import threading
+import time
+
+from database.config import Config, ConnectionPool, _connect, get_pool
+
+
+class Node:
+    """One MySQL server with its own connection pool and last polled state"""
+
+    def __init__(self, name, pool, weight=1, primary=False):
+        self.name = name
+        self.pool = pool
+        self.weight = weight
+        self.primary = primary
+        self.lag = None          # Seconds behind its source; None if not replicating or not polled
+        self.read_only = None    # None until polled
+        self.polled = False
+        self.probe_failed_at = None
+        self._stats = {'reads': 0, 'writes': 0, 'failovers': 0, 'probe_errors': 0}
+        self._lock = threading.Lock()
+
+    def available(self, now, retry_seconds):
+        """False while the node is within retry_seconds of a failed connect or probe"""
+        for failed_at in (self.pool.connect_failed_at, self.probe_failed_at):
+            if failed_at is not None and now - failed_at < retry_seconds:
+                return False
+        return True
+
+    def writable(self):
+        # The primary is assumed writable until polled
+        return self.read_only is False or (self.primary and self.read_only is None)
+
+    def count(self, event):
+        with self._lock:
+            self._stats[event] += 1
+
+    def probe(self, conn):
+        """Return (read_only, lag seconds or None) from a checked-out connection"""
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute('SELECT @@global.read_only AS read_only')
+            read_only = bool(cursor.fetchone()['read_only'])
+            try:
+                cursor.execute('SHOW REPLICA STATUS')
+                status = cursor.fetchone()
+                lag_column = 'Seconds_Behind_Source'
+            except Exception:
+                # Servers before 8.0.22 only know the older spelling
+                cursor.execute('SHOW SLAVE STATUS')
+                status = cursor.fetchone()
+                lag_column = 'Seconds_Behind_Master'
+            # NULL lag means replication is stopped or broken
+            lag = status.get(lag_column) if status else None
+            return read_only, lag
+        finally:
+            cursor.close()
+
+    def poll(self):
+        conn = self.pool.acquire()
+        if conn is None:
+            return
+        try:
+            read_only, lag = self.probe(conn)
+        except Exception as e:
+            print(f"Database probe error on {self.name}: {e}")
+            self.probe_failed_at = time.monotonic()
+            self.count('probe_errors')
+            return
+        finally:
+            conn.close()
+        self.read_only, self.lag = read_only, lag
+        self.polled = True
+        self.probe_failed_at = None
+
+    def stats(self, retry_seconds):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(lag=self.lag, read_only=self.read_only, primary=self.primary,
+                     up=self.available(time.monotonic(), retry_seconds))
+        return stats
+
+
+class Router:
+    """Hands out connections from the node that should serve a read or a write"""
+
+    def __init__(self, nodes, max_lag=5, check_seconds=2, retry_seconds=10):
+        self.nodes = nodes
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self.retry_seconds = retry_seconds
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start polling the nodes; a lone primary needs no polling"""
+        if self._thread is not None or len(self.nodes) == 1:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='replica-monitor', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.poll()
+            time.sleep(self.check_seconds)
+
+    def poll(self):
+        for node in self.nodes:
+            if node.available(time.monotonic(), self.retry_seconds):
+                node.poll()
+
+    def writer(self):
+        """The node writes should go to: the first writable node, primary first"""
+        now = time.monotonic()
+        for node in self.nodes:
+            if node.writable() and node.available(now, self.retry_seconds):
+                return node
+        # Nothing known to be up: keep trying the primary
+        return self.nodes[0]
+
+    def _replica_order(self, replicas):
+        # Weighted random order (Efraimidis-Spirakis): each node's chance of
+        # coming first is proportional to its weight
+        return sorted(replicas, key=lambda node: random.random() ** (1.0 / node.weight), reverse=True)
+
+    def candidates(self, readonly):
+        """Nodes to try, in order, for a read or a write"""
+        writer = self.writer()
+        if not readonly:
+            return [writer]
+        now = time.monotonic()
+        fresh, lagging = [], []
+        for node in self.nodes:
+            if node is writer or node.weight <= 0 or not node.polled:
+                continue
+            if not node.available(now, self.retry_seconds) or node.lag is None:
+                continue
+            (fresh if node.lag <= self.max_lag else lagging).append(node)
+        lagging.sort(key=lambda node: node.lag)
+        return self._replica_order(fresh) + [writer] + lagging
+
+    def connect(self, readonly=False):
+        """Check out a connection for a read or write, or None if no node can serve it"""
+        self.start()
+        for attempt, node in enumerate(self.candidates(readonly)):
+            if not node.available(time.monotonic(), self.retry_seconds):
+                continue
+            conn = node.pool.acquire()
+            if conn is not None:
+                node.count('reads' if readonly else 'writes')
+                if attempt:
+                    node.count('failovers')
+                return conn
+        return None
+
+    def pool_stats(self):
+        """Pool stats summed over every node"""
+        totals = {}
+        for node in self.nodes:
+            for key, value in node.pool.stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def stats(self):
+        return {node.name: node.stats(self.retry_seconds) for node in self.nodes}
+
+
+def _replica_pool(host, port):
+    return ConnectionPool(
+        functools.partial(_connect, host, port),
+        size=Config.POOL_SIZE,
+        timeout=Config.POOL_TIMEOUT,
+        max_lifetime=Config.POOL_MAX_LIFETIME,
+        ping_after_idle=Config.POOL_PING_AFTER_IDLE,
+        prepared_statements=Config.PREPARED_STATEMENTS
+    )
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                nodes = [Node('primary', get_pool(), primary=True)]
+                for number, replica in enumerate(Config.MYSQL_REPLICAS, 1):
+                    host, port = replica['host'], replica.get('port', Config.MYSQL_PORT)
+                    nodes.append(Node(replica.get('name', f'replica-{number}'), _replica_pool(host, port),
+                                      weight=replica.get('weight', 1)))
+                _router = Router(nodes, max_lag=Config.REPLICA_MAX_LAG,
+                                 check_seconds=Config.REPLICA_CHECK_SECONDS,
+                                 retry_seconds=Config.REPLICA_RETRY_SECONDS)
+    return _router
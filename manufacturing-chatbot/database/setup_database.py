@@ -1,101 +1,140 @@
+import argparse
 import mysql.connector
 import os
+import random
 import sys
+import time
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database.config import Config
+from database import rollup, sqlite_schema, table_versions
+from database.backends import create_backend
+from database.migrations import migrate
 from datetime import datetime, timedelta
 
-def create_database():
-    conn = None
-    try:
-        # Connect to MySQL server (without database first)
-        conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            port=Config.MYSQL_PORT
+def create_schema(backend_name='mysql'):
+    """Create the database, tables and indexes if needed and return a connection to it"""
+    if backend_name == 'sqlite':
+        # Connecting creates the file and its schema (see database/sqlite_schema.py)
+        conn = create_backend('sqlite').connect()
+        if conn is None:
+            raise RuntimeError(f"could not open {Config.SQLITE_PATH}")
+        print(f"Database ready at {Config.SQLITE_PATH}")
+        return conn
+    
+    # Connect to MySQL server (without database first)
+    conn = mysql.connector.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD,
+        port=Config.MYSQL_PORT
+    )
+    cursor = conn.cursor()
+    
+    # Create database
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}")
+    print("Database created successfully!")
+    
+    cursor.close()
+    conn.close()
+    
+    # Connect to the new database
+    conn = mysql.connector.connect(
+        host=Config.MYSQL_HOST,
+        user=Config.MYSQL_USER,
+        password=Config.MYSQL_PASSWORD,
+        database=Config.MYSQL_DATABASE,
+        port=Config.MYSQL_PORT
+    )
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Machines (
+            machine_id INT PRIMARY KEY AUTO_INCREMENT,
+            name VARCHAR(100) NOT NULL,
+            status ENUM('Running', 'Stopped', 'Maintenance') DEFAULT 'Running',
+            last_maintenance DATE,
+            location VARCHAR(50),
+            manufacturer VARCHAR(50),
+            installed_date DATE
         )
-        cursor = conn.cursor()
-        
-        # Create database
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {Config.MYSQL_DATABASE}")
-        print("Database created successfully!")
-        
-        cursor.close()
-        conn.close()
-        
-        # Connect to the new database
-        conn = mysql.connector.connect(
-            host=Config.MYSQL_HOST,
-            user=Config.MYSQL_USER,
-            password=Config.MYSQL_PASSWORD,
-            database=Config.MYSQL_DATABASE,
-            port=Config.MYSQL_PORT
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Production (
+            production_id INT PRIMARY KEY AUTO_INCREMENT,
+            line_id INT NOT NULL,
+            date DATE NOT NULL,
+            shift ENUM('Morning', 'Evening', 'Night') DEFAULT 'Morning',
+            output_units INT DEFAULT 0,
+            target_units INT DEFAULT 0,
+            downtime_minutes INT DEFAULT 0,
+            quality_defects INT DEFAULT 0,
+            operator_name VARCHAR(50)
         )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Maintenance (
+            maintenance_id INT PRIMARY KEY AUTO_INCREMENT,
+            machine_id INT,
+            schedule_date DATE NOT NULL,
+            completion_date DATE,
+            maintenance_type ENUM('Preventive', 'Corrective', 'Emergency') DEFAULT 'Preventive',
+            status ENUM('Scheduled', 'In Progress', 'Completed') DEFAULT 'Scheduled',
+            remarks TEXT,
+            technician VARCHAR(50),
+            duration_hours DECIMAL(4,2),
+            cost DECIMAL(10,2),
+            FOREIGN KEY (machine_id) REFERENCES Machines(machine_id)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Downtime (
+            downtime_id INT PRIMARY KEY AUTO_INCREMENT,
+            machine_id INT,
+            line_id INT,
+            start_time DATETIME,
+            end_time DATETIME,
+            duration_minutes INT,
+            reason ENUM('Breakdown', 'Maintenance', 'Material Shortage', 'Quality Check', 'Power Outage', 'Other'),
+            description TEXT,
+            reported_by VARCHAR(50),
+            FOREIGN KEY (machine_id) REFERENCES Machines(machine_id)
+        )
+    ''')
+    
+    migrate(conn)
+    cursor.close()
+    return conn
+
+def drop_write_triggers(cursor, backend_name):
+    if backend_name == 'sqlite':
+        sqlite_schema.drop_triggers(cursor)
+    else:
+        table_versions.drop_triggers(cursor)
+        rollup.drop_triggers(cursor)
+
+def create_write_triggers(cursor, backend_name):
+    if backend_name == 'sqlite':
+        sqlite_schema.create_triggers(cursor)
+    else:
+        rollup.create_triggers(cursor)
+        table_versions.create_triggers(cursor)
+
+def create_database(backend_name='mysql'):
+    conn = None
+    backend = create_backend(backend_name)
+    try:
+        conn = create_schema(backend_name)
         cursor = conn.cursor()
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Machines (
-                machine_id INT PRIMARY KEY AUTO_INCREMENT,
-                name VARCHAR(100) NOT NULL,
-                status ENUM('Running', 'Stopped', 'Maintenance') DEFAULT 'Running',
-                last_maintenance DATE,
-                location VARCHAR(50),
-                manufacturer VARCHAR(50),
-                installed_date DATE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Production (
-                production_id INT PRIMARY KEY AUTO_INCREMENT,
-                line_id INT NOT NULL,
-                date DATE NOT NULL,
-                shift ENUM('Morning', 'Evening', 'Night') DEFAULT 'Morning',
-                output_units INT DEFAULT 0,
-                target_units INT DEFAULT 0,
-                downtime_minutes INT DEFAULT 0,
-                quality_defects INT DEFAULT 0,
-                operator_name VARCHAR(50)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Maintenance (
-                maintenance_id INT PRIMARY KEY AUTO_INCREMENT,
-                machine_id INT,
-                schedule_date DATE NOT NULL,
-                completion_date DATE,
-                maintenance_type ENUM('Preventive', 'Corrective', 'Emergency') DEFAULT 'Preventive',
-                status ENUM('Scheduled', 'In Progress', 'Completed') DEFAULT 'Scheduled',
-                remarks TEXT,
-                technician VARCHAR(50),
-                duration_hours DECIMAL(4,2),
-                cost DECIMAL(10,2),
-                FOREIGN KEY (machine_id) REFERENCES Machines(machine_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS Downtime (
-                downtime_id INT PRIMARY KEY AUTO_INCREMENT,
-                machine_id INT,
-                line_id INT,
-                start_time DATETIME,
-                end_time DATETIME,
-                duration_minutes INT,
-                reason ENUM('Breakdown', 'Maintenance', 'Material Shortage', 'Quality Check', 'Power Outage', 'Other'),
-                description TEXT,
-                reported_by VARCHAR(50),
-                FOREIGN KEY (machine_id) REFERENCES Machines(machine_id)
-            )
-        ''')
-        
         # Clear existing data
         cursor.execute('DELETE FROM Downtime')
         cursor.execute('DELETE FROM Maintenance')
         cursor.execute('DELETE FROM Production')
+        cursor.execute('DELETE FROM ProductionDaily')
         cursor.execute('DELETE FROM Machines')
         
         print("✅ Tables created successfully!")
@@ -172,6 +211,7 @@ def create_database():
         ''')
         print("✅ Downtime data inserted!")
         
+        table_versions.bump(cursor, table_versions.BATCH_TABLES)
         conn.commit()
         
         print("\n🎉 DATABASE SETUP COMPLETED SUCCESSFULLY!")
@@ -194,8 +234,8 @@ def create_database():
         print("   • Detailed downtime reasons")
         print("   • Equipment location tracking")
         
-    except mysql.connector.Error as e:
-        print(f"❌ MySQL Error: {e}")
+    except backend.Error as e:
+        print(f"❌ Database Error: {e}")
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
@@ -204,5 +244,194 @@ def create_database():
             conn.close()
             print("\n✅ Database connection closed.")
 
+# ---------------------------------------------------------------------------
+# Bulk synthetic data for scale testing
+# ---------------------------------------------------------------------------
+
+SHIFTS = ['Morning', 'Evening', 'Night']
+MACHINE_KINDS = ['Injection Molding Machine', 'CNC Machining Center', 'Assembly Robot', 'Packaging Line',
+                 'Laser Cutting Machine', '3D Printer', 'Quality Scanner', 'Conveyor System']
+MANUFACTURERS = ['Haitian', 'Mazak', 'Fanuc', 'Bosch', 'Trumpf', 'Stratasys', 'Keyence', 'Siemens']
+OPERATORS = ['John Smith', 'Maria Garcia', 'Robert Johnson', 'Lisa Chen', 'Mike Brown', 'Sarah Wilson']
+DOWNTIME_REASONS = ['Breakdown', 'Maintenance', 'Material Shortage', 'Quality Check', 'Power Outage', 'Other']
+SHIFT_START_HOURS = {'Morning': 6, 'Evening': 14, 'Night': 22}
+
+def generate_machines(rng, machines, today):
+    for machine_id in range(1, machines + 1):
+        kind = MACHINE_KINDS[(machine_id - 1) % len(MACHINE_KINDS)]
+        status = rng.choices(['Running', 'Stopped', 'Maintenance'], weights=[85, 5, 10])[0]
+        yield (machine_id, f"{kind} {machine_id}", status, today - timedelta(days=rng.randint(1, 60)),
+               f"Section {chr(ord('A') + (machine_id - 1) % 8)}", MANUFACTURERS[(machine_id - 1) % len(MANUFACTURERS)],
+               today - timedelta(days=rng.randint(365, 3650)))
+
+def generate_production(rng, lines, days, shifts, incident_rate, today):
+    """Yield one Production row per (day, line, shift), oldest day first"""
+    for days_ago in range(days - 1, -1, -1):
+        day = today - timedelta(days=days_ago)
+        for line_id in range(1, lines + 1):
+            target = 900 + (line_id % 5) * 100
+            for shift in shifts:
+                downtime = rng.randint(0, 40)
+                if rng.random() < incident_rate:
+                    downtime += rng.randint(30, 240)
+                output = max(0, int(target * rng.uniform(0.85, 1.08)) - downtime * 2)
+                defects = int(output * rng.uniform(0.002, 0.025))
+                yield (line_id, day, shift, output, target, downtime, defects, rng.choice(OPERATORS))
+
+def generate_maintenance(rng, machines, days, today):
+    """Yield roughly monthly preventive maintenance per machine plus a few upcoming jobs"""
+    for machine_id in range(1, machines + 1):
+        days_ago = days - rng.randint(0, 30)
+        while days_ago > -30:
+            day = today - timedelta(days=days_ago)
+            done = days_ago > 0
+            maintenance_type = rng.choices(['Preventive', 'Corrective', 'Emergency'], weights=[80, 15, 5])[0]
+            hours = round(rng.uniform(1, 12), 2)
+            yield (machine_id, day, day if done else None, maintenance_type,
+                   'Completed' if done else 'Scheduled', f"{maintenance_type} maintenance",
+                   rng.choice(OPERATORS), hours, round(hours * rng.uniform(800, 2500), 2))
+            days_ago -= rng.randint(20, 40)
+
+def generate_downtime(rng, machines, lines, days, shifts, incident_rate, today):
+    for days_ago in range(days - 1, -1, -1):
+        day = today - timedelta(days=days_ago)
+        for line_id in range(1, lines + 1):
+            for shift in shifts:
+                if rng.random() >= incident_rate:
+                    continue
+                start = datetime.combine(day, datetime.min.time()) + timedelta(
+                    hours=SHIFT_START_HOURS[shift], minutes=rng.randint(0, 420))
+                duration = rng.randint(15, 480)
+                yield (rng.randint(1, machines), line_id, start, start + timedelta(minutes=duration), duration,
+                       rng.choice(DOWNTIME_REASONS), 'Generated incident', rng.choice(OPERATORS))
+
+def insert_batches(conn, sql, rows, batch_size):
+    """Insert rows from an iterator in batches of one multi-row INSERT and one commit each"""
+    cursor = conn.cursor()
+    batch, total = [], 0
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                conn.commit()
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            total += len(batch)
+    finally:
+        cursor.close()
+    return total
+
+def timed_insert(conn, table, sql, rows, batch_size):
+    started = time.perf_counter()
+    count = insert_batches(conn, sql, rows, batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {table}: {count:,} rows in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} rows/sec)")
+    return count, elapsed
+
+def generate_bulk_data(machines=200, lines=20, days=365, shifts=3, incident_rate=0.05,
+                       batch_size=5000, seed=None, backend_name='mysql'):
+    """Replace all data with a synthetic plant of the given size, streamed in batches"""
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    shift_names = SHIFTS[:shifts]
+    conn = None
+    backend = create_backend(backend_name)
+    try:
+        conn = create_schema(backend_name)
+        cursor = conn.cursor()
+        
+        # Per-row triggers would dominate a bulk load; they are recreated,
+        # the rollup rebuilt and versions bumped once at the end instead
+        drop_write_triggers(cursor, backend_name)
+        try:
+            total_rows, total_seconds = load_bulk_data(conn, cursor, rng, machines, lines, days, shift_names,
+                                                       incident_rate, batch_size, today, backend_name)
+        finally:
+            # Also after a failed load, or ProductionDaily, plant state and
+            # the caches would stop seeing writes
+            conn.rollback()
+            started = time.perf_counter()
+            rollup.rebuild(cursor)
+            create_write_triggers(cursor, backend_name)
+            table_versions.bump(cursor)
+            conn.commit()
+            print(f"✅ ProductionDaily rebuilt and write triggers restored in {time.perf_counter() - started:.1f}s")
+        
+        print(f"\n🎉 Loaded {total_rows:,} rows in {total_seconds:.1f}s "
+              f"({total_rows / total_seconds if total_seconds else 0:,.0f} rows/sec)")
+        print(f"📅 Data covers: {today - timedelta(days=days - 1)} to {today}")
+        
+    except backend.Error as e:
+        print(f"❌ Database Error: {e}")
+        raise
+    finally:
+        if conn and conn.is_connected():
+            cursor.close()
+            conn.close()
+
+def load_bulk_data(conn, cursor, rng, machines, lines, days, shift_names, incident_rate, batch_size, today,
+                   backend_name):
+    """Empty the data tables and stream generated rows into them; return (rows, seconds)"""
+    cursor.execute('DELETE FROM Downtime')
+    cursor.execute('DELETE FROM Maintenance')
+    # SQLite has no TRUNCATE; an unqualified DELETE is its equivalent
+    truncate = 'DELETE FROM' if backend_name == 'sqlite' else 'TRUNCATE TABLE'
+    cursor.execute(f'{truncate} Production')
+    cursor.execute(f'{truncate} ProductionDaily')
+    cursor.execute('DELETE FROM Machines')
+    conn.commit()
+    
+    total_rows, total_seconds = 0, 0.0
+    for table, sql, rows in [
+        ('Machines', '''
+            INSERT INTO Machines (machine_id, name, status, last_maintenance, location, manufacturer, installed_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ''', generate_machines(rng, machines, today)),
+        ('Production', '''
+            INSERT INTO Production (line_id, date, shift, output_units, target_units, downtime_minutes, quality_defects, operator_name)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ''', generate_production(rng, lines, days, shift_names, incident_rate, today)),
+        ('Maintenance', '''
+            INSERT INTO Maintenance (machine_id, schedule_date, completion_date, maintenance_type, status, remarks, technician, duration_hours, cost)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ''', generate_maintenance(rng, machines, days, today)),
+        ('Downtime', '''
+            INSERT INTO Downtime (machine_id, line_id, start_time, end_time, duration_minutes, reason, description, reported_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ''', generate_downtime(rng, machines, lines, days, shift_names, incident_rate, today)),
+    ]:
+        count, elapsed = timed_insert(conn, table, sql, rows, batch_size)
+        total_rows += count
+        total_seconds += elapsed
+    return total_rows, total_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Create the manufacturing database and load data')
+    parser.add_argument('--bulk', action='store_true', help='Load generated data at scale instead of the demo data')
+    parser.add_argument('--machines', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--shifts', type=int, choices=[1, 2, 3], default=3)
+    parser.add_argument('--incident-rate', type=float, default=0.05,
+                        help='Probability that a line/shift has a downtime incident')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT and per transaction')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+    parser.add_argument('--backend', choices=['mysql', 'sqlite'], default=Config.DB_BACKEND,
+                        help='Load MySQL, or an embedded SQLite file for DB_BACKEND=sqlite')
+    parser.add_argument('--sqlite-path', default=Config.SQLITE_PATH, help='SQLite database file')
+    args = parser.parse_args()
+    Config.SQLITE_PATH = args.sqlite_path
+    
+    if args.bulk:
+        generate_bulk_data(machines=args.machines, lines=args.lines, days=args.days, shifts=args.shifts,
+                           incident_rate=args.incident_rate, batch_size=args.batch_size, seed=args.seed,
+                           backend_name=args.backend)
+    else:
+        create_database(args.backend)
+
 if __name__ == "__main__":
-    create_database()
\ No newline at end of file
+    main()
\ No newline at end of file
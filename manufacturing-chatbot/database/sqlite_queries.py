@@ -0,0 +1,198 @@
+# The SQL of database/queries.py in the SQLite dialect, under the same names,
+# for the embedded backend (see database/backends.py). Placeholders stay %s;
+# the SQLite connection rewrites them to ?.
+#
+# Differences from MySQL: date('now', 'localtime') for CURDATE(), a UNION ALL
+# total row for WITH ROLLUP, CASE for the shift ENUM index, julianday() for
+# day ordinals, and 100.0 to keep KPI division from truncating.
+
+from database.queries import filter_params
+
+TODAY = "date('now', 'localtime')"
+
+TODAY_PRODUCTION = f'''
+    SELECT line_id, output_units, downtime_minutes
+    FROM ProductionDaily
+    WHERE date = {TODAY}
+    ORDER BY line_id
+'''
+
+# Maintenance still reported on: open, or scheduled within the last %s days
+# (Config.MAINTENANCE_HISTORY_DAYS); {0} is the table alias prefix
+CURRENT_MAINTENANCE = "{0}status <> 'Completed' OR {0}schedule_date >= date('now', 'localtime', '-' || %s || ' days')"
+
+MAINTENANCE_MACHINES = f'''
+    SELECT m.name, m.status, mt.schedule_date, mt.remarks
+    FROM Machines m
+    LEFT JOIN Maintenance mt ON m.machine_id = mt.machine_id AND ({CURRENT_MAINTENANCE.format('mt.')})
+    WHERE m.status = 'Maintenance' OR mt.schedule_date <= {TODAY}
+'''
+
+LINE_DOWNTIME = '''
+    SELECT date, downtime_minutes
+    FROM ProductionDaily
+    WHERE line_id = %s
+    ORDER BY date DESC
+    LIMIT %s
+'''
+
+LINE_DOWNTIME_PAGE = '''
+    SELECT date, downtime_minutes
+    FROM ProductionDaily
+    WHERE line_id = %s AND date < %s
+    ORDER BY date DESC
+    LIMIT %s
+'''
+
+MACHINE_STATUS = '''
+    SELECT machine_id, name, status, last_maintenance
+    FROM Machines
+    ORDER BY machine_id
+    LIMIT %s
+'''
+
+MACHINE_STATUS_PAGE = '''
+    SELECT machine_id, name, status, last_maintenance
+    FROM Machines
+    WHERE machine_id > %s
+    ORDER BY machine_id
+    LIMIT %s
+'''
+
+PRODUCTION_TREND = '''
+    SELECT date, SUM(output_units) as total_output, SUM(downtime_minutes) as total_downtime
+    FROM ProductionDaily
+    GROUP BY date
+    ORDER BY date DESC
+    LIMIT 7
+'''
+
+def _conditions(by_line, by_shift):
+    conditions = ['date BETWEEN %s AND %s']
+    if by_line:
+        conditions.insert(0, 'line_id = %s')
+    if by_shift:
+        conditions.append('shift = %s')
+    return ' AND '.join(conditions)
+
+_KPIS = '''
+           COUNT(DISTINCT date) AS days,
+           SUM(output_units) AS output_units,
+           SUM(target_units) AS target_units,
+           SUM(downtime_minutes) AS downtime_minutes,
+           SUM(quality_defects) AS quality_defects,
+           ROUND(100.0 * SUM(output_units) / NULLIF(SUM(target_units), 0), 1) AS attainment_pct,
+           ROUND(100.0 * SUM(quality_defects) / NULLIF(SUM(output_units), 0), 2) AS defect_rate_pct
+'''
+
+def _production_report(by_line, by_shift):
+    # The filters appear twice, so the parameters are passed twice
+    table = 'Production' if by_shift else 'ProductionDaily'
+    where = _conditions(by_line, by_shift)
+    return f'''
+    SELECT line_id, {_KPIS}
+    FROM {table}
+    WHERE {where}
+    GROUP BY line_id
+    UNION ALL
+    SELECT NULL, {_KPIS}
+    FROM {table}
+    WHERE {where}
+    HAVING COUNT(*) > 0
+'''
+
+PRODUCTION_REPORT = {(by_line, by_shift): _production_report(by_line, by_shift)
+                     for by_line in (False, True) for by_shift in (False, True)}
+
+def production_report(start, end, line=None, shift=None):
+    params = filter_params(start, end, line, shift)
+    return PRODUCTION_REPORT[(line is not None, shift is not None)], params + params
+
+def _oee_shifts(by_line, by_shift):
+    return f'''
+    SELECT line_id,
+           CAST(julianday(date) - 1721424.5 AS INTEGER) AS day,
+           CASE shift WHEN 'Morning' THEN 1 WHEN 'Evening' THEN 2 WHEN 'Night' THEN 3 ELSE 0 END AS shift,
+           IFNULL(output_units, 0), IFNULL(target_units, 0),
+           IFNULL(downtime_minutes, 0), IFNULL(quality_defects, 0)
+    FROM Production
+    WHERE {_conditions(by_line, by_shift)}
+'''
+
+OEE_SHIFTS = {(by_line, by_shift): _oee_shifts(by_line, by_shift)
+              for by_line in (False, True) for by_shift in (False, True)}
+
+def oee_shifts(start, end, line=None, shift=None):
+    return OEE_SHIFTS[(line is not None, shift is not None)], filter_params(start, end, line, shift)
+
+# Rows changed since a watermark, for the in-memory plant state (see plant_state.py)
+PLANT_MACHINES = '''
+    SELECT machine_id, name, status, last_maintenance, location, updated_at
+    FROM Machines
+    WHERE updated_at >= %s
+'''
+
+PLANT_MAINTENANCE = '''
+    SELECT maintenance_id, machine_id, schedule_date, completion_date, maintenance_type, status, remarks, updated_at
+    FROM Maintenance
+    WHERE updated_at >= %s
+'''
+
+# The maintenance a full load keeps, and the row counts a merge is checked
+# against; each takes the parameter of that table's full load
+PLANT_MAINTENANCE_CURRENT = f'''
+    SELECT maintenance_id, machine_id, schedule_date, completion_date, maintenance_type, status, remarks, updated_at
+    FROM Maintenance
+    WHERE {CURRENT_MAINTENANCE.format('')}
+'''
+
+PLANT_ROW_COUNTS = {
+    'Machines': 'SELECT COUNT(*) AS row_count FROM Machines WHERE updated_at >= %s',
+    'Maintenance': f'SELECT COUNT(*) AS row_count FROM Maintenance WHERE {CURRENT_MAINTENANCE.format("")}',
+}
+
+TABLE_VERSIONS = 'SELECT table_name, version FROM TableVersion'
+
+DOWNTIME_ALERTS = f'''
+    SELECT production_id, line_id, date, shift, downtime_minutes
+    FROM Production
+    WHERE downtime_minutes > %s AND date = {TODAY}
+'''
+
+INGEST_INSERT = {
+    'production': '''
+        INSERT INTO Production
+            (event_id, line_id, date, shift, output_units, target_units, downtime_minutes, quality_defects, operator_name)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (event_id) DO NOTHING
+    ''',
+    'downtime': '''
+        INSERT INTO Downtime
+            (event_id, machine_id, line_id, start_time, end_time, duration_minutes, reason, description, reported_by)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (event_id) DO NOTHING
+    ''',
+}
+
+CHATBOT_QUERIES = [
+    ('today_production', TODAY_PRODUCTION, ()),
+    ('maintenance_machines', MAINTENANCE_MACHINES, (30,)),
+    ('line_downtime', LINE_DOWNTIME, (1, 6)),
+    ('line_downtime_page', LINE_DOWNTIME_PAGE, (1, '2100-01-01', 51)),
+    ('machine_status', MACHINE_STATUS, (21,)),
+    ('machine_status_page', MACHINE_STATUS_PAGE, (0, 51)),
+    ('production_trend', PRODUCTION_TREND, ()),
+    ('downtime_alerts', DOWNTIME_ALERTS, (30,)),
+    ('table_versions', TABLE_VERSIONS, ()),
+    ('plant_machines', PLANT_MACHINES, ('2100-01-01',)),
+    ('plant_maintenance', PLANT_MAINTENANCE, ('2100-01-01',)),
+    ('plant_maintenance_current', PLANT_MAINTENANCE_CURRENT, (30,)),
+    ('production_report', *production_report('2100-01-01', '2100-01-31')),
+    ('production_report_line', *production_report('2100-01-01', '2100-01-31', line=1)),
+    ('production_report_shift', *production_report('2100-01-01', '2100-01-31', shift='Night')),
+    ('production_report_line_shift', *production_report('2100-01-01', '2100-01-31', line=1, shift='Night')),
+    ('oee_shifts', *oee_shifts('2100-01-01', '2100-01-31')),
+    ('oee_shifts_line', *oee_shifts('2100-01-01', '2100-01-31', line=1)),
+    ('oee_shifts_shift', *oee_shifts('2100-01-01', '2100-01-31', shift='Night')),
+    ('oee_shifts_line_shift', *oee_shifts('2100-01-01', '2100-01-31', line=1, shift='Night')),
+]
@@ -0,0 +1,214 @@
+"""Schema of the embedded SQLite database, at the latest MySQL migration
+
+The same tables, indexes and triggers as setup_database.py plus
+database/migrations.py, in SQLite syntax: ENUM columns become CHECK
+constraints, and the ProductionDaily rollup, TableVersion counters and
+updated_at change timestamps are kept by SQLite triggers, so the rollup
+queries, the query cache and the plant state behave as they do on MySQL.
+create() is idempotent; columns added since a file was created are added
+by create() instead of migrations.
+"""
+from database import rollup, table_versions
+
+# Local time to the millisecond, like MySQL's CURRENT_TIMESTAMP(6) but coarser
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+TABLES = [
+    f'''
+    CREATE TABLE IF NOT EXISTS Machines (
+        machine_id INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        status TEXT DEFAULT 'Running' CHECK (status IN ('Running', 'Stopped', 'Maintenance')),
+        last_maintenance DATE,
+        location VARCHAR(50),
+        manufacturer VARCHAR(50),
+        installed_date DATE,
+        updated_at DATETIME DEFAULT ({NOW})
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Production (
+        production_id INTEGER PRIMARY KEY,
+        line_id INT NOT NULL,
+        date DATE NOT NULL,
+        shift TEXT DEFAULT 'Morning' CHECK (shift IN ('Morning', 'Evening', 'Night')),
+        output_units INT DEFAULT 0,
+        target_units INT DEFAULT 0,
+        downtime_minutes INT DEFAULT 0,
+        quality_defects INT DEFAULT 0,
+        operator_name VARCHAR(50),
+        event_id VARCHAR(64)
+    )
+    ''',
+    f'''
+    CREATE TABLE IF NOT EXISTS Maintenance (
+        maintenance_id INTEGER PRIMARY KEY,
+        machine_id INT REFERENCES Machines(machine_id),
+        schedule_date DATE NOT NULL,
+        completion_date DATE,
+        maintenance_type TEXT DEFAULT 'Preventive' CHECK (maintenance_type IN ('Preventive', 'Corrective', 'Emergency')),
+        status TEXT DEFAULT 'Scheduled' CHECK (status IN ('Scheduled', 'In Progress', 'Completed')),
+        remarks TEXT,
+        technician VARCHAR(50),
+        duration_hours DECIMAL(4,2),
+        cost DECIMAL(10,2),
+        updated_at DATETIME DEFAULT ({NOW})
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS Downtime (
+        downtime_id INTEGER PRIMARY KEY,
+        machine_id INT REFERENCES Machines(machine_id),
+        line_id INT,
+        start_time DATETIME,
+        end_time DATETIME,
+        duration_minutes INT,
+        reason TEXT CHECK (reason IN ('Breakdown', 'Maintenance', 'Material Shortage', 'Quality Check', 'Power Outage', 'Other')),
+        description TEXT,
+        reported_by VARCHAR(50),
+        event_id VARCHAR(64)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS ProductionDaily (
+        date DATE NOT NULL,
+        line_id INT NOT NULL,
+        output_units BIGINT NOT NULL DEFAULT 0,
+        target_units BIGINT NOT NULL DEFAULT 0,
+        downtime_minutes BIGINT NOT NULL DEFAULT 0,
+        quality_defects BIGINT NOT NULL DEFAULT 0,
+        shift_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (date, line_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS TableVersion (
+        table_name VARCHAR(64) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    ''',
+]
+
+# Same names and columns as migrations 1, 4, 5, 6 and 8
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_production_line_date ON Production (line_id, date)',
+    'CREATE INDEX IF NOT EXISTS idx_production_date_downtime ON Production (date, downtime_minutes, output_units)',
+    'CREATE INDEX IF NOT EXISTS idx_production_date_shift_line ON Production (date, shift, line_id)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS uq_production_event_id ON Production (event_id)',
+    'CREATE INDEX IF NOT EXISTS idx_maintenance_machine_schedule ON Maintenance (machine_id, schedule_date)',
+    'CREATE INDEX IF NOT EXISTS idx_maintenance_schedule ON Maintenance (schedule_date)',
+    'CREATE INDEX IF NOT EXISTS idx_maintenance_status ON Maintenance (status)',
+    'CREATE INDEX IF NOT EXISTS idx_machines_status ON Machines (status)',
+    'CREATE INDEX IF NOT EXISTS idx_downtime_line_start ON Downtime (line_id, start_time)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS uq_downtime_event_id ON Downtime (event_id)',
+    'CREATE INDEX IF NOT EXISTS idx_daily_line_date ON ProductionDaily (line_id, date)',
+    'CREATE INDEX IF NOT EXISTS idx_machines_updated ON Machines (updated_at)',
+    'CREATE INDEX IF NOT EXISTS idx_maintenance_updated ON Maintenance (updated_at)',
+]
+
+# (table, column, definition) added to files created before the column was
+ADDED_COLUMNS = [
+    ('Machines', 'updated_at', 'DATETIME'),
+    ('Maintenance', 'updated_at', 'DATETIME'),
+]
+
+_ADD_ROW = '''
+    INSERT INTO ProductionDaily
+        (date, line_id, output_units, target_units, downtime_minutes, quality_defects, shift_count)
+    VALUES
+        (NEW.date, NEW.line_id, IFNULL(NEW.output_units, 0), IFNULL(NEW.target_units, 0),
+         IFNULL(NEW.downtime_minutes, 0), IFNULL(NEW.quality_defects, 0), 1)
+    ON CONFLICT (date, line_id) DO UPDATE SET
+        output_units = output_units + excluded.output_units,
+        target_units = target_units + excluded.target_units,
+        downtime_minutes = downtime_minutes + excluded.downtime_minutes,
+        quality_defects = quality_defects + excluded.quality_defects,
+        shift_count = shift_count + 1;
+'''
+
+_REMOVE_ROW = '''
+    UPDATE ProductionDaily SET
+        output_units = output_units - IFNULL(OLD.output_units, 0),
+        target_units = target_units - IFNULL(OLD.target_units, 0),
+        downtime_minutes = downtime_minutes - IFNULL(OLD.downtime_minutes, 0),
+        quality_defects = quality_defects - IFNULL(OLD.quality_defects, 0),
+        shift_count = shift_count - 1
+    WHERE date = OLD.date AND line_id = OLD.line_id;
+'''
+
+_DROP_EMPTY_ROW = '''
+    DELETE FROM ProductionDaily
+    WHERE date = OLD.date AND line_id = OLD.line_id AND shift_count = 0;
+'''
+
+_BUMP = "UPDATE TableVersion SET version = version + 1 WHERE table_name = '{table}';"
+
+# Rollup triggers keep the MySQL names from database/rollup.py
+ROLLUP_TRIGGERS = {
+    'trg_production_daily_insert': f'''
+        CREATE TRIGGER trg_production_daily_insert AFTER INSERT ON Production
+        BEGIN {_ADD_ROW} END
+    ''',
+    'trg_production_daily_update': f'''
+        CREATE TRIGGER trg_production_daily_update AFTER UPDATE ON Production
+        BEGIN {_REMOVE_ROW} {_ADD_ROW} {_DROP_EMPTY_ROW} END
+    ''',
+    'trg_production_daily_delete': f'''
+        CREATE TRIGGER trg_production_daily_delete AFTER DELETE ON Production
+        BEGIN {_REMOVE_ROW} {_DROP_EMPTY_ROW} END
+    ''',
+}
+
+VERSION_TRIGGERS = {
+    name: f'''
+        CREATE TRIGGER {name} AFTER {name.rsplit('_', 1)[1].upper()} ON {table}
+        BEGIN {_BUMP.format(table=table)} END
+    '''
+    for table in table_versions.TRIGGERED_TABLES
+    for name in (f'trg_{table.lower()}_version_{event}' for event in ('insert', 'update', 'delete'))
+}
+
+# ON UPDATE CURRENT_TIMESTAMP(6), and the default for columns added later
+TIMESTAMP_TRIGGERS = {
+    f'trg_{table.lower()}_updated_{event}': f'''
+        CREATE TRIGGER trg_{table.lower()}_updated_{event} AFTER {event.upper()} ON {table}
+        WHEN {'NEW.updated_at IS NULL' if event == 'insert' else 'NEW.updated_at IS OLD.updated_at'}
+        BEGIN UPDATE {table} SET updated_at = {NOW} WHERE {key} = NEW.{key}; END
+    '''
+    for table, key in (('Machines', 'machine_id'), ('Maintenance', 'maintenance_id'))
+    for event in ('insert', 'update')
+}
+
+TRIGGERS = {**ROLLUP_TRIGGERS, **VERSION_TRIGGERS, **TIMESTAMP_TRIGGERS}
+
+
+def create_triggers(cursor):
+    drop_triggers(cursor)
+    for sql in TRIGGERS.values():
+        cursor.execute(sql)
+
+def drop_triggers(cursor):
+    # Also the version triggers the batch tables used to have
+    for name in {*TRIGGERS, *table_versions.TRIGGER_NAMES}:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+def _add_columns(cursor):
+    for table, column, definition in ADDED_COLUMNS:
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            if column == 'updated_at':
+                cursor.execute(f'UPDATE {table} SET updated_at = {NOW}')
+
+def create(cursor):
+    """Create every table, column, index and trigger that does not exist yet"""
+    for sql in TABLES:
+        cursor.execute(sql)
+    _add_columns(cursor)
+    for sql in INDEXES:
+        cursor.execute(sql)
+    cursor.executemany('INSERT OR IGNORE INTO TableVersion (table_name) VALUES (%s)',
+                       [(table,) for table in table_versions.TRACKED_TABLES])
+    create_triggers(cursor)
+    # Left behind by triggers older than _DROP_EMPTY_ROW (as migration 9)
+    rollup.drop_empty_rows(cursor)
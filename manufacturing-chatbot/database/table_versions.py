@@ -0,0 +1,67 @@
+"""TableVersion: a write counter per base table
+
+Caches tell whether a result read earlier is still current by comparing
+these counters, with one primary-key read. ProductionDaily is derived
+from Production and shares its version.
+
+Machines and Maintenance are edited a row at a time, by any tool, so
+FOR EACH ROW triggers bump their counters. Production and Downtime take
+batched inserts (ingest.py, setup_database.py). A row trigger there would
+update the one TableVersion row once per inserted row, serializing every
+writer on it, so those writers call bump() once per statement instead,
+after the rows are written. A manual change to those tables should be
+followed by bump(); otherwise caches pick it up when their entries
+expire (QUERY_CACHE_TTL, REPLY_CACHE_TTL, PLANT_STATE_RELOAD_SECONDS).
+"""
+
+TRACKED_TABLES = ('Machines', 'Maintenance', 'Production', 'Downtime')
+
+# Tables whose counters triggers bump; writers bump the rest
+TRIGGERED_TABLES = ('Machines', 'Maintenance')
+BATCH_TABLES = ('Production', 'Downtime')
+
+# Derived tables whose contents change only when their source changes
+DERIVED_TABLES = {'ProductionDaily': 'Production'}
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS TableVersion (
+        table_name VARCHAR(64) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+'''
+
+_BUMP = "UPDATE TableVersion SET version = version + 1 WHERE table_name = '{table}'"
+
+TRIGGERS = {
+    f'trg_{table.lower()}_version_{event.lower()}': f'''
+        CREATE TRIGGER trg_{table.lower()}_version_{event.lower()} AFTER {event} ON {table}
+        FOR EACH ROW {_BUMP.format(table=table)}
+    '''
+    for table in TRIGGERED_TABLES
+    for event in ('INSERT', 'UPDATE', 'DELETE')
+}
+
+# Every name this module has created, including the row triggers the batch
+# tables had before their writers bumped the counters themselves
+TRIGGER_NAMES = [f'trg_{table.lower()}_version_{event}'
+                 for table in TRACKED_TABLES for event in ('insert', 'update', 'delete')]
+
+
+def create_table(cursor):
+    cursor.execute(CREATE_TABLE)
+    cursor.executemany('INSERT IGNORE INTO TableVersion (table_name) VALUES (%s)',
+                       [(table,) for table in TRACKED_TABLES])
+
+def create_triggers(cursor):
+    drop_triggers(cursor)
+    for sql in TRIGGERS.values():
+        cursor.execute(sql)
+
+def drop_triggers(cursor):
+    for name in TRIGGER_NAMES:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+def bump(cursor, tables=TRACKED_TABLES):
+    """Mark tables as changed: after writing to BATCH_TABLES, or to any table with the triggers dropped"""
+    cursor.executemany('UPDATE TableVersion SET version = version + 1 WHERE table_name = %s',
+                       [(table,) for table in tables])
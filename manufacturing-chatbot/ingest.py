@@ -0,0 +1,354 @@
+"""Ingestion of production and downtime events pushed by the MES
+
+POST /ingest takes a JSON array (or {"events": [...]}) or NDJSON, one
+event per line. Every event carries a client event_id, unique per type:
+
+    {"event_id": "mes-1842", "type": "production", "line_id": 3, "date": "2024-05-02",
+     "shift": "Night", "output_units": 412, "target_units": 450, "downtime_minutes": 12,
+     "quality_defects": 2, "operator_name": "R. Iyer"}
+    {"event_id": "mes-1843", "type": "downtime", "line_id": 3, "machine_id": 17,
+     "start_time": "2024-05-02T23:10:00", "end_time": "2024-05-02T23:22:00",
+     "reason": "Breakdown", "description": "Conveyor jam", "reported_by": "MES"}
+
+A production event is one reported row for its line, date and shift; it
+adds to that shift's totals. Valid events are buffered and written by one
+flusher thread in multi-row inserts once INGEST_BATCH_SIZE events are
+waiting or the oldest has waited INGEST_FLUSH_SECONDS. Event IDs are
+unique in the database, so a retried batch inserts nothing twice.
+"""
+import json
+import threading
+import time
+from datetime import date, datetime
+
+from alerts import alert_monitor
+from database import table_versions
+from database.backends import backend
+from database.config import Config
+from database.query_cache import query_cache
+from metrics import INGEST_EVENTS, INGEST_FLUSH_SECONDS
+from plant_state import plant_state
+
+SHIFTS = ('Morning', 'Evening', 'Night')
+DOWNTIME_REASONS = ('Breakdown', 'Maintenance', 'Material Shortage', 'Quality Check', 'Power Outage', 'Other')
+
+# A duplicate event_id leaves the existing row untouched and counts as 0 affected rows
+INSERT_SQL = backend.queries.INGEST_INSERT
+
+# TableVersion row of each event type's table, bumped once per insert statement
+TABLES = {'production': 'Production', 'downtime': 'Downtime'}
+
+
+class BufferFull(Exception):
+    """INGEST_MAX_BUFFER events are already waiting to be written"""
+
+
+# Validation: each function returns the row tuple for INSERT_SQL or raises ValueError
+
+def _text(event, field, max_length, required=False):
+    value = event.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f"'{field}' is required")
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"'{field}' must be a non-empty string")
+    if len(value) > max_length:
+        raise ValueError(f"'{field}' is longer than {max_length} characters")
+    return value.strip()
+
+def _count(event, field, required=False, default=0, positive=False):
+    value = event.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f"'{field}' is required")
+        return default
+    # bool is an int subclass; reject it explicitly
+    if isinstance(value, bool) or not isinstance(value, int) or value < (1 if positive else 0):
+        raise ValueError(f"'{field}' must be a {'positive' if positive else 'non-negative'} integer")
+    return value
+
+def _choice(event, field, choices, required=False, default=None):
+    value = event.get(field, default)
+    if value is None and not required:
+        return None
+    if value not in choices:
+        raise ValueError(f"'{field}' must be one of: {', '.join(choices)}")
+    return value
+
+def _date(event, field):
+    try:
+        return date.fromisoformat(event[field])
+    except KeyError:
+        raise ValueError(f"'{field}' is required")
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be a YYYY-MM-DD date")
+
+def _datetime(event, field, required=False):
+    value = event.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f"'{field}' is required")
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be an ISO 8601 date and time")
+    # Stored as plant-local DATETIME
+    return parsed.replace(tzinfo=None)
+
+def production_row(event):
+    return (
+        _text(event, 'event_id', 64, required=True),
+        _count(event, 'line_id', required=True, positive=True),
+        _date(event, 'date'),
+        _choice(event, 'shift', SHIFTS, default='Morning'),
+        _count(event, 'output_units', required=True),
+        _count(event, 'target_units'),
+        _count(event, 'downtime_minutes'),
+        _count(event, 'quality_defects'),
+        _text(event, 'operator_name', 50),
+    )
+
+def downtime_row(event):
+    start = _datetime(event, 'start_time', required=True)
+    end = _datetime(event, 'end_time')
+    if end is not None and end < start:
+        raise ValueError("'end_time' is before 'start_time'")
+    duration = _count(event, 'duration_minutes', default=None)
+    if duration is None and end is not None:
+        duration = int((end - start).total_seconds() // 60)
+    return (
+        _text(event, 'event_id', 64, required=True),
+        _count(event, 'machine_id', default=None, positive=True),
+        _count(event, 'line_id', required=True, positive=True),
+        start,
+        end,
+        duration,
+        _choice(event, 'reason', DOWNTIME_REASONS, default='Other'),
+        _text(event, 'description', 2000),
+        _text(event, 'reported_by', 50),
+    )
+
+VALIDATORS = {'production': production_row, 'downtime': downtime_row}
+
+def parse_events(body, mimetype):
+    """Decode a request body into (events, rejected); rejected holds {"index", "error"} entries"""
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    if mimetype in ('application/x-ndjson', 'application/jsonl', 'application/jsonlines'):
+        events, rejected = [], []
+        for index, line in enumerate(line for line in text.splitlines() if line.strip()):
+            try:
+                events.append((index, json.loads(line)))
+            except ValueError as e:
+                rejected.append({"index": index, "error": f"invalid JSON: {e}"})
+        return events, rejected
+
+    try:
+        payload = json.loads(text)
+    except ValueError as e:
+        return [], [{"index": None, "error": f"invalid JSON: {e}"}]
+    if isinstance(payload, dict):
+        payload = payload['events'] if isinstance(payload.get('events'), list) else [payload]
+    if not isinstance(payload, list):
+        return [], [{"index": None, "error": "expected an event object, a list of events or {\"events\": [...]}"}]
+    return list(enumerate(payload)), []
+
+def validate(events):
+    """Return ({type: [row, ...]}, rejected) for (index, event) pairs"""
+    rows = {kind: [] for kind in VALIDATORS}
+    rejected = []
+    rejected_by_type = {}
+    for index, event in events:
+        kind = event.get('type') if isinstance(event, dict) else None
+        kind = kind if isinstance(kind, str) else None
+        try:
+            if not isinstance(event, dict):
+                raise ValueError("event must be a JSON object")
+            if kind not in VALIDATORS:
+                raise ValueError(f"'type' must be one of: {', '.join(VALIDATORS)}")
+            rows[kind].append(VALIDATORS[kind](event))
+        except ValueError as e:
+            rejected.append({"index": index, "event_id": event.get('event_id') if isinstance(event, dict) else None,
+                             "error": str(e)})
+            label = kind if kind in VALIDATORS else 'unknown'
+            rejected_by_type[label] = rejected_by_type.get(label, 0) + 1
+    for kind, kind_rows in rows.items():
+        if kind_rows:
+            INGEST_EVENTS.inc(len(kind_rows), type=kind, outcome='accepted')
+    for kind, count in rejected_by_type.items():
+        INGEST_EVENTS.inc(count, type=kind, outcome='rejected')
+    return rows, rejected
+
+
+class IngestBuffer:
+    """In-memory queue of validated rows, written in batches by one flusher thread
+
+    Rows are grouped into numbered batches. submit() returns the number of
+    the batch its rows joined, and wait() blocks until that batch (or a
+    later one) is committed. A batch that fails to write is put back at the
+    front of the next one, so nothing accepted is dropped while MySQL is
+    unavailable; event IDs make the retry safe.
+    """
+
+    def __init__(self, batch_size, flush_seconds, max_buffer):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffer = max_buffer
+        self._pending = {kind: [] for kind in INSERT_SQL}
+        self._size = 0
+        self._oldest = None     # monotonic time the oldest pending row arrived
+        self._batch = 1         # number of the batch being filled
+        self._committed = 0     # highest batch number written
+        self._urgent = False    # a caller is waiting; flush without waiting for a threshold
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats = {'inserted': 0, 'duplicates': 0, 'failed': 0, 'flushes': 0, 'flush_errors': 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+                self._thread.start()
+
+    def submit(self, rows, urgent=False):
+        """Queue {type: [row, ...]} and return the batch number; raises BufferFull
+
+        urgent flushes right away, for callers that will wait() on the batch.
+        """
+        count = sum(len(kind_rows) for kind_rows in rows.values())
+        with self._cond:
+            if self._size + count > self.max_buffer:
+                raise BufferFull()
+            for kind, kind_rows in rows.items():
+                self._pending[kind].extend(kind_rows)
+            self._size += count
+            self._urgent |= urgent
+            # Wake the flusher to start timing a new batch or to flush now
+            if (self._oldest is None and count) or urgent or self._size >= self.batch_size:
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                self._cond.notify_all()
+            return self._batch
+
+    def wait(self, batch, timeout):
+        """Block until batch is committed; return False on timeout"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._committed >= batch, timeout)
+
+    def _take(self):
+        """Wait for a flush threshold, then detach and return (batch number, rows)"""
+        with self._cond:
+            while True:
+                if self._size >= self.batch_size or (self._urgent and self._size):
+                    break
+                if self._oldest is not None:
+                    remaining = self._oldest + self.flush_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            batch, pending = self._batch, self._pending
+            self._batch += 1
+            self._pending = {kind: [] for kind in INSERT_SQL}
+            self._size = 0
+            self._oldest = None
+            self._urgent = False
+            return batch, pending
+
+    def _requeue(self, pending):
+        with self._cond:
+            for kind, kind_rows in pending.items():
+                self._pending[kind][:0] = kind_rows
+                self._size += len(kind_rows)
+            if self._size:
+                self._oldest = time.monotonic()
+
+    def _run(self):
+        while True:
+            batch, pending = self._take()
+            try:
+                self.write(pending)
+            except Exception as e:
+                print(f"Ingest flush error: {e}")
+                with self._cond:
+                    self._stats['flush_errors'] += 1
+                self._requeue(pending)
+                time.sleep(min(self.flush_seconds, 1) or 0.1)
+                continue
+            with self._cond:
+                self._committed = batch
+                self._cond.notify_all()
+
+    def write(self, pending):
+        """Insert pending rows in multi-row statements of at most batch_size rows"""
+        started = time.perf_counter()
+        conn = backend.connect()
+        if conn is None:
+            raise RuntimeError("no database connection")
+        counts = {}
+        try:
+            cursor = conn.cursor()
+            try:
+                for kind, kind_rows in pending.items():
+                    for i in range(0, len(kind_rows), self.batch_size):
+                        inserted, failed = self._insert(cursor, INSERT_SQL[kind], kind_rows[i:i + self.batch_size])
+                        if inserted:
+                            # Once per statement, after its rows (see database/table_versions.py)
+                            table_versions.bump(cursor, (TABLES[kind],))
+                        chunk = counts.setdefault(kind, [0, 0, 0])
+                        chunk[0] += inserted
+                        chunk[1] += len(kind_rows[i:i + self.batch_size]) - inserted - failed
+                        chunk[2] += failed
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+        INGEST_FLUSH_SECONDS.observe(time.perf_counter() - started)
+
+        with self._cond:
+            self._stats['flushes'] += 1
+            for kind, (inserted, duplicates, failed) in counts.items():
+                self._stats['inserted'] += inserted
+                self._stats['duplicates'] += duplicates
+                self._stats['failed'] += failed
+        for kind, (inserted, duplicates, failed) in counts.items():
+            for outcome, value in (('inserted', inserted), ('duplicate', duplicates), ('failed', failed)):
+                if value:
+                    INGEST_EVENTS.inc(value, type=kind, outcome=outcome)
+
+        if any(inserted for inserted, _, _ in counts.values()):
+            query_cache.invalidate()
+        if counts.get('production', (0,))[0]:
+            alert_monitor.refresh()
+            plant_state.refresh()
+        return counts
+
+    @staticmethod
+    def _insert(cursor, sql, rows):
+        """Return (inserted, failed); rows rejected by a constraint are skipped one by one"""
+        try:
+            cursor.executemany(sql, rows)
+            return max(cursor.rowcount, 0), 0
+        except backend.IntegrityError:
+            # e.g. an unknown machine_id; the multi-row statement was rolled
+            # back as a whole, so insert row by row and skip the offenders
+            inserted = failed = 0
+            for row in rows:
+                try:
+                    cursor.execute(sql, row)
+                    inserted += max(cursor.rowcount, 0)
+                except backend.IntegrityError as e:
+                    print(f"Ingest skipped event {row[0]}: {e}")
+                    failed += 1
+            return inserted, failed
+
+    def stats(self):
+        with self._cond:
+            return dict(self._stats, buffered=self._size)
+
+
+ingest_buffer = IngestBuffer(Config.INGEST_BATCH_SIZE, Config.INGEST_FLUSH_SECONDS, Config.INGEST_MAX_BUFFER)
@@ -0,0 +1,199 @@
+import calendar
+import re
+from datetime import date, timedelta
+
+
+# Slot extractors: name -> function(message) returning a value or None
+
+_LINE_RE = re.compile(r'\bline\s*(?:no\.?\s*|number\s*|#\s*)?(\d+)\b')
+_SHIFT_RE = re.compile(r'\b(morning|evening|night)\b')
+_MACHINE_RE = re.compile(r'\bmachine\s+(?:#\s*)?(\d+|[a-h])\b')
+_LAST_DAYS_RE = re.compile(r'\b(?:last|past)\s+(\d+)\s+days?\b')
+_ISO_RANGE_RE = re.compile(r'\b(\d{4}-\d{2}-\d{2})\s*(?:to|until|through|and|-)\s*(\d{4}-\d{2}-\d{2})\b')
+_ISO_DATE_RE = re.compile(r'\b(\d{4}-\d{2}-\d{2})\b')
+MONTHS = tuple(name.lower() for name in calendar.month_name[1:])
+_MONTH_RE = re.compile(r'\b(?:(in|for|during|of)\s+)?(' + '|'.join(MONTHS) + r')\b(?:\s+(\d{4}))?')
+
+def extract_line(message):
+    match = _LINE_RE.search(message)
+    return int(match.group(1)) if match else None
+
+def extract_shift(message):
+    match = _SHIFT_RE.search(message)
+    return match.group(1).capitalize() if match else None
+
+def extract_machine(message):
+    match = _MACHINE_RE.search(message)
+    if not match:
+        return None
+    value = match.group(1)
+    return int(value) if value.isdigit() else value.upper()
+
+def _month_range(year, month):
+    return (date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1]))
+
+def _month_name_range(message, today):
+    for match in _MONTH_RE.finditer(message):
+        preposition, name, year = match.groups()
+        # "may" is usually the verb unless it reads as a date
+        if name == 'may' and not (preposition or year):
+            continue
+        month = MONTHS.index(name) + 1
+        if year:
+            return _month_range(int(year), month)
+        # A bare month name means its latest occurrence, this year or last
+        return _month_range(today.year if month <= today.month else today.year - 1, month)
+    return None
+
+def extract_date_range(message, today=None):
+    """Return an inclusive (start, end) date range mentioned in the message"""
+    today = today or date.today()
+    try:
+        match = _ISO_RANGE_RE.search(message)
+        if match:
+            start, end = sorted(date.fromisoformat(value) for value in match.groups())
+            return (start, end)
+        match = _ISO_DATE_RE.search(message)
+        if match:
+            day = date.fromisoformat(match.group(1))
+            return (day, day)
+    except ValueError:
+        pass
+    match = _LAST_DAYS_RE.search(message)
+    if match:
+        return (today - timedelta(days=int(match.group(1)) - 1), today)
+    if 'yesterday' in message:
+        yesterday = today - timedelta(days=1)
+        return (yesterday, yesterday)
+    if 'last week' in message:
+        start = today - timedelta(days=today.weekday() + 7)
+        return (start, start + timedelta(days=6))
+    if 'this week' in message:
+        return (today - timedelta(days=today.weekday()), today)
+    if 'last month' in message:
+        last_month = today.replace(day=1) - timedelta(days=1)
+        return _month_range(last_month.year, last_month.month)
+    if 'this month' in message:
+        return (today.replace(day=1), today)
+    month_range = _month_name_range(message, today)
+    if month_range:
+        return month_range
+    if 'today' in message:
+        return (today, today)
+    return None
+
+SLOT_EXTRACTORS = {
+    'line': extract_line,
+    'shift': extract_shift,
+    'machine': extract_machine,
+    'date_range': extract_date_range,
+}
+
+
+def _trie_pattern(keywords):
+    """Regex for a keyword set, factored as a character trie
+
+    A flat alternation makes the regex engine try every keyword at each
+    position; the trie form branches on one character per level instead,
+    so matching cost depends on keyword length, not keyword count. Greedy
+    optional tails keep the longest keyword preferred.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        pattern = '(?:' + '|'.join(branches) + ')'
+        return pattern + '?' if '' in node else pattern
+
+    return build(trie)
+
+
+class Intent:
+    def __init__(self, name, requires, slots, handler, order, needs=()):
+        self.name = name
+        self.requires = requires  # list of keyword groups; each group needs one hit
+        self.slots = slots
+        self.handler = handler
+        self.order = order
+        self.needs = needs        # slots of which at least one must be found, if any
+
+
+class IntentRouter:
+    """Keyword intent registry compiled into a single regex scan per message
+
+    Every keyword of every intent goes into one trie regex. A message is
+    scanned once, and only the intents whose keywords were hit are checked,
+    so classification cost does not grow with the number of intents. When
+    several intents match, the one satisfying the most keyword groups wins,
+    then the one registered first. An intent registered with needs= only
+    matches when one of those slots is actually found in the message, so a
+    keyword like "may" or "from" alone does not select it.
+    """
+
+    def __init__(self):
+        self.intents = []
+        self._matcher = None
+        self._keyword_index = {}  # keyword -> [(intent index, group index)]
+
+    def register(self, name, requires, slots=(), handler=None, needs=()):
+        requires = [tuple(group) if isinstance(group, (list, tuple)) else (group,) for group in requires]
+        for slot in slots:
+            if slot not in SLOT_EXTRACTORS:
+                raise ValueError(f"Unknown slot '{slot}' for intent '{name}'")
+        for slot in needs:
+            if slot not in slots:
+                raise ValueError(f"Needed slot '{slot}' is not a slot of intent '{name}'")
+        self.intents.append(Intent(name, requires, tuple(slots), handler, len(self.intents), tuple(needs)))
+        self._matcher = None
+
+    def intent(self, name, requires, slots=(), needs=()):
+        """Decorator form of register() for handler functions"""
+        def decorator(handler):
+            self.register(name, requires, slots, handler, needs)
+            return handler
+        return decorator
+
+    def bind(self, handlers):
+        """Return a router with the same intents dispatching to handlers[name] instead"""
+        router = IntentRouter()
+        for intent in self.intents:
+            router.register(intent.name, intent.requires, intent.slots, handlers[intent.name], intent.needs)
+        return router
+
+    def compile(self):
+        index = {}
+        for i, intent in enumerate(self.intents):
+            for j, group in enumerate(intent.requires):
+                for keyword in group:
+                    index.setdefault(keyword.lower(), []).append((i, j))
+        # No trailing boundary so plurals and possessives still match
+        self._matcher = re.compile(r'\b(' + _trie_pattern(index) + ')')
+        self._keyword_index = index
+
+    def classify(self, message):
+        """Return (intent, slots) for a lowercased message; intent is None if nothing matched"""
+        if self._matcher is None:
+            self.compile()
+
+        hits = {}  # intent index -> set of satisfied group indexes
+        for keyword in self._matcher.findall(message):
+            for i, j in self._keyword_index[keyword]:
+                hits.setdefault(i, set()).add(j)
+
+        matched = [self.intents[i] for i, groups in hits.items() if len(groups) == len(self.intents[i].requires)]
+        matched.sort(key=lambda intent: (-len(intent.requires), intent.order))
+        for intent in matched:
+            slots = {slot: SLOT_EXTRACTORS[slot](message) for slot in intent.slots}
+            if intent.needs and all(slots[slot] is None for slot in intent.needs):
+                continue
+            return intent, slots
+        return None, {}
@@ -0,0 +1,143 @@
+"""Overall Equipment Effectiveness from Production shift rows
+
+For any group of shift rows (per line, shift, day or a combination):
+
+    availability = (planned - downtime) / planned    planned = SHIFT_MINUTES per row
+    performance  = output / (target * availability)  target is what the whole shift should make,
+                                                     capped at 1 as in standard OEE
+    quality      = (output - defects) / output
+    oee          = availability * performance * quality = good units / target
+                                                     while performance is under the cap
+
+Each figure is computed from the group's sums, so long and short groups
+are weighed by their size rather than averaged shift by shift.
+
+Rows arrive in bulk as integer tuples (queries.OEE_SHIFTS) and are copied
+into one column-major int64 array without building per-row objects.
+Grouping is a bincount over a packed key when the keys are dense, and a
+sort otherwise, so millions of shift rows aggregate within interactive
+latency (benchmarks/bench_oee.py). NumPy is imported on first use, keeping
+it out of app start-up like matplotlib.
+"""
+from datetime import date
+from itertools import chain
+
+from database.config import Config
+
+# Column order of queries.OEE_SHIFTS rows
+COLUMNS = ('line', 'day', 'shift', 'output_units', 'target_units', 'downtime_minutes', 'quality_defects')
+GROUP_KEYS = ('line', 'day', 'shift')
+
+# Production.shift ENUM index; 0 when the shift is missing
+SHIFT_NAMES = ('Unknown', 'Morning', 'Evening', 'Night')
+
+_SUMS = ('output_units', 'target_units', 'downtime_minutes', 'quality_defects')
+
+
+def to_columns(rows):
+    """Copy OEE_SHIFTS rows (tuples, or dicts in column order) into a (7, n) int64 array, one row per column"""
+    import numpy as np
+    if rows and isinstance(rows[0], dict):
+        rows = (row.values() for row in rows)
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.int64)
+    # Contiguous columns keep the per-column sums and key packing sequential
+    return np.ascontiguousarray(flat.reshape(-1, len(COLUMNS)).T)
+
+def _group(keys):
+    """Return (group number per row, number of groups, key values per group)
+
+    Keys are packed into one integer per row. While the packed range stays
+    within a few times the row count, a bincount over it finds the groups
+    in one linear pass; sparse ranges fall back to a sort.
+    """
+    import numpy as np
+    lows = keys.min(axis=1)
+    spans = keys.max(axis=1) - lows + 1
+    packed = keys[0] - lows[0]
+    for column in range(1, len(keys)):
+        packed = packed * spans[column] + (keys[column] - lows[column])
+
+    span = int(np.prod(spans, dtype=np.float64))
+    if span <= max(4 * keys.shape[1], 1 << 16):
+        present = np.bincount(packed, minlength=span) > 0
+        codes = np.flatnonzero(present)
+        index = np.cumsum(present) - 1  # packed value -> group number
+        inverse = index[packed]
+    else:
+        codes, inverse = np.unique(packed, return_inverse=True)
+
+    group_keys = np.empty((len(keys), len(codes)), dtype=np.int64)
+    for column in range(len(keys) - 1, -1, -1):
+        group_keys[column] = codes % spans[column] + lows[column]
+        codes = codes // spans[column]
+    return inverse, len(codes), group_keys
+
+def aggregate(columns, by=('line',), shift_minutes=None):
+    """OEE per group of a (7, n) array from to_columns()
+
+    by names the grouping columns from GROUP_KEYS; () aggregates everything
+    into one group. Returns a dict of equal-length arrays: one per grouping
+    column, 'shifts', the four sums, and availability, performance, quality
+    and oee as fractions (NaN where a denominator is zero). Groups are
+    ordered by their key columns.
+    """
+    import numpy as np
+    shift_minutes = shift_minutes or Config.SHIFT_MINUTES
+    rows = columns.shape[1]
+    if rows == 0:
+        return {name: np.empty(0) for name in (*by, 'shifts', *_SUMS, 'availability', 'performance', 'quality', 'oee')}
+
+    result = {}
+    if by:
+        inverse, count, group_keys = _group(columns[[GROUP_KEYS.index(name) for name in by]])
+        result.update(zip(by, group_keys))
+        result['shifts'] = np.bincount(inverse, minlength=count)
+        for name in _SUMS:
+            # Float sums are exact well past any plant's totals
+            result[name] = np.bincount(inverse, weights=columns[COLUMNS.index(name)], minlength=count).astype(np.int64)
+    else:
+        result['shifts'] = np.array([rows])
+        for name in _SUMS:
+            result[name] = columns[COLUMNS.index(name)].sum(keepdims=True)
+
+    planned = result['shifts'] * float(shift_minutes)
+    good = result['output_units'] - result['quality_defects']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['availability'] = (planned - result['downtime_minutes']) / planned
+        result['performance'] = result['output_units'] / (result['target_units'] * result['availability'])
+        result['quality'] = good / result['output_units']
+        # The product of the three, but still defined when availability is 0
+        result['oee'] = good / result['target_units']
+    for name in ('performance', 'quality', 'oee'):
+        result[name][~np.isfinite(result[name])] = np.nan
+    # Running faster than the target rate counts as full speed, so neither
+    # performance nor OEE goes past 100%
+    over = result['performance'] > 1
+    result['performance'][over] = 1.0
+    result['oee'][over] = (result['availability'] * result['quality'])[over]
+    return result
+
+def records(result):
+    """Aggregate result as a list of dicts, days as dates, shifts by name and NaN as None"""
+    import numpy as np
+    rows = []
+    for i in range(len(result['shifts'])):
+        row = {}
+        for name, values in result.items():
+            value = values[i].item()
+            if name == 'day':
+                value = date.fromordinal(value)
+            elif name == 'shift':
+                value = SHIFT_NAMES[value] if 0 <= value < len(SHIFT_NAMES) else str(value)
+            elif isinstance(value, float) and np.isnan(value):
+                value = None
+            row[name] = value
+        rows.append(row)
+    return rows
+
+def report(rows, by=('line',)):
+    """(overall record, per-group records) for OEE_SHIFTS rows, or (None, []) if there are none"""
+    columns = to_columns(rows)
+    if columns.shape[1] == 0:
+        return None, []
+    return records(aggregate(columns, ()))[0], records(aggregate(columns, by))
@@ -0,0 +1,126 @@
+"""Keyset-paginated history lists, streamed as JSON
+
+Each page query continues after the key of the last row the client has,
+so reading page N costs the same as page 1 and no page re-scans earlier
+ones. Rows are read from an unbuffered (server-side) cursor and written
+to the response in chunks as they arrive, so a page is never held in
+memory whole. A page is sent as
+
+    {"rows": [{..., "text": "..."}, ...], "next": "/history/...&after=<cursor>" or null}
+
+where "text" is the row as the chat reply would show it.
+"""
+import base64
+import json
+
+from database.backends import backend
+from database.config import Config
+import responses
+
+CHUNK_ROWS = 100  # rows per chunk written to the response
+
+
+def encode_cursor(key):
+    """Opaque, URL-safe token for a row key (a list of column values)"""
+    return base64.urlsafe_b64encode(json.dumps(key, default=str).encode()).decode().rstrip('=')
+
+def decode_cursor(token, size):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(key, list) or len(key) != size or not all(isinstance(value, (str, int)) for value in key):
+        raise ValueError("invalid cursor")
+    return key
+
+def page_size(requested):
+    if requested is None:
+        return Config.HISTORY_PAGE_SIZE
+    return max(1, min(requested, Config.HISTORY_MAX_PAGE_SIZE))
+
+
+class KeysetQuery:
+    """A list read newest-first (or by id) in pages keyed on the last row sent"""
+
+    def __init__(self, first_sql, page_sql, key_columns, render):
+        self.first_sql = first_sql
+        self.page_sql = page_sql
+        self.key_columns = key_columns
+        self.render = render  # row -> JSON-able dict
+
+    def key(self, row):
+        return [row[column] for column in self.key_columns]
+
+    def statement(self, filters, after, limit):
+        """(sql, params) for the page after key `after` (None for the first page); reads one extra row"""
+        if after is None:
+            return self.first_sql, (*filters, limit + 1)
+        return self.page_sql, (*filters, *after, limit + 1)
+
+    def stream(self, rows, limit, next_url):
+        """Yield one page of rows as JSON text chunks; rows may be a live cursor"""
+        page = _PageWriter(self, limit, next_url)
+        yield '{"rows":['
+        for row in rows:
+            text = page.add(row)
+            if text:
+                yield text
+        yield page.finish()
+
+    async def astream(self, rows, limit, next_url):
+        """stream() for an async iterator of rows"""
+        page = _PageWriter(self, limit, next_url)
+        yield '{"rows":['
+        async for row in rows:
+            text = page.add(row)
+            if text:
+                yield text
+        yield page.finish()
+
+
+class _PageWriter:
+    def __init__(self, query, limit, next_url):
+        self.query = query
+        self.limit = limit
+        self.next_url = next_url
+        self._chunk = []
+        self._sent = 0
+        self._last = None
+        self._more = False
+
+    def add(self, row):
+        """Take the next row; return text to send once a chunk is full"""
+        if self._sent == self.limit:
+            # The query reads one row past the page only to tell if there is a next one
+            self._more = True
+            return None
+        self._chunk.append(json.dumps(self.query.render(row), default=str))
+        self._sent += 1
+        self._last = row
+        return self._flush() if len(self._chunk) >= CHUNK_ROWS else None
+
+    def _flush(self):
+        if not self._chunk:
+            return ''
+        text = (',' if self._sent > len(self._chunk) else '') + ','.join(self._chunk)
+        self._chunk = []
+        return text
+
+    def finish(self):
+        next_page = None
+        if self._more:
+            next_page = f"{self.next_url}&after={encode_cursor(self.query.key(self._last))}"
+        return self._flush() + '],"next":' + json.dumps(next_page) + '}'
+
+
+def _render_downtime(row):
+    return {"date": row['date'], "downtime_minutes": row['downtime_minutes'], "text": responses.downtime_day(row)}
+
+def _render_machine(row):
+    return {"machine_id": row['machine_id'], "name": row['name'], "status": row['status'],
+            "last_maintenance": row['last_maintenance'], "text": responses.machine_line(row)}
+
+DOWNTIME_HISTORY = KeysetQuery(backend.queries.LINE_DOWNTIME, backend.queries.LINE_DOWNTIME_PAGE, ('date',),
+                               _render_downtime)
+MACHINE_HISTORY = KeysetQuery(backend.queries.MACHINE_STATUS, backend.queries.MACHINE_STATUS_PAGE, ('machine_id',),
+                              _render_machine)
@@ -0,0 +1,279 @@
+"""Live plant state held in memory: machines, maintenance and today's line totals
+
+Machine status, maintenance and today's production change a few times per
+shift, yet were queried on every chatbot request. PlantState loads them
+once, then a background thread polls every PLANT_STATE_POLL_SECONDS:
+
+- TableVersion (one small read) says which tables changed since the last poll
+- for a changed Machines or Maintenance table, only rows whose updated_at is
+  at or past the table's watermark are read and merged, re-reading
+  PLANT_STATE_OVERLAP_SECONDS behind it so rows committed late are not missed
+- today's per-line totals (a handful of ProductionDaily rows) are re-read
+  when Production changed or the date rolled over
+
+Maintenance is held only while open or scheduled within
+MAINTENANCE_HISTORY_DAYS, the part the chatbot answers about, so memory
+and load time don't grow with the maintenance history; a merged record
+that has closed since is dropped. Deletes leave nothing to poll for, so a
+changed table whose row count no longer matches the merged rows is
+reloaded whole. Everything is reloaded
+every PLANT_STATE_RELOAD_SECONDS. The ingest path calls refresh() after it writes production rows, so its
+totals show up without waiting for the next poll.
+
+Each poll builds a new PlantSnapshot and publishes it with one reference
+swap; snapshots are never modified afterwards, so a request that takes
+snapshot() once sees one consistent state without locking. Rows are
+__slots__ records that also support row['column'], so the response
+formatters take them as they take query rows.
+"""
+import itertools
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from database.backends import backend
+from database.config import Config
+
+# Watermark that selects every row
+EPOCH = datetime(1970, 1, 2)
+
+
+class Record:
+    """Compact row: __slots__ attributes, readable as record['column'] like a dict row"""
+    __slots__ = ()
+
+    def __init__(self, row):
+        for name in self.__slots__:
+            object.__setattr__(self, name, row[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(self[name] == other[name] for name in self.__slots__)
+
+    def kept(self, today):
+        """False for a row the snapshot leaves out"""
+        return True
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={self[name]!r}' for name in self.__slots__)})"
+
+
+class Machine(Record):
+    __slots__ = ('machine_id', 'name', 'status', 'last_maintenance', 'location')
+
+
+class MaintenanceEntry(Record):
+    __slots__ = ('maintenance_id', 'machine_id', 'schedule_date', 'completion_date', 'maintenance_type',
+                 'status', 'remarks')
+
+    def kept(self, today):
+        # As queries.CURRENT_MAINTENANCE
+        return (self.status != 'Completed'
+                or self.schedule_date >= today - timedelta(days=Config.MAINTENANCE_HISTORY_DAYS))
+
+
+class LineTotals(Record):
+    __slots__ = ('line_id', 'output_units', 'downtime_minutes')
+
+
+class PlantSnapshot:
+    """One immutable view of the plant; build a new one rather than changing it"""
+    __slots__ = ('machines', 'maintenance', 'day', 'lines', 'versions', 'watermarks', 'loaded_at',
+                 'machine_list', 'schedules', 'serial')
+
+    def __init__(self, machines, maintenance, day, lines, versions, watermarks, loaded_at):
+        self.machines = machines          # machine_id -> Machine
+        self.maintenance = maintenance    # maintenance_id -> MaintenanceEntry
+        self.day = day                    # date the line totals are for
+        self.lines = lines                # LineTotals by line_id
+        self.versions = versions          # TableVersion at load time
+        self.watermarks = watermarks      # table -> newest updated_at seen
+        self.loaded_at = loaded_at        # monotonic time of the last full load
+        self.serial = 0                   # Numbers published snapshots; a data version for cached replies
+        self.machine_list = sorted(machines.values(), key=lambda machine: machine.machine_id)
+        self.schedules = {}               # machine_id -> MaintenanceEntry list by schedule date
+        for entry in sorted(maintenance.values(), key=lambda entry: (entry.schedule_date, entry.maintenance_id)):
+            self.schedules.setdefault(entry.machine_id, []).append(entry)
+
+    def machine_status(self, limit):
+        """Machines by id, as queries.MACHINE_STATUS"""
+        return self.machine_list[:limit]
+
+    def maintenance_machines(self, today):
+        """Machines in maintenance or with maintenance due by today, as queries.MAINTENANCE_MACHINES"""
+        rows = []
+        for machine in self.machine_list:
+            in_maintenance = machine.status == 'Maintenance'
+            # kept() skips records that aged out since the last full load
+            entries = [entry for entry in self.schedules.get(machine.machine_id, ()) if entry.kept(today)]
+            if not entries:
+                if in_maintenance:
+                    rows.append({'name': machine.name, 'status': machine.status,
+                                 'schedule_date': None, 'remarks': None})
+                continue
+            for entry in entries:
+                if in_maintenance or entry.schedule_date <= today:
+                    rows.append({'name': machine.name, 'status': machine.status,
+                                 'schedule_date': entry.schedule_date, 'remarks': entry.remarks})
+        return rows
+
+    def today_production(self, today):
+        """Today's per-line totals as queries.TODAY_PRODUCTION, or None until the poll after midnight"""
+        return self.lines if self.day == today else None
+
+
+def _fetch(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    return cursor.fetchall()
+
+# table -> (record class, key column, rows changed since a watermark, rows a full load keeps)
+TABLES = {
+    'Machines': (Machine, 'machine_id', backend.queries.PLANT_MACHINES, backend.queries.PLANT_MACHINES),
+    'Maintenance': (MaintenanceEntry, 'maintenance_id', backend.queries.PLANT_MAINTENANCE,
+                    backend.queries.PLANT_MAINTENANCE_CURRENT),
+}
+
+def _load_params(table):
+    """Parameters of a table's full load and of its PLANT_ROW_COUNTS query"""
+    return (Config.MAINTENANCE_HISTORY_DAYS,) if table == 'Maintenance' else (EPOCH,)
+
+
+class PlantState:
+    """Keeps the current PlantSnapshot, refreshed in the background"""
+
+    def __init__(self, interval, reload_seconds, overlap_seconds):
+        self.interval = interval
+        self.reload_seconds = reload_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._serials = itertools.count(1)
+        self._stats = {'polls': 0, 'full_loads': 0, 'table_reloads': 0, 'rows_merged': 0, 'errors': 0}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='plant-state', daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        """Poll now instead of waiting for the next interval, e.g. after a write"""
+        self._wake.set()
+
+    def snapshot(self):
+        """The current PlantSnapshot, or None until the first load has finished"""
+        return self._snapshot
+
+    def _run(self):
+        while True:
+            self.poll()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _count(self, event, amount=1):
+        with self._lock:
+            self._stats[event] += amount
+
+    def poll(self):
+        conn = None
+        try:
+            conn = backend.connect()
+            if conn is None:
+                return
+            cursor = conn.cursor(dictionary=True)
+            try:
+                snapshot = self._next_snapshot(cursor, self._snapshot)
+            finally:
+                cursor.close()
+        except Exception as e:
+            print(f"Plant state refresh error: {e}")
+            self._count('errors')
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+        self._count('polls')
+        if snapshot is not None:
+            snapshot.serial = next(self._serials)
+            self._snapshot = snapshot
+
+    def _next_snapshot(self, cursor, current):
+        """Snapshot with every change since current applied, or None if nothing changed"""
+        queries = backend.queries
+        versions = {row['table_name']: row['version'] for row in _fetch(cursor, queries.TABLE_VERSIONS)}
+        today = date.today()
+        now = time.monotonic()
+        if current is None or now - current.loaded_at >= self.reload_seconds:
+            self._count('full_loads')
+            machines, machines_mark = self._load(cursor, 'Machines')
+            maintenance, maintenance_mark = self._load(cursor, 'Maintenance')
+            lines = self._lines(cursor)
+            return PlantSnapshot(machines, maintenance, today, lines, versions,
+                                 {'Machines': machines_mark, 'Maintenance': maintenance_mark}, now)
+
+        changed = {table for table in ('Machines', 'Maintenance', 'Production')
+                   if versions.get(table) != current.versions.get(table)}
+        if not changed and today == current.day:
+            return None
+        watermarks = dict(current.watermarks)
+        machines, maintenance, lines = current.machines, current.maintenance, current.lines
+        if 'Machines' in changed:
+            machines, watermarks['Machines'] = self._merge(cursor, 'Machines', machines, watermarks['Machines'], today)
+        if 'Maintenance' in changed:
+            maintenance, watermarks['Maintenance'] = self._merge(
+                cursor, 'Maintenance', maintenance, watermarks['Maintenance'], today)
+        if 'Production' in changed or today != current.day:
+            lines = self._lines(cursor)
+        return PlantSnapshot(machines, maintenance, today, lines, versions, watermarks, current.loaded_at)
+
+    def _load(self, cursor, table):
+        """(key -> record for every row the snapshot keeps, newest updated_at)"""
+        record, key, _, sql = TABLES[table]
+        rows = _fetch(cursor, sql, _load_params(table))
+        return {row[key]: record(row) for row in rows}, max((row['updated_at'] for row in rows), default=EPOCH)
+
+    def _merge(self, cursor, table, current, watermark, today):
+        """(current with rows changed since watermark applied, new watermark)"""
+        record, key, sql, _ = TABLES[table]
+        rows = _fetch(cursor, sql, (watermark - self.overlap,))
+        merged = dict(current)
+        applied = 0
+        for row in rows:
+            entry = record(row)
+            if not entry.kept(today):
+                # Closed since the last poll
+                applied += merged.pop(row[key], None) is not None
+            elif merged.get(row[key]) != entry:
+                merged[row[key]] = entry
+                applied += 1
+        count = _fetch(cursor, backend.queries.PLANT_ROW_COUNTS[table], _load_params(table))[0]['row_count']
+        if count != len(merged):
+            # Rows were deleted, or aged out of what a full load keeps
+            self._count('table_reloads')
+            return self._load(cursor, table)
+        self._count('rows_merged', applied)
+        return merged, max([watermark] + [row['updated_at'] for row in rows])
+
+    def _lines(self, cursor):
+        return [LineTotals(row) for row in _fetch(cursor, backend.queries.TODAY_PRODUCTION)]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        snapshot = self._snapshot
+        stats['machines'] = len(snapshot.machines) if snapshot else 0
+        stats['maintenance'] = len(snapshot.maintenance) if snapshot else 0
+        return stats
+
+
+plant_state = PlantState(Config.PLANT_STATE_POLL_SECONDS, Config.PLANT_STATE_RELOAD_SECONDS,
+                         Config.PLANT_STATE_OVERLAP_SECONDS)
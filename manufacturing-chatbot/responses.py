@@ -0,0 +1,111 @@
+"""Reply text for each chatbot intent, shared by the Flask and async apps
+
+Each per-row line is a small f-string function, compiled once with the
+module, and a reply is its header plus ''.join() over the rows, so
+rendering stays linear in the number of rows on any interpreter. Rows may
+be dicts or any object with row['column'] access (plant_state records).
+Formatting each row is the remaining cost; the Flask app avoids it for
+repeat questions by caching the serialized reply (see app.reply_cache).
+"""
+
+HELP = """🤖 Available Commands:
+• "Show today's production" - Get today's production data
+• "Production for Line 2 last week" - Output, attainment and defect rate for a period
+  (also "yesterday night shift", "in March", "from 2025-03-01 to 2025-03-15")
+• "OEE for Line 2" - Availability × performance × quality (add a period or shift as above)
+• "List machines under maintenance" - View maintenance schedule
+• "Show downtime report for Line X" - Get downtime history
+• "Machine status" - Check all machine status
+• "Help" - Show this help message"""
+
+FALLBACK = "I'm not sure I understand. Try asking about:\n• Production data\n• Maintenance schedules\n• Downtime reports\n• Machine status\n\nType 'help' for all available commands."
+
+DB_UNAVAILABLE = "❌ Database connection error. Please check if MySQL is running and database is setup."
+
+MISSING_LINE = "Please specify which line (e.g., 'Line 1')"
+
+
+_MACHINE_ICONS = {'Running': "🟢", 'Stopped': "🔴"}
+
+
+def _production_line(row):
+    return f"Line {row['line_id']}: {row['output_units']} units, Downtime: {row['downtime_minutes']} min\n"
+
+def production_today(results):
+    if not results:
+        return "No production data found for today."
+    return "📊 Today's Production:\n" + ''.join(map(_production_line, results))
+
+def _kpis(row):
+    attainment = f"{row['attainment_pct']}% of target" if row['attainment_pct'] is not None else "no target"
+    defects = f"{row['defect_rate_pct']}% defects" if row['defect_rate_pct'] is not None else "no output"
+    return (f"{row['output_units']:,} / {row['target_units']:,} units ({attainment}), "
+            f"{defects}, downtime {row['downtime_minutes']:,} min\n")
+
+def production_report(start, end, line_num, shift, results):
+    period = f"on {start}" if start == end else f"{start} to {end}"
+    scope = f"Line {line_num}" if line_num is not None else "all lines"
+    if shift is not None:
+        scope += f", {shift} shift"
+    if not results:
+        return f"No production data found for {scope} {period}."
+    parts = [f"📈 Production, {scope}, {period}:\n"]
+    lines = [row for row in results if row['line_id'] is not None]
+    for row in lines:
+        parts += (f"Line {row['line_id']}: ", _kpis(row))
+    if len(lines) > 1:
+        # The WITH ROLLUP row
+        total = next(row for row in results if row['line_id'] is None)
+        parts += ("Total: ", _kpis(total))
+    return ''.join(parts)
+
+def _pct(value):
+    return f"{value * 100:.1f}%" if value is not None else "n/a"
+
+def _oee_factors(row):
+    return f"A {_pct(row['availability'])}, P {_pct(row['performance'])}, Q {_pct(row['quality'])}"
+
+def oee(start, end, line_num, shift, overall, groups, group_by):
+    """overall and groups are oee.records(); groups are per group_by ('line' or 'shift')"""
+    period = f"on {start}" if start == end else f"{start} to {end}"
+    scope = f"Line {line_num}" if line_num is not None else "all lines"
+    if shift is not None:
+        scope += f", {shift} shift"
+    if overall is None:
+        return f"No production data found for {scope} {period}."
+    parts = [f"⚙️ OEE, {scope}, {period}: {_pct(overall['oee'])}\n",
+             f"Availability {_pct(overall['availability'])} × Performance {_pct(overall['performance'])}"
+             f" × Quality {_pct(overall['quality'])}\n"]
+    if len(groups) > 1:
+        parts.append(f"By {group_by}:\n")
+        for row in groups:
+            label = f"Line {row['line']}" if group_by == 'line' else row[group_by]
+            parts.append(f"• {label}: {_pct(row['oee'])} ({_oee_factors(row)})\n")
+    return ''.join(parts)
+
+def _maintenance_line(row):
+    if row['schedule_date']:
+        return f"• {row['name']} - Status: {row['status']}\n  Scheduled: {row['schedule_date']} - {row['remarks']}\n"
+    return f"• {row['name']} - Status: {row['status']}\n"
+
+def maintenance(results):
+    if not results:
+        return "No machines currently under maintenance."
+    return "🔧 Machines Under Maintenance:\n" + ''.join(map(_maintenance_line, results))
+
+def downtime_day(row):
+    return f"• {row['date']}: {row['downtime_minutes']} minutes\n"
+
+def line_downtime(line_num, results):
+    if not results:
+        return f"No downtime data found for Line {line_num}."
+    return f"⏱️ Downtime Report for Line {line_num}:\n" + ''.join(map(downtime_day, results))
+
+def machine_line(row):
+    status_icon = _MACHINE_ICONS.get(row['status'], "🟡")
+    return f"{status_icon} {row['name']}: {row['status']} (Last Maintenance: {row['last_maintenance']})\n"
+
+def machine_status(results):
+    if not results:
+        return "No machine data found."
+    return "🏭 Machine Status:\n" + ''.join(map(machine_line, results))
@@ -0,0 +1,117 @@
+"""Request coalescing: concurrent identical calls share one execution
+
+At shift start many supervisors ask "Today's production" within the same
+second. SingleFlight.do(key, function) runs function for the first caller
+with a given key (the leader); callers arriving with the same key while it
+runs wait for its result instead of repeating the database and render
+work. Once the leader finishes the key is free again, so results are never
+served after the fact; longer-lived reuse is the caches' job.
+
+A leader's exception is raised in every waiting caller too. A caller that
+waits longer than `timeout` runs function itself rather than fail.
+
+AsyncSingleFlight does the same for coroutines on one event loop (asgi.py):
+followers await the leader's future instead of blocking a thread.
+"""
+import asyncio
+import threading
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._flights = {}  # key -> _Flight in progress
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'coalesced': 0, 'timeouts': 0, 'errors': 0}
+
+    def do(self, key, function):
+        """Return (result, shared); shared is True when another caller's result was reused"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats['leaders'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            if flight.done.wait(self.timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result, True
+            with self._lock:
+                self._stats['timeouts'] += 1
+            return function(), False
+
+        try:
+            flight.result = function()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._flights))
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutine functions; all callers run on the same event loop"""
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._flights = {}  # key -> asyncio.Future of the leader's result
+        self._stats = {'leaders': 0, 'coalesced': 0, 'timeouts': 0, 'errors': 0}
+
+    async def do(self, key, function):
+        """Return (await function(), shared); shared is True when another caller's result was reused"""
+        flight = self._flights.get(key)
+        if flight is not None:
+            self._stats['coalesced'] += 1
+            try:
+                # shield() so a follower giving up doesn't cancel the leader's future
+                return await asyncio.wait_for(asyncio.shield(flight), self.timeout), True
+            except asyncio.TimeoutError:
+                self._stats['timeouts'] += 1
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise  # this caller was cancelled, not the leader
+            return await function(), False
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        self._stats['leaders'] += 1
+        try:
+            result = await function()
+        except Exception as e:
+            self._stats['errors'] += 1
+            flight.set_exception(e)
+            flight.exception()  # mark retrieved: a flight without followers logs nothing
+            raise
+        except BaseException:
+            # The leader was cancelled; followers run function themselves
+            flight.cancel()
+            raise
+        else:
+            flight.set_result(result)
+        finally:
+            del self._flights[key]
+        return result, False
+
+    def stats(self):
+        return dict(self._stats, in_flight=len(self._flights))
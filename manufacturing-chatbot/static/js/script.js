@@ -29,17 +29,18 @@ function sendMessage() {
     .then(response => response.json())
     .then(data => {
         // Add bot response
-        addMessage(data.response, 'bot');
+        const contentDiv = addMessage(data.response, 'bot');
+        if (data.more) {
+            addLoadMore(contentDiv, data.more);
+        }
         
-        // Display chart if available
+        // Display chart if available; the image is fetched separately so the
+        // text reply is not held up by rendering
         if (data.chart) {
-            chartContainer.innerHTML = `<img src="${data.chart}" alt="Production Chart">`;
+            chartContainer.innerHTML = `<img src="${data.chart}" alt="Production Chart" loading="lazy">`;
         } else {
             chartContainer.innerHTML = '';
         }
-        
-        // Display alerts if any
-        displayAlerts(data.alerts);
     })
     .catch(error => {
         console.error('Error:', error);
@@ -60,6 +61,34 @@ function addMessage(content, sender) {
     
     // Scroll to bottom
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return contentDiv;
+}
+
+// Append the rest of a long list one page at a time
+function addLoadMore(contentDiv, url) {
+    const button = document.createElement('button');
+    button.className = 'load-more';
+    button.textContent = 'Show more';
+    button.addEventListener('click', function() {
+        button.disabled = true;
+        fetch(url)
+        .then(response => response.json())
+        .then(page => {
+            const text = page.rows.map(row => row.text).join('');
+            contentDiv.insertBefore(document.createTextNode(text), button);
+            if (page.next) {
+                url = page.next;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            button.disabled = false;
+        });
+    });
+    contentDiv.appendChild(button);
 }
 
 function quickAction(action) {
@@ -67,6 +96,9 @@ function quickAction(action) {
     sendMessage();
 }
 
+// Live alerts keyed by alert id, kept in sync by the server event stream
+let currentAlerts = new Map();
+
 function displayAlerts(alerts) {
     alertsContainer.innerHTML = '';
     
@@ -80,17 +112,29 @@ function displayAlerts(alerts) {
     }
 }
 
-// Initial alerts check on page load
+function renderCurrentAlerts() {
+    displayAlerts(Array.from(currentAlerts.values(), alert => alert.message));
+}
+
+// Subscribe to pushed alert updates; the first event is a full snapshot
 document.addEventListener('DOMContentLoaded', function() {
-    fetch('/chatbot', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({ message: 'check alerts' })
-    })
-    .then(response => response.json())
-    .then(data => {
-        displayAlerts(data.alerts);
+    const alertStream = new EventSource('/alerts/stream');
+    
+    alertStream.addEventListener('snapshot', function(e) {
+        currentAlerts = new Map(JSON.parse(e.data).map(alert => [alert.id, alert]));
+        renderCurrentAlerts();
+    });
+    
+    ['new', 'changed'].forEach(function(type) {
+        alertStream.addEventListener(type, function(e) {
+            const alert = JSON.parse(e.data);
+            currentAlerts.set(alert.id, alert);
+            renderCurrentAlerts();
+        });
+    });
+    
+    alertStream.addEventListener('cleared', function(e) {
+        currentAlerts.delete(JSON.parse(e.data).id);
+        renderCurrentAlerts();
     });
 });
\ No newline at end of file
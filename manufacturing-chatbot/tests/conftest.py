@@ -0,0 +1,37 @@
+"""Shared test setup: every test runs against an embedded SQLite database
+
+    cd manufacturing-chatbot && python -m pytest -q
+
+DB_BACKEND and SQLITE_PATH are read when database.config is first imported,
+so they are set here, before any test module imports the app.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='chatbot-tests-'), 'manufacturing.db')
+
+from database.config import Config
+
+# No render workers or slow-request log lines from test requests
+Config.CHART_WARM_UP = False
+Config.SLOW_REQUEST_MS = None
+
+
+@pytest.fixture(scope='session')
+def database():
+    """Path of the SQLite file, loaded with the demo data once per session"""
+    from database.setup_database import create_database
+    create_database('sqlite')
+    return Config.SQLITE_PATH
+
+
+@pytest.fixture
+def client(database):
+    from app import app
+    return app.test_client()
@@ -0,0 +1,69 @@
+import time
+from datetime import date
+
+from cache import TTLCache, VersionedCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_ttl_cache_entries_expire():
+    cache = TTLCache(ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+    assert cache.get('a', 'gone') == 'gone'
+    assert cache.stats() == {'size': 0, 'maxsize': 128, 'hits': 0, 'misses': 1, 'evictions': 1}
+
+
+def test_versioned_cache_serves_only_the_matching_version():
+    cache = VersionedCache()
+    cache.set('today', (1, 4), b'reply')
+    assert cache.get('today', (1, 4)) == b'reply'
+    # A write bumped a table version: the reply is stale
+    assert cache.get('today', (2, 4)) is None
+    assert cache.get('status', (1, 4)) is None
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'stale': 1, 'size': 1}
+
+
+def test_newer_version_replaces_the_entry():
+    cache = VersionedCache(maxsize=2)
+    cache.set('today', 1, b'old')
+    cache.set('status', 1, b'status')
+    cache.set('today', 2, b'new')
+    assert cache.get('today', 2) == b'new'
+    assert cache.get('today', 1) is None
+    # Re-versioning one key did not push the other out
+    assert cache.get('status', 1) == b'status'
+
+
+def test_clear():
+    cache = VersionedCache()
+    cache.set('today', 1, b'reply')
+    cache.clear()
+    assert cache.get('today', 1) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_chatbot_reply_is_cached_until_its_tables_change(client):
+    from app import reply_cache
+
+    def ask():
+        return client.post('/chatbot', json={'message': 'downtime report for line 8'}).get_json()['response']
+
+    first = ask()
+    hits = reply_cache.stats()['hits']
+    assert ask() == first
+    assert reply_cache.stats()['hits'] == hits + 1
+
+    event = {'event_id': 'cache-1', 'type': 'production', 'line_id': 8, 'date': date.today().isoformat(),
+             'output_units': 10, 'downtime_minutes': 7}
+    assert client.post('/ingest?wait=1', json=event).status_code == 200
+    assert ask() != first
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import ingest
+
+
+def production_event(event_id, **fields):
+    return dict({'event_id': event_id, 'type': 'production', 'line_id': 9, 'date': '2020-02-01',
+                 'output_units': 100, 'target_units': 120}, **fields)
+
+
+def downtime_event(event_id, **fields):
+    return dict({'event_id': event_id, 'type': 'downtime', 'line_id': 9,
+                 'start_time': '2020-02-01T08:00:00', 'end_time': '2020-02-01T08:30:00'}, **fields)
+
+
+@pytest.fixture
+def buffer(database):
+    return ingest.IngestBuffer(batch_size=100, flush_seconds=1, max_buffer=1000)
+
+
+@pytest.mark.parametrize('event, error', [
+    (production_event('p', line_id=0), "'line_id' must be a positive integer"),
+    (production_event('p', output_units=True), "'output_units' must be a non-negative integer"),
+    (production_event('p', date='02/01/2020'), "'date' must be a YYYY-MM-DD date"),
+    (production_event('p', shift='Day'), "'shift' must be one of"),
+    (production_event(''), "'event_id' must be a non-empty string"),
+    (downtime_event('d', end_time='2020-02-01T07:00:00'), "'end_time' is before 'start_time'"),
+    (dict(production_event('p'), type='scrap'), "'type' must be one of"),
+    (['not', 'an', 'object'], "event must be a JSON object"),
+])
+def test_invalid_events_are_rejected(event, error):
+    rows, rejected = ingest.validate([(0, event)])
+    assert not any(rows.values())
+    assert rejected[0]['index'] == 0
+    assert rejected[0]['error'].startswith(error)
+
+
+def test_downtime_duration_is_derived_from_end_time():
+    rows, rejected = ingest.validate([(0, downtime_event('d'))])
+    assert rejected == []
+    assert rows['downtime'][0][5] == 30
+
+
+def test_ndjson_bad_lines_are_rejected_by_index():
+    body = '\n'.join([json.dumps(production_event('a')), '{"event_id": ', '', json.dumps(production_event('b'))])
+    events, rejected = ingest.parse_events(body.encode(), 'application/x-ndjson')
+    assert [index for index, _ in events] == [0, 2]
+    assert rejected[0]['index'] == 1
+    assert rejected[0]['error'].startswith('invalid JSON')
+
+
+def test_body_shapes():
+    single = json.dumps(production_event('a'))
+    assert len(ingest.parse_events(single, 'application/json')[0]) == 1
+    wrapped = json.dumps({'events': [production_event('a'), production_event('b')]})
+    assert len(ingest.parse_events(wrapped, 'application/json')[0]) == 2
+    assert ingest.parse_events('42', 'application/json')[1][0]['index'] is None
+
+
+def test_duplicate_event_ids_insert_once(buffer):
+    rows, _ = ingest.validate([(0, production_event('dup-1')), (1, production_event('dup-2'))])
+    assert buffer.write(rows) == {'production': [2, 0, 0]}
+    rows, _ = ingest.validate([(0, production_event('dup-2')), (1, production_event('dup-3'))])
+    assert buffer.write(rows) == {'production': [1, 1, 0]}
+    assert buffer.stats()['duplicates'] == 1
+
+
+def test_foreign_key_violation_skips_only_the_offending_row(buffer):
+    rows, _ = ingest.validate([
+        (0, downtime_event('fk-1', machine_id=1)),
+        (1, downtime_event('fk-2', machine_id=99999)),
+        (2, downtime_event('fk-3')),
+    ])
+    assert buffer.write(rows) == {'downtime': [2, 0, 1]}
+    assert buffer.stats()['failed'] == 1
+
+
+def test_post_ingest_accepts_valid_lines_and_lists_rejects(client):
+    body = '\n'.join([
+        json.dumps(production_event('http-1')),
+        'not json',
+        json.dumps(production_event('http-2', output_units=-1)),
+    ])
+    response = client.post('/ingest?wait=1', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['accepted'] == 1
+    assert result['written'] is True
+    assert [r['index'] for r in result['rejected']] == [1, 2]
+    assert result['rejected'][1]['event_id'] == 'http-2'
+
+
+def test_post_ingest_with_nothing_valid_is_a_400(client):
+    response = client.post('/ingest', data='not json', content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json()['accepted'] == 0
+    assert response.get_json()['rejected'][0]['error'].startswith('invalid JSON')
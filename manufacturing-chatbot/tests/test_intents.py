@@ -0,0 +1,115 @@
+from datetime import date
+
+import pytest
+
+from intents import IntentRouter, extract_date_range, extract_line, extract_machine, extract_shift
+
+
+@pytest.fixture
+def router():
+    router = IntentRouter()
+    router.register('today', [('today',), ('production', 'output')])
+    router.register('downtime', [('downtime',), ('line',)], slots=('line',))
+    router.register('status', [('status', 'machine')])
+    router.register('help', [('help',)])
+    return router
+
+
+def classify(router, message):
+    intent, slots = router.classify(message)
+    return (intent.name if intent is not None else None), slots
+
+
+def test_every_keyword_group_must_match(router):
+    assert classify(router, "today's production") == ('today', {})
+    assert classify(router, "today") == (None, {})
+    assert classify(router, "production") == (None, {})
+
+
+def test_keywords_match_plurals_but_not_word_middles(router):
+    assert classify(router, "machines") == ('status', {})
+    assert classify(router, "downtimes on line 3") == ('downtime', {'line': 3})
+    assert classify(router, "outstatus") == (None, {})
+
+
+def test_more_keyword_groups_win_then_registration_order(router):
+    # 'status' alone would match; the two-group intent is more specific
+    assert classify(router, "machine downtime for line 4") == ('downtime', {'line': 4})
+    assert classify(router, "help with machine status") == ('status', {})
+
+
+def test_no_match(router):
+    assert classify(router, "") == (None, {})
+    assert classify(router, "what is the weather like") == (None, {})
+
+
+def test_unknown_slot_is_rejected():
+    with pytest.raises(ValueError):
+        IntentRouter().register('x', ['x'], slots=('colour',))
+
+
+def test_intent_needing_a_slot_requires_one_of_them():
+    router = IntentRouter()
+    router.register('report', [('output',)], slots=('line', 'shift'), needs=('shift',))
+    router.register('output', [('output',)])
+    assert classify(router, "output for the night shift") == ('report', {'line': None, 'shift': 'Night'})
+    assert classify(router, "output for line 2") == ('output', {})
+
+
+def test_needs_must_be_slots():
+    with pytest.raises(ValueError):
+        IntentRouter().register('x', ['x'], slots=('line',), needs=('shift',))
+
+
+def test_bind_keeps_intents_with_new_handlers(router):
+    bound = router.bind({name: name.upper() for name in ('today', 'downtime', 'status', 'help')})
+    intent, slots = bound.classify("downtime line 2")
+    assert (intent.name, intent.handler, slots) == ('downtime', 'DOWNTIME', {'line': 2})
+
+
+@pytest.mark.parametrize('message, line', [
+    ("line 3", 3), ("line no. 12", 12), ("line #7", 7), ("line number 2", 2), ("pipeline", None), ("lines", None),
+])
+def test_extract_line(message, line):
+    assert extract_line(message) == line
+
+
+def test_extract_shift_and_machine():
+    assert extract_shift("night shift output") == 'Night'
+    assert extract_shift("shift report") is None
+    assert extract_machine("machine 12 history") == 12
+    assert extract_machine("machine c") == 'C'
+    assert extract_machine("machines") is None
+
+
+def test_extract_date_range():
+    today = date(2024, 5, 15)  # a Wednesday
+    assert extract_date_range("last 7 days", today) == (date(2024, 5, 9), today)
+    assert extract_date_range("yesterday", today) == (date(2024, 5, 14), date(2024, 5, 14))
+    assert extract_date_range("last week", today) == (date(2024, 5, 6), date(2024, 5, 12))
+    assert extract_date_range("this month", today) == (date(2024, 5, 1), today)
+    assert extract_date_range("2024-03-09 to 2024-03-01", today) == (date(2024, 3, 1), date(2024, 3, 9))
+    assert extract_date_range("production may be low", today) is None
+    assert extract_date_range("nothing here", today) is None
+
+
+@pytest.mark.parametrize('message, intent', [
+    ("show today's production", 'production_today'),
+    ("list machines under maintenance", 'maintenance'),
+    ("show downtime report for line 2", 'line_downtime'),
+    ("machine status", 'machine_status'),
+    ("oee for line 1", 'oee'),
+    ("help", 'help'),
+    ("production in may", 'production_report'),
+    ("production for the night shift", 'production_report'),
+    ("production from line 2 last week", 'production_report'),
+    ("tell me a joke", None),
+    # Common words that are also period or shift names select no report
+    ("production may be low", None),
+    ("production days are long", None),
+    ("production from line 2", None),
+])
+def test_app_router(message, intent):
+    from app import router
+    found, _ = router.classify(message)
+    assert (found.name if found is not None else None) == intent
@@ -0,0 +1,81 @@
+from datetime import date
+
+import pytest
+
+from oee import aggregate, records, report, to_columns
+
+DAY = date(2024, 5, 1).toordinal()
+
+# line, day, shift, output, target, downtime, defects; worked by hand with 480-minute shifts
+ROWS = [
+    (1, DAY, 1, 400, 500, 48, 20),
+    (1, DAY, 2, 450, 500, 0, 0),
+    (2, DAY, 1, 600, 500, 0, 30),   # faster than target
+    (3, DAY, 1, 0, 0, 480, 0),      # down all shift
+]
+
+
+def by_line(rows=ROWS):
+    return {record['line']: record for record in records(aggregate(to_columns(rows), ('line',), shift_minutes=480))}
+
+
+def test_oee_per_line():
+    line = by_line()[1]
+    assert line['shifts'] == 2
+    assert line['availability'] == pytest.approx(912 / 960)
+    assert line['performance'] == pytest.approx(850 / (1000 * 0.95))
+    assert line['quality'] == pytest.approx(830 / 850)
+    assert line['oee'] == pytest.approx(0.83)
+    assert line['oee'] == pytest.approx(line['availability'] * line['performance'] * line['quality'])
+
+
+def test_performance_is_capped_at_full_speed():
+    line = by_line()[2]
+    assert line['performance'] == 1.0
+    assert line['quality'] == pytest.approx(0.95)
+    assert line['oee'] == pytest.approx(0.95)  # not 570 good / 500 target
+
+
+def test_zero_output_and_target_are_undefined_not_zero():
+    line = by_line()[3]
+    assert line['availability'] == 0.0
+    assert line['performance'] is None
+    assert line['quality'] is None
+    assert line['oee'] is None
+
+
+def test_overall_figures_come_from_the_sums():
+    overall = records(aggregate(to_columns(ROWS), (), shift_minutes=480))[0]
+    assert overall['shifts'] == 4
+    assert overall['availability'] == pytest.approx(1392 / 1920)
+    assert overall['performance'] == 1.0
+    assert overall['quality'] == pytest.approx(1400 / 1450)
+    assert overall['oee'] == pytest.approx(0.7)
+
+
+def test_group_keys_and_order():
+    result = records(aggregate(to_columns(list(reversed(ROWS))), ('line', 'shift'), shift_minutes=480))
+    assert [(r['line'], r['shift']) for r in result] == [(1, 'Morning'), (1, 'Evening'), (2, 'Morning'), (3, 'Morning')]
+    assert result[0]['oee'] == pytest.approx(380 / 500)
+
+
+def test_sparse_keys_group_the_same_as_dense_ones():
+    # Two centuries of days is too wide a key range for bincount; grouping sorts instead
+    rows = [(1, date(1900, 1, 1).toordinal(), 1, 100, 100, 0, 0),
+            (1, date(2100, 1, 1).toordinal(), 1, 50, 100, 0, 0),
+            (1, date(1900, 1, 1).toordinal(), 2, 80, 100, 0, 0)]
+    result = records(aggregate(to_columns(rows), ('day',), shift_minutes=480))
+    assert [(r['day'], r['shifts'], r['output_units']) for r in result] == [
+        (date(1900, 1, 1), 2, 180), (date(2100, 1, 1), 1, 50)]
+
+
+def test_report_takes_dict_rows():
+    columns = ('line', 'day', 'shift', 'output_units', 'target_units', 'downtime_minutes', 'quality_defects')
+    overall, lines = report([dict(zip(columns, row)) for row in ROWS])
+    assert overall['output_units'] == 1450
+    assert [line['line'] for line in lines] == [1, 2, 3]
+
+
+def test_no_rows():
+    assert report([]) == (None, [])
+    assert all(len(values) == 0 for values in aggregate(to_columns([]), ('line',)).values())
@@ -0,0 +1,57 @@
+import pytest
+
+from database.config import Config
+from pagination import decode_cursor, encode_cursor, page_size
+
+
+@pytest.mark.parametrize('key', [['2024-05-01'], [17], ['2024-05-01', 3], ['a/b+c?=']])
+def test_cursor_round_trip(key):
+    token = encode_cursor(key)
+    assert '=' not in token and '/' not in token and '+' not in token
+    assert decode_cursor(token, len(key)) == key
+
+
+@pytest.mark.parametrize('token, size', [
+    ('garbage!', 1),                     # not base64
+    (encode_cursor(['2024-05-01']), 2),  # wrong number of columns
+    (encode_cursor({'date': 1}), 1),     # not a list
+    (encode_cursor([None]), 1),          # not a key value
+    (encode_cursor([[1]]), 1),
+    ('', 1),
+])
+def test_bad_cursor_is_rejected(token, size):
+    with pytest.raises(ValueError):
+        decode_cursor(token, size)
+
+
+def test_page_size_is_clamped():
+    assert page_size(None) == Config.HISTORY_PAGE_SIZE
+    assert page_size(0) == 1
+    assert page_size(10 ** 6) == Config.HISTORY_MAX_PAGE_SIZE
+
+
+def test_bad_cursor_is_a_400(client):
+    response = client.get('/history/downtime?line=1&after=garbage')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "invalid cursor"}
+
+
+def test_pages_follow_on_without_gaps_or_repeats(client):
+    everything = client.get(f'/history/machines?limit={Config.HISTORY_MAX_PAGE_SIZE}').get_json()['rows']
+    assert len(everything) > 3
+
+    seen, url = [], '/history/machines?limit=2'
+    while url:
+        page = client.get(url).get_json()
+        assert len(page['rows']) <= 2
+        seen += page['rows']
+        url = page['next']
+    assert [row['machine_id'] for row in seen] == [row['machine_id'] for row in everything]
+
+
+def test_downtime_pages_are_newest_first(client):
+    first = client.get('/history/downtime?line=1&limit=3').get_json()
+    second = client.get(first['next']).get_json()
+    dates = [row['date'] for row in first['rows'] + second['rows']]
+    assert dates == sorted(dates, reverse=True)
+    assert len(set(dates)) == len(dates)
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+import pytest
+
+from database.backends import backend
+from database.config import Config
+from plant_state import PlantState
+
+OLD = date.today() - timedelta(days=Config.MAINTENANCE_HISTORY_DAYS + 10)
+
+
+def execute(sql, params=()):
+    conn = backend.connect()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+    finally:
+        cursor.close()
+
+
+def add_maintenance(machine_id, schedule_date, status, remarks):
+    execute('INSERT INTO Maintenance (machine_id, schedule_date, status, remarks) VALUES (%s, %s, %s, %s)',
+            (machine_id, schedule_date, status, remarks))
+
+
+@pytest.fixture
+def state(database):
+    add_maintenance(1, OLD, 'Completed', 'old and closed')
+    add_maintenance(1, OLD, 'Scheduled', 'old but open')
+    add_maintenance(1, date.today() - timedelta(days=1), 'Completed', 'recently closed')
+    state = PlantState(interval=60, reload_seconds=3600, overlap_seconds=5)
+    state.poll()
+    yield state
+    execute("DELETE FROM Maintenance WHERE remarks IN ('old and closed', 'old but open', 'recently closed')")
+
+
+def remarks(snapshot):
+    return {entry.remarks for entry in snapshot.maintenance.values()}
+
+
+def test_full_load_keeps_open_and_recent_maintenance_only(state):
+    kept = remarks(state.snapshot())
+    assert {'old but open', 'recently closed'} <= kept
+    assert 'old and closed' not in kept
+
+
+def test_closed_record_is_dropped_on_the_next_poll(state):
+    execute("UPDATE Maintenance SET status = 'Completed' WHERE remarks = 'old but open'")
+    state.poll()
+    assert 'old but open' not in remarks(state.snapshot())
+    # Merged, not reloaded: the kept row count matched
+    assert state.stats()['table_reloads'] == 0
+    assert state.stats()['full_loads'] == 1
+
+
+def test_snapshot_answers_as_the_database_does(state):
+    conn = backend.connect()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(backend.queries.MAINTENANCE_MACHINES, (Config.MAINTENANCE_HISTORY_DAYS,))
+        from_database = cursor.fetchall()
+    finally:
+        cursor.close()
+    from_snapshot = state.snapshot().maintenance_machines(date.today())
+    key = lambda row: (row['name'], str(row['schedule_date']), row['remarks'] or '')
+    assert sorted(from_snapshot, key=key) == sorted(from_database, key=key)
+    assert 'old and closed' not in {row['remarks'] for row in from_database}
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import mysql.connector
+import pytest
+
+from database.config import ConnectionPool
+
+
+class FakeConnection:
+    in_transaction = False
+
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        if self.broken:
+            raise mysql.connector.InterfaceError("Lost connection")
+
+    def rollback(self):
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+    def __init__(self):
+        self.up = True
+        self.connections = []
+
+    def connect(self):
+        if not self.up:
+            raise mysql.connector.InterfaceError("Can't connect")
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def test_connections_are_reused(server):
+    pool = ConnectionPool(server.connect, size=2)
+    pool.acquire().close()
+    pool.acquire().close()
+    assert len(server.connections) == 1
+    assert pool.stats()['checkouts'] == 2
+
+
+def test_exhausted_pool_returns_none_after_timeout(server):
+    pool = ConnectionPool(server.connect, size=2, timeout=0.05)
+    held = [pool.acquire(), pool.acquire()]
+    started = time.monotonic()
+    assert pool.acquire() is None
+    assert time.monotonic() - started >= 0.05
+    stats = pool.stats()
+    assert stats['exhausted'] == 1
+    assert stats['in_use'] == 2
+    held[0].close()
+    assert pool.acquire() is not None
+
+
+def test_waiter_gets_a_released_connection(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=2)
+    held = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    held.close()
+    waiter.join()
+    assert got[0] is not None
+    assert len(server.connections) == 1
+    assert pool.stats()['waits'] == 1
+
+
+def test_closed_handle_cannot_be_used(server):
+    pool = ConnectionPool(server.connect, size=1)
+    conn = pool.acquire()
+    conn.close()
+    with pytest.raises(mysql.connector.InterfaceError):
+        conn.cursor()
+    conn.close()  # a second close is harmless
+    assert pool.stats()['idle'] == 1
+
+
+def test_connections_past_max_lifetime_are_recycled(server):
+    pool = ConnectionPool(server.connect, size=1, max_lifetime=0.01)
+    first = pool.acquire()
+    time.sleep(0.02)
+    first.close()
+    pool.acquire().close()
+    assert len(server.connections) == 2
+    assert server.connections[0].closed
+    assert pool.stats()['recycled'] == 1
+
+
+def test_broken_idle_connection_is_replaced(server):
+    pool = ConnectionPool(server.connect, size=1, ping_after_idle=0)
+    pool.acquire().close()
+    server.connections[0].broken = True
+    conn = pool.acquire()
+    assert conn is not None
+    assert len(server.connections) == 2
+    assert pool.stats()['discarded'] == 1
+
+
+def test_connect_failure_frees_the_slot(server):
+    pool = ConnectionPool(server.connect, size=1, timeout=0.05)
+    server.up = False
+    assert pool.acquire() is None
+    assert pool.connect_failed_at is not None
+    assert pool.stats()['connect_errors'] == 1
+    server.up = True
+    assert pool.acquire() is not None
+    assert pool.connect_failed_at is None
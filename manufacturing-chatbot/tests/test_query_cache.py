@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+
+from database.query_cache import QueryCache
+
+PRODUCTION_SQL = 'SELECT line_id, SUM(output_units) AS output FROM Production WHERE date = %s GROUP BY line_id'
+DAILY_SQL = 'SELECT line_id, output_units FROM ProductionDaily WHERE date = CURDATE()'
+MACHINES_SQL = 'SELECT machine_id, name FROM Machines'
+
+
+class FakeDatabase:
+    """run() for QueryCache.fetch: answers TABLE_VERSIONS from versions and counts the other queries"""
+
+    def __init__(self):
+        self.versions = {'Machines': 1, 'Maintenance': 1, 'Production': 1, 'Downtime': 1}
+        self.runs = 0
+
+    def run(self, name, sql, params):
+        if name == 'table_versions':
+            return list(self.versions.items())
+        self.runs += 1
+        return [(name, self.runs)]
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+@pytest.fixture
+def cache():
+    # Versions re-read on every lookup
+    return QueryCache(maxsize=16, ttl=300, version_check=0)
+
+
+def test_repeated_query_is_served_from_cache(cache, db):
+    first = cache.fetch(db.run, 'production', PRODUCTION_SQL, (date(2024, 5, 1),))
+    second = cache.fetch(db.run, 'production', PRODUCTION_SQL, (date(2024, 5, 1),))
+    assert first is second
+    assert db.runs == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_parameters_and_whitespace(cache, db):
+    cache.fetch(db.run, 'production', PRODUCTION_SQL, (date(2024, 5, 1),))
+    cache.fetch(db.run, 'production', '  ' + PRODUCTION_SQL.replace(' ', '\n  '), (date(2024, 5, 1),))
+    assert db.runs == 1
+    cache.fetch(db.run, 'production', PRODUCTION_SQL, (date(2024, 5, 2),))
+    assert db.runs == 2
+
+
+def test_version_bump_invalidates_only_readers_of_that_table(cache, db):
+    cache.fetch(db.run, 'production', PRODUCTION_SQL, (date(2024, 5, 1),))
+    cache.fetch(db.run, 'machines', MACHINES_SQL)
+    db.versions['Production'] += 1
+    cache.fetch(db.run, 'production', PRODUCTION_SQL, (date(2024, 5, 1),))
+    cache.fetch(db.run, 'machines', MACHINES_SQL)
+    assert db.runs == 3
+    assert cache.stats()['stale'] == 1
+
+
+def test_derived_table_follows_its_source(cache, db):
+    cache.fetch(db.run, 'daily', DAILY_SQL)
+    db.versions['Production'] += 1
+    cache.fetch(db.run, 'daily', DAILY_SQL)
+    assert db.runs == 2
+
+
+def test_uncacheable_statements_always_run(cache, db):
+    for sql in ('SELECT NOW()', 'SELECT * FROM schema_version', 'SELECT RAND() FROM Machines'):
+        assert cache.key(sql) is None
+        cache.fetch(db.run, 'x', sql)
+        cache.fetch(db.run, 'x', sql)
+    assert db.runs == 6
+    assert cache.stats()['uncacheable'] == 6
+
+
+def test_date_dependent_statements_are_keyed_on_today(cache):
+    assert cache.key(DAILY_SQL)[2] == date.today()
+    assert cache.key(MACHINES_SQL)[2] is None
+
+
+def test_versions_are_rechecked_only_when_due(db):
+    cache = QueryCache(maxsize=16, ttl=300, version_check=60)
+    cache.fetch(db.run, 'machines', MACHINES_SQL)
+    db.versions['Machines'] += 1
+    cache.fetch(db.run, 'machines', MACHINES_SQL)
+    assert db.runs == 1  # the write is not seen until the next version check
+    cache.invalidate()
+    cache.fetch(db.run, 'machines', MACHINES_SQL)
+    assert db.runs == 2
+    assert cache.stats()['version_checks'] == 2
+
+
+def read_versions(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT table_name, version FROM TableVersion')
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def test_triggers_and_writers_bump_table_versions(database):
+    from database.backends import backend
+    from ingest import IngestBuffer
+
+    conn = backend.connect()
+    before = read_versions(conn)
+    cursor = conn.cursor()
+    cursor.execute("UPDATE Machines SET status = status WHERE machine_id IN (1, 2)")
+    cursor.close()
+    # Row triggers bump Machines for each row updated
+    assert read_versions(conn)['Machines'] > before['Machines']
+
+    rows = [(f'qc-{i}', 9, date(2020, 1, 1 + i), 'Morning', 100, 100, 0, 0, 'Test') for i in range(5)]
+    IngestBuffer(batch_size=100, flush_seconds=1, max_buffer=1000).write({'production': rows})
+    # Batch writers: one bump per insert statement, not per row
+    assert read_versions(conn)['Production'] == before['Production'] + 1
@@ -0,0 +1,68 @@
+from datetime import date
+
+import pytest
+
+from database.backends import backend
+
+DAY = date(2019, 1, 1)
+OTHER_DAY = date(2019, 1, 2)
+LINE = 9
+
+
+def execute(sql, params=()):
+    conn = backend.connect()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall() if cursor.description else None
+    finally:
+        cursor.close()
+
+
+def daily(day):
+    rows = execute('SELECT output_units, downtime_minutes, shift_count FROM ProductionDaily '
+                   'WHERE date = %s AND line_id = %s', (day, LINE))
+    return rows[0] if rows else None
+
+
+def add_shift(shift, output, downtime=0):
+    execute('INSERT INTO Production (line_id, date, shift, output_units, target_units, downtime_minutes) '
+            'VALUES (%s, %s, %s, %s, 100, %s)', (LINE, DAY, shift, output, downtime))
+
+
+@pytest.fixture(autouse=True)
+def clean(database):
+    yield
+    execute('DELETE FROM Production WHERE line_id = %s AND date IN (%s, %s)', (LINE, DAY, OTHER_DAY))
+
+
+def test_inserted_shifts_add_up():
+    add_shift('Morning', 80, 10)
+    add_shift('Evening', 90, 5)
+    assert daily(DAY) == {'output_units': 170, 'downtime_minutes': 15, 'shift_count': 2}
+
+
+def test_deleting_one_of_two_shifts_subtracts_it():
+    add_shift('Morning', 80, 10)
+    add_shift('Evening', 90, 5)
+    execute("DELETE FROM Production WHERE line_id = %s AND date = %s AND shift = 'Evening'", (LINE, DAY))
+    assert daily(DAY) == {'output_units': 80, 'downtime_minutes': 10, 'shift_count': 1}
+
+
+def test_deleting_the_only_shift_removes_the_day():
+    add_shift('Morning', 80, 10)
+    execute('DELETE FROM Production WHERE line_id = %s AND date = %s', (LINE, DAY))
+    assert daily(DAY) is None
+
+
+def test_moving_the_only_shift_to_another_day_moves_the_row():
+    add_shift('Morning', 80, 10)
+    execute('UPDATE Production SET date = %s WHERE line_id = %s AND date = %s', (OTHER_DAY, LINE, DAY))
+    assert daily(DAY) is None
+    assert daily(OTHER_DAY) == {'output_units': 80, 'downtime_minutes': 10, 'shift_count': 1}
+
+
+def test_updating_a_shift_in_place_keeps_the_row():
+    add_shift('Morning', 80, 10)
+    execute('UPDATE Production SET output_units = 95 WHERE line_id = %s AND date = %s', (LINE, DAY))
+    assert daily(DAY) == {'output_units': 95, 'downtime_minutes': 10, 'shift_count': 1}
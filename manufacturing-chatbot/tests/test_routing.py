@@ -0,0 +1,163 @@
+"""Read/write routing and failover (database/routing.py) over in-process stand-in MySQL instances
+
+Each stand-in reports its own lag and read_only flag the way SHOW REPLICA
+STATUS would, and refuses connections with the connector's own error while
+it is down, so the real ConnectionPool and Router code paths are exercised.
+"""
+import time
+from collections import Counter
+
+import mysql.connector
+import pytest
+
+from database.config import ConnectionPool
+from database.routing import Node, Router
+
+RETRY_SECONDS = 0.05
+WEIGHTS = {'replica-1': 1, 'replica-2': 2, 'replica-3': 1}
+
+
+class StandInServer:
+    """Replication state of one stand-in instance, changed by the test"""
+
+    def __init__(self, read_only, lag):
+        self.up = True
+        self.read_only = read_only
+        self.lag = lag
+
+    def connect(self):
+        if not self.up:
+            raise mysql.connector.InterfaceError("Can't connect to stand-in server (down)")
+        return StandInConnection(self)
+
+
+class StandInConnection:
+    in_transaction = False
+
+    def __init__(self, server):
+        self.server = server
+
+    def ping(self, reconnect=False):
+        if not self.server.up:
+            raise mysql.connector.InterfaceError("Lost connection to stand-in server")
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StandInNode(Node):
+    def probe(self, conn):
+        conn.ping()
+        return conn.server.read_only, conn.server.lag
+
+
+class Cluster:
+    """One primary and three replicas (weights 1:2:1) behind a Router"""
+
+    def __init__(self):
+        self.servers = {
+            'primary': StandInServer(read_only=False, lag=None),
+            'replica-1': StandInServer(read_only=True, lag=0),
+            'replica-2': StandInServer(read_only=True, lag=1),
+            'replica-3': StandInServer(read_only=True, lag=0),
+        }
+        self.nodes = [StandInNode(name, ConnectionPool(server.connect, size=4, timeout=0.05, ping_after_idle=0),
+                                  weight=WEIGHTS.get(name, 1), primary=name == 'primary')
+                      for name, server in self.servers.items()]
+        self.router = Router(self.nodes, max_lag=5, check_seconds=60, retry_seconds=RETRY_SECONDS)
+        self._names = {id(node.pool): node.name for node in self.nodes}
+        self.settle()
+
+    def settle(self):
+        # Two polls, so every node's state reflects the last change
+        self.router.poll()
+        self.router.poll()
+
+    def set_up(self, name, up):
+        self.servers[name].up = up
+        if up:
+            # A recovered node is retried once its skip window has passed
+            time.sleep(RETRY_SECONDS * 1.5)
+        self.settle()
+
+    def served(self, readonly, operations=200):
+        """Counter of the node name (None for no connection) that served each of operations connects"""
+        served = Counter()
+        for _ in range(operations):
+            conn = self.router.connect(readonly)
+            served[self._names[id(conn._pool)] if conn is not None else None] += 1
+            if conn is not None:
+                conn.close()
+        return served
+
+
+@pytest.fixture
+def cluster():
+    return Cluster()
+
+
+def test_reads_split_by_replica_weight(cluster):
+    served = cluster.served(readonly=True, operations=4000)
+    assert set(served) == set(WEIGHTS)
+    for name, weight in WEIGHTS.items():
+        assert served[name] / 4000 == pytest.approx(weight / sum(WEIGHTS.values()), abs=0.05)
+
+
+def test_writes_go_to_the_primary(cluster):
+    assert cluster.served(readonly=False) == Counter({'primary': 200})
+
+
+def test_lagging_replica_takes_no_reads(cluster):
+    cluster.servers['replica-2'].lag = 30
+    cluster.settle()
+    served = cluster.served(readonly=True)
+    assert 'replica-2' not in served
+    assert set(served) == {'replica-1', 'replica-3'}
+
+
+def test_downed_replica_fails_over_to_the_others(cluster):
+    cluster.set_up('replica-3', False)
+    served = cluster.served(readonly=True)
+    assert set(served) == {'replica-1', 'replica-2'}
+
+
+def test_reads_fall_back_to_the_writer_when_no_replica_is_left(cluster):
+    for name in WEIGHTS:
+        cluster.servers[name].up = False
+    cluster.settle()
+    assert cluster.served(readonly=True) == Counter({'primary': 200})
+
+
+def test_downed_primary_keeps_reads_and_refuses_writes(cluster):
+    cluster.set_up('primary', False)
+    assert None not in cluster.served(readonly=True)
+    assert cluster.served(readonly=False) == Counter({None: 200})
+
+
+def test_promoted_replica_takes_the_writes(cluster):
+    cluster.set_up('primary', False)
+    cluster.servers['replica-1'].read_only, cluster.servers['replica-1'].lag = False, None
+    cluster.settle()
+    assert cluster.served(readonly=False) == Counter({'replica-1': 200})
+    # The writer is not also read from as a replica
+    assert set(cluster.served(readonly=True)) == {'replica-2', 'replica-3'}
+
+    # The old primary comes back demoted; the promoted replica keeps the writes
+    cluster.servers['primary'].read_only = True
+    cluster.set_up('primary', True)
+    assert cluster.served(readonly=False) == Counter({'replica-1': 200})
+
+
+def test_recovered_node_is_readmitted_after_the_retry_window(cluster):
+    cluster.set_up('replica-3', False)
+    cluster.servers['replica-3'].up = True
+    # Still inside the skip window
+    assert 'replica-3' not in cluster.served(readonly=True, operations=20)
+    time.sleep(RETRY_SECONDS * 1.5)
+    cluster.settle()
+    assert 'replica-3' in cluster.served(readonly=True)
+    stats = cluster.router.stats()['replica-3']
+    assert stats['up'] and stats['reads'] > 0
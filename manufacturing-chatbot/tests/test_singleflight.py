@@ -0,0 +1,175 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(flights, key, function, callers):
+    """Start one thread per caller on flights.do(key, function); results fill with (result or exception, shared)"""
+    results = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flights.do(key, function)
+        except Exception as e:
+            results[i] = (e, False)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight(timeout=5)
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'answer'
+
+    threads, results = run_concurrently(flights, 'today', slow, 8)
+    while flights.stats()['coalesced'] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result == 'answer' for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flights.stats() == {'leaders': 1, 'coalesced': 7, 'timeouts': 0, 'errors': 0, 'in_flight': 0}
+
+
+def test_key_is_free_once_the_leader_finishes():
+    flights = SingleFlight()
+    assert flights.do('today', lambda: 1) == (1, False)
+    assert flights.do('today', lambda: 2) == (2, False)
+    assert flights.stats()['leaders'] == 2
+
+
+def test_leader_error_is_raised_in_followers():
+    flights = SingleFlight(timeout=5)
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise RuntimeError("database down")
+
+    threads, results = run_concurrently(flights, 'today', failing, 3)
+    while flights.stats()['coalesced'] < 2:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert all(isinstance(error, RuntimeError) for error, _ in results)
+    assert flights.stats()['errors'] == 1
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_follower_runs_the_call_itself_after_timeout():
+    flights = SingleFlight(timeout=0.05)
+    release = threading.Event()
+    leader_started = threading.Event()
+
+    def stuck():
+        leader_started.set()
+        release.wait(5)
+        return 'leader'
+
+    threads, _ = run_concurrently(flights, 'today', stuck, 1)
+    leader_started.wait(5)
+    assert flights.do('today', lambda: 'follower') == ('follower', False)
+    assert flights.stats()['timeouts'] == 1
+    release.set()
+    threads[0].join()
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flights = SingleFlight(timeout=5)
+    release = threading.Event()
+    threads, _ = run_concurrently(flights, 'today', lambda: release.wait(5), 1)
+    while not flights.stats()['in_flight']:
+        time.sleep(0.001)
+    assert flights.do('status', lambda: 'status') == ('status', False)
+    release.set()
+    threads[0].join()
+    assert flights.stats()['coalesced'] == 0
+
+
+def test_async_callers_share_one_call():
+    flights = AsyncSingleFlight(timeout=5)
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'answer'
+
+    async def main():
+        return await asyncio.gather(*(flights.do('today', slow) for _ in range(8)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(results) == [('answer', False)] + [('answer', True)] * 7
+    assert flights.stats() == {'leaders': 1, 'coalesced': 7, 'timeouts': 0, 'errors': 0, 'in_flight': 0}
+
+
+def test_async_leader_error_is_raised_in_followers():
+    flights = AsyncSingleFlight(timeout=5)
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("database down")
+
+    async def main():
+        return await asyncio.gather(*(flights.do('today', failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(error, RuntimeError) for error in asyncio.run(main()))
+    assert flights.stats()['errors'] == 1
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_async_follower_runs_the_call_itself_after_timeout():
+    flights = AsyncSingleFlight(timeout=0.01)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def stuck():
+            await release.wait()
+            return 'leader'
+
+        async def follower():
+            await asyncio.sleep(0)
+            result = await flights.do('today', lambda: asyncio.sleep(0, 'follower'))
+            release.set()
+            return result
+
+        return await asyncio.gather(flights.do('today', stuck), follower())
+
+    assert asyncio.run(main()) == [('leader', False), ('follower', False)]
+    assert flights.stats()['timeouts'] == 1
+
+
+def test_async_followers_run_themselves_when_the_leader_is_cancelled():
+    flights = AsyncSingleFlight(timeout=5)
+
+    async def main():
+        leader = asyncio.create_task(flights.do('today', lambda: asyncio.sleep(5, 'leader')))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do('today', lambda: asyncio.sleep(0, 'follower')))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ('follower', False)
+    assert flights.stats()['in_flight'] == 0
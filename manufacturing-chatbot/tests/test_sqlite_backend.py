@@ -0,0 +1,58 @@
+import threading
+from datetime import date, datetime
+
+import pytest
+
+from database.backends import SQLiteBackend, create_backend
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = SQLiteBackend(str(tmp_path / 'kiosk.db')).connect()
+    cursor = conn.cursor()
+    cursor.execute('CREATE TABLE Notes (id INTEGER PRIMARY KEY, day DATE, at DATETIME, text VARCHAR(20) UNIQUE)')
+    cursor.close()
+    return conn
+
+
+def test_schema_is_created_on_first_connect(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'Production'")
+    assert cursor.fetchone() == ('Production',)
+
+
+def test_placeholders_and_dict_rows(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('INSERT INTO Notes (day, at, text) VALUES (%s, %s, %s)',
+                   (date(2024, 5, 1), datetime(2024, 5, 1, 6, 30), 'first'))
+    cursor.execute('SELECT day, at, text FROM Notes WHERE text = %s', ('first',))
+    assert cursor.fetchall() == [{'day': date(2024, 5, 1), 'at': datetime(2024, 5, 1, 6, 30), 'text': 'first'}]
+    cursor.execute('SELECT text FROM Notes')
+    assert list(cursor) == [{'text': 'first'}]
+
+
+def test_executemany_applies_all_rows_or_none(conn):
+    cursor = conn.cursor()
+    with pytest.raises(SQLiteBackend.IntegrityError):
+        cursor.executemany('INSERT INTO Notes (text) VALUES (%s)', [('a',), ('b',), ('a',)])
+    cursor.execute('SELECT COUNT(*) FROM Notes')
+    assert cursor.fetchone() == (0,)
+    cursor.executemany('INSERT INTO Notes (text) VALUES (%s)', [('a',), ('b',)])
+    assert cursor.rowcount == 2
+
+
+def test_one_connection_per_thread(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'kiosk.db'))
+    first = backend.connect()
+    first.close()
+    assert backend.connect() is first
+    other = []
+    thread = threading.Thread(target=lambda: other.append(backend.connect()))
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend('oracle')
@@ -0,0 +1,99 @@
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import g, request
+
+from database.config import Config
+from metrics import DB_QUERY_SECONDS, REQUESTS, REQUEST_SECONDS, SLOW_REQUESTS, STAGE_SECONDS
+
+_slow_log_lock = threading.Lock()
+
+
+def add_stage(context, name, seconds):
+    """Add seconds to a named stage of the request whose g is context"""
+    stages = context.setdefault('stages', {})
+    stages[name] = stages.get(name, 0.0) + seconds
+
+@contextmanager
+def stage(name, context=g):
+    """Accumulate the wall time of a block under a named stage of the current request
+
+    context is the request globals to record into: Flask's g, or Quart's
+    for asgi.py.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage(context, name, time.perf_counter() - started)
+
+@contextmanager
+def db_call(name, sql):
+    """Time one query: counts toward the 'db' stage, the per-query histogram and the slow log"""
+    started = time.perf_counter()
+    try:
+        with stage('db'):
+            yield
+    finally:
+        seconds = time.perf_counter() - started
+        DB_QUERY_SECONDS.observe(seconds, query=name)
+        g.setdefault('queries', []).append((name, sql, seconds))
+
+def start_request():
+    g.request_started = time.perf_counter()
+
+def finish_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return
+    outcome = g.get('outcome', 'ok' if response.status_code < 500 else 'error')
+    record_request(request.endpoint or 'unknown', g.get('intent'), outcome, time.perf_counter() - started,
+                   g.get('stages', {}), g.get('queries', []))
+
+def record_request(endpoint, intent, outcome, seconds, stages, queries):
+    """Feed a finished request's stages into the metrics and log it if it was slow"""
+    for name, stage_seconds in stages.items():
+        STAGE_SECONDS.observe(stage_seconds, endpoint=endpoint, stage=name)
+
+    if intent is not None:
+        REQUESTS.inc(intent=intent, outcome=outcome)
+        REQUEST_SECONDS.observe(seconds, intent=intent)
+
+    if Config.SLOW_REQUEST_MS is not None and seconds * 1000 >= Config.SLOW_REQUEST_MS:
+        SLOW_REQUESTS.inc(endpoint=endpoint)
+        log_slow_request(endpoint, intent, seconds, stages, queries)
+
+def log_slow_request(endpoint, intent, seconds, stages, queries):
+    entry = json.dumps({
+        "time": datetime.now(timezone.utc).isoformat(),
+        "endpoint": endpoint,
+        "intent": intent,
+        "duration_ms": round(seconds * 1000, 2),
+        "stages_ms": {name: round(value * 1000, 2) for name, value in stages.items()},
+        "queries": [{"name": name, "sql": re.sub(r'\s+', ' ', sql).strip(), "duration_ms": round(value * 1000, 2)}
+                    for name, sql, value in queries],
+    }, default=str)
+    if Config.SLOW_REQUEST_LOG:
+        with _slow_log_lock, open(Config.SLOW_REQUEST_LOG, 'a') as f:
+            f.write(entry + '\n')
+    else:
+        print(f"Slow request: {entry}")
+
+def server_timing_header(stages):
+    """Format stage durations as a Server-Timing header value (milliseconds)"""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items())
+
+def parse_server_timing(value):
+    """Parse a Server-Timing header back into {stage: milliseconds}"""
+    stages = {}
+    for metric in (value or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        for param in params.split(';'):
+            key, _, duration = param.partition('=')
+            if name and key.strip() == 'dur':
+                stages[name] = float(duration)
+    return stages